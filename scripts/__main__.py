@@ -0,0 +1,121 @@
+"""
+Single entry point for the offline tooling, i.e.
+
+    python -m scripts generate --network mainnet
+    python -m scripts emergency-exit --network arbitrum
+    python -m scripts decode 0x...
+
+Subcommands are imported only when they are run so that the tool starts without loading
+jinja, eth_abi or brownie. Run `python -m scripts startup-check` to verify cold start time.
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# name => (module, help), every module exposes main(argv)
+COMMANDS = {
+    "generate": ("tests.generate", "Generate forge tests from the vault yaml specs"),
+    "emergency-exit": ("scripts.generateEmergencyExit", "Generate emergency exit gnosis batches"),
+    "export-abi": ("scripts.export_abi", "Export ABIs from forge build artifacts"),
+    "decode": ("scripts.abi_codec", "Decode calldata against the exported ABIs"),
+    "plan-liquidation": ("scripts.liquidation", "Plan flash liquidation batches"),
+    "registry": ("scripts.registry", "Validate the address registry or look up an address"),
+    "rpc-cache": ("tests.rpc_cache", "Run or manage the caching RPC proxy"),
+    "benchmark": ("tests.benchmark", "Benchmark the tooling on synthetic vault sets"),
+    "gas-profile": ("tests.gas_profile", "Record and compare the gas of the vault functions per vault contract"),
+    "pool-math": ("scripts.pool_math", "Sweep pool math scenarios to recommend vault bounds"),
+    "health-scan": ("scripts.health_scanner", "Stream vault accounts near liquidation"),
+    "sync-oracles": ("scripts.oracle_sync", "Diff the oracle table against the trading module"),
+    "gnosis-payloads": ("scripts.gnosis_payloads", "Build vault init and config gnosis batches offline"),
+    "route-quote": ("scripts.route_quote", "Quote and rank dex routes from pool snapshots"),
+    "impact": ("tests.impact", "List the forge tests affected by a change"),
+    "compile-stats": ("tests.compile_stats", "Compare compile time and out/ size of consolidated tests"),
+    "verify-emergency": ("scripts.emergency_dryrun", "Dry run the emergency exit batches on local anvil forks"),
+    "plan-rewards": ("scripts.reward_planner", "Plan reward claims and reinvestment across the vaults"),
+    "liquidation-daemon": ("scripts.liquidation_daemon", "Liquidate vault accounts as new blocks arrive"),
+}
+# Cold start budget in milliseconds for `python -m scripts <command> --help`. The interpreter
+# alone takes a few tens of milliseconds, anything past this means a heavy import has crept
+# into module scope.
+STARTUP_BUDGET_MS = {
+    "": 150,
+    "generate": 400,
+    "emergency-exit": 250,
+    "export-abi": 250,
+    "decode": 250,
+    "plan-liquidation": 250,
+    "registry": 250,
+    "rpc-cache": 300,
+    "benchmark": 400,
+    "gas-profile": 400,
+    "pool-math": 400,
+    "health-scan": 250,
+    "sync-oracles": 300,
+    "gnosis-payloads": 250,
+    "route-quote": 400,
+    "impact": 250,
+    "compile-stats": 250,
+    "verify-emergency": 250,
+    "plan-rewards": 250,
+    "liquidation-daemon": 250,
+}
+STARTUP_RUNS = 5
+
+
+def run_command(name, argv):
+    (module, _) = COMMANDS[name]
+    return importlib.import_module(module).main(argv)
+
+def measure_startup(command, runs=STARTUP_RUNS):
+    """Returns the fastest of several cold starts in milliseconds, the minimum filters out scheduling noise."""
+    args = [sys.executable, "-m", "scripts", *([command] if command else []), "--help"]
+    env = { **os.environ, "PYTHONPATH": os.getcwd() }
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def startup_check(argv):
+    parser = argparse.ArgumentParser(prog="scripts startup-check",
+                                     description="Fails if any command starts slower than its budget")
+    parser.add_argument("--runs", type=int, default=STARTUP_RUNS)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplier applied to every budget, i.e. for slow CI machines")
+    args = parser.parse_args(argv)
+
+    failed = []
+    for (command, budget) in STARTUP_BUDGET_MS.items():
+        elapsed = measure_startup(command, args.runs)
+        limit = budget * args.scale
+        status = "ok" if elapsed <= limit else "SLOW"
+        print(f"{command or '(none)':<18} {elapsed:7.1f}ms  budget {limit:7.1f}ms  {status}")
+        if elapsed > limit:
+            failed.append(command or "(none)")
+
+    if failed:
+        print(f"Startup budget exceeded: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts", description="Leveraged vaults tooling")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for (name, (_, help)) in COMMANDS.items():
+        subparsers.add_parser(name, help=help, add_help=False)
+    subparsers.add_parser("startup-check", help="Measure cold start time against a budget", add_help=False)
+    (args, rest) = parser.parse_known_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 0
+    if args.command == "startup-check":
+        return startup_check(rest)
+    return run_command(args.command, rest) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
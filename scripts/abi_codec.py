@@ -0,0 +1,89 @@
+import argparse
+import json
+
+ABI_DIR = "abi"
+
+
+# eth_abi and eth_utils take hundreds of milliseconds to import, they are imported inside
+# the functions that need them so that command line tools which never encode start quickly.
+def keccak(text):
+    from eth_hash.auto import keccak
+    return keccak(text.encode())
+
+def load_abi(name, abiDir=ABI_DIR):
+    with open(f"{abiDir}/{name}.json", "r") as f:
+        return json.load(f)
+
+def abi_type(param):
+    """Returns the canonical type of an abi parameter, expanding tuples into their components."""
+    t = param["type"]
+    if t.startswith("tuple"):
+        return "(" + ",".join(abi_type(c) for c in param["components"]) + ")" + t[len("tuple"):]
+    return t
+
+def signature(entry):
+    return "{}({})".format(entry["name"], ",".join(abi_type(i) for i in entry.get("inputs", [])))
+
+def selector(entry):
+    return keccak(signature(entry))[:4]
+
+def event_topic(entry):
+    return keccak(signature(entry))
+
+def get_function(abi, name):
+    matches = [e for e in abi if e.get("type") == "function" and e.get("name") == name]
+    if len(matches) != 1:
+        raise ValueError(f"expected one function named {name}, found {len(matches)}")
+    return matches[0]
+
+def encode_call(entry, args):
+    from eth_abi import encode
+    types = [abi_type(i) for i in entry.get("inputs", [])]
+    return "0x" + (selector(entry) + encode(types, list(args))).hex()
+
+def decode_call(abi, data):
+    """Decodes calldata against any function in the abi, returns the abi entry and its arguments."""
+    from eth_abi import decode
+    data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    for entry in abi:
+        if entry.get("type") == "function" and selector(entry) == data[:4]:
+            types = [abi_type(i) for i in entry.get("inputs", [])]
+            return (entry, decode(types, data[4:]))
+    raise ValueError(f"no function with selector 0x{data[:4].hex()} in abi")
+
+def to_json(value):
+    """Converts decoded abi values into json serializable values."""
+    from eth_utils import to_checksum_address
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, str) and len(value) == 42 and value.startswith("0x"):
+        return to_checksum_address(value)
+    return value
+
+def find_abi(data, abiDir=ABI_DIR):
+    """Returns the name of an exported abi that contains the function selector of the calldata."""
+    with open(f"{abiDir}/selectors.json", "r") as f:
+        functions = json.load(f)["functions"]
+    sel = (data if data.startswith("0x") else "0x" + data)[:10].lower()
+    if sel not in functions:
+        raise ValueError(f"no exported abi has a function with selector {sel}")
+    return functions[sel]["contracts"][0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decodes calldata against the exported ABIs")
+    parser.add_argument("calldata", help="Hex encoded calldata")
+    parser.add_argument("--abi", default=None, help="ABI to decode against, defaults to a lookup in abi/selectors.json")
+    args = parser.parse_args(argv)
+
+    name = args.abi or find_abi(args.calldata)
+    (entry, values) = decode_call(load_abi(name), args.calldata)
+    print(json.dumps({
+        "contract": name,
+        "function": signature(entry),
+        "args": { (i["name"] or str(n)): to_json(v) for (n, (i, v)) in enumerate(zip(entry["inputs"], values)) },
+    }, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Constants shared by the tools that read chain state: the networks the tests fork with their rpc
+env vars and fork blocks, and the Multicall3 aggregate3 call most reads are batched through.
+"""
+
+# Forge tests, anvil forks and rpc reads use these env vars and fork blocks
+NETWORKS = {
+    "mainnet": {
+        "rpcEnv": "MAINNET_RPC_URL",
+        "forkBlock": 19691163,
+    },
+    "arbitrum": {
+        "rpcEnv": "ARBITRUM_RPC_URL",
+        "forkBlock": 199952636,
+    },
+}
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+AGGREGATE3 = { "type": "function", "name": "aggregate3", "inputs": [{
+    "type": "tuple[]", "components": [{ "type": "address" }, { "type": "bool" }, { "type": "bytes" }]
+}] }
+AGGREGATE3_OUTPUT = ["(bool,bytes)[]"]
+
+
+def decode_hex(types, data):
+    from eth_abi import decode
+    return decode(types, bytes.fromhex(data[2:] if data.startswith("0x") else data))
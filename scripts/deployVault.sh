@@ -171,4 +171,4 @@ jq --arg chain "$CHAIN" \
    '.[$chain][$protocol][$pair] = $addr' vaults.json > tmp.json && mv tmp.json vaults.json
 
 source venv/bin/activate
-brownie run scripts/generateEmergencyExit.py --network $CHAIN
\ No newline at end of file
+PYTHONPATH=$(pwd) python -m scripts.generateEmergencyExit --network $CHAIN
\ No newline at end of file
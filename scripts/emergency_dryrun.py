@@ -0,0 +1,457 @@
+"""
+Dry runs every emergency exit batch under emergency/ against local anvil forks before it is needed.
+Each batch file is replayed in order on a fork snapshot as the emergency exit manager, recording
+the gas used, the revert reason of any failing call and the vault's pool token balances after the
+exit. Batches run concurrently on a pool of anvil instances that fork through the local rpc cache,
+so repeated runs at the same block do not go back to the upstream rpc.
+
+    python -m scripts verify-emergency --network mainnet
+    python -m scripts verify-emergency --offline --gas-estimates-out gas.json
+    python -m scripts verify-emergency --mock
+
+Forks are taken at the latest block unless --fork-block pins one, the block is resolved once per
+run so that every fork of a network sees the same state. A call to an address without code succeeds
+on chain, so a vault that is not deployed at the fork block fails its transaction instead.
+
+Batches whose total gas is over the block gas limit are flagged, the measured gas per vault can be
+fed back into `scripts emergency-exit --gas-estimates` so the batches are split accordingly.
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scripts.generateEmergencyExit import MAX_BATCH_GAS, OUTPUT_DIR
+from scripts.chain import NETWORKS, decode_hex
+
+REPORT_FILE = "./.emergency-dryrun/report.json"
+BALANCE = "0x56bc75e2d63100000"
+INTRINSIC_GAS = 21_000
+# Arbitrum reports an effectively unbounded block gas limit, a single transaction is capped at 32M
+BLOCK_GAS_CAP = { "arbitrum": 32_000_000 }
+ANVIL_STARTUP_TIMEOUT = 60
+
+TOKENS = { "type": "function", "name": "TOKENS", "inputs": [] }
+TOKENS_OUTPUT = ["address[]", "uint8[]"]
+VAULT_INFO = { "type": "function", "name": "getStrategyVaultInfo", "inputs": [] }
+VAULT_INFO_OUTPUT = ["(address,uint8,uint256,uint256,uint256,uint256)"]
+BALANCE_OF = { "type": "function", "name": "balanceOf", "inputs": [{ "type": "address" }] }
+ERROR_STRING = "0x08c379a0"
+PANIC = "0x4e487b71"
+
+
+class RpcError(Exception):
+    def __init__(self, error):
+        super().__init__(error.get("message"))
+        self.data = error.get("data")
+
+def rpc(url, method, params):
+    from tests.rpc_cache import http_post
+    resp = http_post(url, { "jsonrpc": "2.0", "id": 1, "method": method, "params": params })
+    if "error" in resp:
+        raise RpcError(resp["error"])
+    return resp["result"]
+
+def revert_reason(error):
+    """Error(string) and Panic(uint256) are decoded, custom errors are reported by their raw data."""
+    data = error.data if isinstance(error.data, str) else None
+    from eth_abi.exceptions import DecodingError
+    if not data or data == "0x":
+        return error.args[0] or "reverted without a reason"
+    try:
+        if data.startswith(ERROR_STRING):
+            return decode_hex(["string"], data[10:])[0]
+        if data.startswith(PANIC):
+            return f"panic {hex(decode_hex(['uint256'], data[10:])[0])}"
+    except DecodingError:
+        pass
+    return data
+
+def load_batches(networks=None, outputDir=OUTPUT_DIR):
+    """Every gnosis batch under emergency/, protocol batches and the single vault files alike."""
+    batches = []
+    for path in sorted(glob.glob(f"{outputDir}/*/**/*.json", recursive=True)):
+        network = os.path.relpath(path, outputDir).split(os.sep)[0]
+        if networks is not None and network not in networks:
+            continue
+        with open(path, "r") as f:
+            batch = json.load(f)
+        batches.append({ "path": path, "network": network, "transactions": batch["transactions"] })
+    return batches
+
+def eth_call(url, to, data):
+    from scripts.abi_codec import encode_call
+    if isinstance(data, dict):
+        data = encode_call(data, [])
+    return rpc(url, "eth_call", [{ "to": to, "data": data }, "latest"])
+
+def pool_balances(url, vault):
+    """Balances of the pool tokens held on the vault and its remaining pool claim, None for non LP vaults."""
+    from eth_abi.exceptions import DecodingError
+    from scripts.abi_codec import encode_call
+    try:
+        (tokens, _) = decode_hex(TOKENS_OUTPUT, eth_call(url, vault, TOKENS))
+        (info,) = decode_hex(VAULT_INFO_OUTPUT, eth_call(url, vault, VAULT_INFO))
+        balances = {}
+        for token in tokens:
+            (balance,) = decode_hex(["uint256"], eth_call(url, token, encode_call(BALANCE_OF, [vault])))
+            balances[token] = str(balance)
+    except (RpcError, DecodingError):
+        # Calls that do not revert but return nothing decodable, i.e. to an address without code
+        return None
+    return { "totalLPTokens": str(info[2]), "tokens": balances }
+
+def has_code(url, address):
+    return rpc(url, "eth_getCode", [address, "latest"]) not in ("0x", "0x0", "")
+
+def simulate_transaction(url, sender, txn):
+    if not has_code(url, txn["to"]):
+        return { "to": txn["to"], "before": None, "success": False, "gasUsed": None,
+                 "revert": "no contract at the fork block", "after": None }
+    result = { "to": txn["to"], "before": pool_balances(url, txn["to"]) }
+    params = { "from": sender, "to": txn["to"], "data": txn["data"], "value": hex(int(txn.get("value", "0"))) }
+    try:
+        # Calling first surfaces the revert reason, a mined transaction only reports its status
+        rpc(url, "eth_call", [params, "latest"])
+        txHash = rpc(url, "eth_sendTransaction", [params])
+        receipt = rpc(url, "eth_getTransactionReceipt", [txHash])
+    except RpcError as e:
+        return { **result, "success": False, "gasUsed": None, "revert": revert_reason(e), "after": None }
+
+    success = int(receipt["status"], 16) == 1
+    return {
+        **result,
+        "success": success,
+        "gasUsed": int(receipt["gasUsed"], 16),
+        "revert": None if success else "reverted when mined",
+        "after": pool_balances(url, txn["to"]),
+    }
+
+def block_gas_limit(url, network):
+    limit = int(rpc(url, "eth_getBlockByNumber", ["latest", False])["gasLimit"], 16)
+    return min(limit, BLOCK_GAS_CAP.get(network, limit))
+
+def simulate_batch(url, sender, batch):
+    """Replays a batch on a snapshot of the fork so that every batch starts from the same state."""
+    snapshot = rpc(url, "evm_snapshot", [])
+    try:
+        rpc(url, "anvil_impersonateAccount", [sender])
+        rpc(url, "anvil_setBalance", [sender, BALANCE])
+        results = [simulate_transaction(url, sender, t) for t in batch["transactions"]]
+        gasLimit = block_gas_limit(url, batch["network"])
+    finally:
+        rpc(url, "evm_revert", [snapshot])
+
+    # The safe sends the batch as one multisend transaction, so the intrinsic gas is paid once
+    gasUsed = INTRINSIC_GAS + sum(r["gasUsed"] - INTRINSIC_GAS for r in results if r["gasUsed"] is not None)
+    return {
+        "path": batch["path"],
+        "network": batch["network"],
+        "gasUsed": gasUsed,
+        "blockGasLimit": gasLimit,
+        "exceedsBlockGas": gasUsed > gasLimit,
+        "exceedsBatchCeiling": gasUsed > MAX_BATCH_GAS,
+        "reverted": sum(1 for r in results if not r["success"]),
+        "transactions": results,
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=ANVIL_STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return rpc(url, "eth_chainId", [])
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+class ForkPool:
+    """Forks of one network that are handed out to one batch at a time."""
+    def __init__(self, urls):
+        self.urls = queue.Queue()
+        for url in urls:
+            self.urls.put(url)
+
+    def run(self, fn, *args):
+        url = self.urls.get()
+        try:
+            return fn(url, *args)
+        finally:
+            self.urls.put(url)
+
+class AnvilPool(ForkPool):
+    def __init__(self, forkUrl, forkBlock, size):
+        self.procs = []
+        ports = [free_port() for _ in range(size)]
+        for port in ports:
+            self.procs.append(subprocess.Popen(
+                ["anvil", "--fork-url", forkUrl, "--fork-block-number", str(forkBlock), "--port", str(port), "--silent"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+        super().__init__([f"http://127.0.0.1:{port}" for port in ports])
+        for url in list(self.urls.queue):
+            wait_for(url)
+
+    def close(self):
+        for p in self.procs:
+            p.terminate()
+        for p in self.procs:
+            p.wait()
+
+class MockAnvil:
+    """
+    Minimal stand in for an anvil fork with the vaults deployed, used when anvil is not installed.
+    Vaults in lpVaults hold pool claims and exit into their two pool tokens, emergencyExit on any
+    other deployed address reverts as it would on a vault that does not implement it and addresses
+    that are not deployed have no code. Gas used per vault is
+    random but fixed by the seed.
+    """
+    def __init__(self, lpVaults, emergencyManager, deployed=(), seed=0, gasLimit=30_000_000):
+        self.rng = random.Random(seed)
+        self.manager = emergencyManager.lower()
+        self.gasLimit = gasLimit
+        self.lock = threading.Lock()
+        self.vaults = {}
+        for v in lpVaults:
+            tokens = ["0x" + self.rng.randbytes(20).hex() for _ in range(2)]
+            self.vaults[v.lower()] = {
+                "tokens": tokens,
+                "totalLPTokens": self.rng.randrange(10**20, 10**24),
+                "balances": { t: 0 for t in tokens },
+                "gas": self.rng.randrange(900_000, 3_500_000),
+            }
+        self.deployed = { a.lower() for a in deployed } | set(self.vaults) \
+            | { t for v in self.vaults.values() for t in v["tokens"] }
+        self.snapshots = []
+        self.receipts = {}
+
+    def _state(self):
+        return json.loads(json.dumps(self.vaults))
+
+    def _revert(self, message, data="0x"):
+        return { "code": 3, "message": f"execution reverted: {message}", "data": data }
+
+    def _call(self, tx):
+        from eth_abi import encode
+        from scripts.abi_codec import selector
+        (to, data) = (tx["to"].lower(), tx.get("data", "0x"))
+        vault = self.vaults.get(to)
+        if data[:10] == "0x" + selector(TOKENS).hex() and vault is not None:
+            return (encode(TOKENS_OUTPUT, [vault["tokens"], [18] * len(vault["tokens"])]), None)
+        if data[:10] == "0x" + selector(VAULT_INFO).hex() and vault is not None:
+            return (encode(VAULT_INFO_OUTPUT, [(to, 0, vault["totalLPTokens"], 0, 0, 0)]), None)
+        if data[:10] == "0x" + selector(BALANCE_OF).hex():
+            (owner,) = decode_hex(["address"], data[10:])
+            holder = self.vaults.get(owner.lower(), { "balances": {} })
+            return (encode(["uint256"], [holder["balances"].get(to, 0)]), None)
+        if vault is None:
+            return (None, self._revert("function not found"))
+        if (tx.get("from") or "").lower() != self.manager:
+            message = "AccessControl: missing role"
+            return (None, self._revert(message, ERROR_STRING + encode(["string"], [message]).hex()))
+        return (b"", None)
+
+    def _exit(self, vault):
+        claim = vault["totalLPTokens"]
+        for t in vault["tokens"]:
+            vault["balances"][t] += claim // len(vault["tokens"])
+        vault["totalLPTokens"] = 0
+
+    def handle_one(self, r):
+        (method, params) = (r.get("method"), r.get("params", []))
+        result = None
+        with self.lock:
+            if method == "eth_chainId":
+                result = "0x1"
+            elif method == "eth_getBlockByNumber":
+                result = { "number": "0x1", "gasLimit": hex(self.gasLimit) }
+            elif method == "evm_snapshot":
+                self.snapshots.append(self._state())
+                result = hex(len(self.snapshots) - 1)
+            elif method == "evm_revert":
+                self.vaults = self.snapshots[int(params[0], 16)]
+                del self.snapshots[int(params[0], 16):]
+                result = True
+            elif method in ("anvil_impersonateAccount", "anvil_setBalance"):
+                result = None
+            elif method == "eth_getCode":
+                result = "0x60806040" if params[0].lower() in self.deployed else "0x"
+            elif method == "eth_call":
+                (data, error) = self._call(params[0])
+                if error is not None:
+                    return { "jsonrpc": "2.0", "id": r.get("id"), "error": error }
+                result = "0x" + data.hex()
+            elif method == "eth_sendTransaction":
+                tx = params[0]
+                (_, error) = self._call(tx)
+                txHash = "0x" + self.rng.randbytes(32).hex()
+                vault = self.vaults.get(tx["to"].lower())
+                if error is None and vault is not None:
+                    self._exit(vault)
+                gasUsed = INTRINSIC_GAS + (vault["gas"] if vault is not None else 0)
+                self.receipts[txHash] = { "status": "0x1" if error is None else "0x0", "gasUsed": hex(gasUsed) }
+                result = txHash
+            elif method == "eth_getTransactionReceipt":
+                result = self.receipts.get(params[0])
+            else:
+                return { "jsonrpc": "2.0", "id": r.get("id"), "error": { "code": -32601, "message": f"{method} not mocked" } }
+        return { "jsonrpc": "2.0", "id": r.get("id"), "result": result }
+
+    def handle(self, payload):
+        return [self.handle_one(r) for r in payload] if isinstance(payload, list) else self.handle_one(payload)
+
+def start_mock(node, host="127.0.0.1", port=0):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            data = json.dumps(node.handle(payload)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, f"http://{host}:{server.server_address[1]}")
+
+class MockPool(ForkPool):
+    """Mock nodes in place of anvil forks, the Pendle PT vaults do not implement emergencyExit."""
+    def __init__(self, network, registry, manager, size):
+        lpVaults = [v for (p, vaults) in registry.vaults[network].items() if p != "Pendle" for v in vaults.values()]
+        deployed = [v for vaults in registry.vaults[network].values() for v in vaults.values()]
+        # Every node starts from the same state, as forks at the same block would
+        self.servers = [start_mock(MockAnvil(lpVaults, manager, deployed, seed=0)) for _ in range(size)]
+        super().__init__([url for (_, url) in self.servers])
+
+    def close(self):
+        for (server, _) in self.servers:
+            server.shutdown()
+
+def dry_run(batches, pools, managers, jobs):
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Larger batches are started first so that they do not hold up the end of the run
+        ordered = sorted(batches, key=lambda b: -len(b["transactions"]))
+        futures = [executor.submit(pools[b["network"]].run, simulate_batch, managers[b["network"]], b) for b in ordered]
+        for future in as_completed(futures):
+            r = future.result()
+            flags = [f for f in ("exceedsBlockGas", "exceedsBatchCeiling") if r[f]]
+            status = "FAIL" if r["reverted"] or r["exceedsBlockGas"] else "ok"
+            print(f"[{status}] {r['path']}: {len(r['transactions'])} txns, {r['reverted']} reverted, "
+                  f"{r['gasUsed']:,} gas{' ' + ', '.join(flags) if flags else ''}")
+            for t in r["transactions"]:
+                if not t["success"]:
+                    print(f"    {t['to']}: {t['revert']}")
+            results.append(r)
+    return sorted(results, key=lambda r: r["path"])
+
+def gas_estimates(results):
+    """Vault address => largest emergencyExit gas seen, in the format of `emergency-exit --gas-estimates`."""
+    estimates = {}
+    for r in results:
+        for t in r["transactions"]:
+            if t["gasUsed"] is not None:
+                estimates[t["to"]] = max(estimates.get(t["to"], 0), t["gasUsed"])
+    return estimates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="scripts verify-emergency",
+                                     description="Dry runs every emergency exit batch on local anvil forks")
+    parser.add_argument("--network", action="append", choices=list(NETWORKS.keys()),
+                        help="Networks to verify, defaults to all")
+    parser.add_argument("--fork-block", type=int, default=None,
+                        help="Block to fork at, defaults to the latest block of each network")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Anvil instances per network, each runs one batch at a time")
+    parser.add_argument("--offline", action="store_true", help="Fork only from the rpc cache, never the upstream rpcs")
+    parser.add_argument("--mock", action="store_true", help="Run against in process mock nodes instead of anvil")
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--gas-estimates-out", default=None, metavar="FILE",
+                        help="Write vault address => gas used for `scripts emergency-exit --gas-estimates`")
+    args = parser.parse_args(argv)
+
+    from scripts.gnosis_payloads import deployment_constants
+    from scripts.registry import load_registry
+    networks = args.network or list(NETWORKS.keys())
+    batches = load_batches(networks)
+    if not batches:
+        print(f"No emergency batches under {OUTPUT_DIR}")
+        return 0
+    managers = { n: deployment_constants(n)["EMERGENCY_EXIT_MANAGER"] for n in networks }
+
+    if not args.mock and shutil.which("anvil") is None:
+        parser.error("anvil is not installed, install foundry or run with --mock")
+    if args.offline and args.fork_block is None:
+        parser.error("--offline needs --fork-block, the latest block is not in the rpc cache")
+
+    (server, cache, pools, forkBlocks) = (None, None, {}, {})
+    try:
+        if args.mock:
+            registry = load_registry()
+            pools = { n: MockPool(n, registry, managers[n], args.workers) for n in networks }
+        else:
+            from tests.rpc_cache import RpcCache, start_proxy
+            upstreams = {} if args.offline else {
+                n: os.environ[NETWORKS[n]["rpcEnv"]] for n in networks if os.environ.get(NETWORKS[n]["rpcEnv"])
+            }
+            cache = RpcCache()
+            (server, proxyUrl) = start_proxy(cache, upstreams)
+            for n in networks:
+                # Unpinned requests go straight to the upstream, the resolved block pins the forks
+                forkBlock = args.fork_block or int(rpc(f"{proxyUrl}/{n}", "eth_blockNumber", []), 16)
+                forkBlocks[n] = forkBlock
+                pools[n] = AnvilPool(f"{proxyUrl}/{n}/{forkBlock}", forkBlock, args.workers)
+
+        start = time.monotonic()
+        results = dry_run(batches, pools, managers, args.workers * len(networks))
+        duration = time.monotonic() - start
+    finally:
+        for p in pools.values():
+            p.close()
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "forkBlocks": forkBlocks,
+        "batches": len(results),
+        "reverted": sorted(r["path"] for r in results if r["reverted"]),
+        "exceedsBlockGas": sorted(r["path"] for r in results if r["exceedsBlockGas"]),
+        "exceedsBatchCeiling": sorted(r["path"] for r in results if r["exceedsBatchCeiling"]),
+        "duration": duration,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.gas_estimates_out:
+        with open(args.gas_estimates_out, "w") as f:
+            json.dump(gas_estimates(results), f, indent=2, sort_keys=True)
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"rpc cache: {stats['hits']} hits, {stats['misses']} misses")
+    print(f"{len(results)} batches in {duration:.1f}s, {len(report['reverted'])} with reverts, "
+          f"{len(report['exceedsBlockGas'])} over the block gas limit. Report written to {args.report}")
+    return 1 if report["reverted"] or report["exceedsBlockGas"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,148 @@
+import argparse
+import glob
+import hashlib
 import json
+import os
+from scripts.abi_codec import signature, selector, event_topic
 
-from brownie.project import LeveragedVaultsProject
+ABI_DIR = "abi"
+FORGE_OUT = "out"
+STATE_FILE = "./.abi-export-state.json"
+SELECTOR_INDEX = f"{ABI_DIR}/selectors.json"
 
-def write_abi(name):
-    abi = LeveragedVaultsProject._build.get(name)["abi"]
-    with open("abi/{}.json".format(name), "w") as f:
-        json.dump(abi, f, sort_keys=True, indent=4)
+ABIS = [
+    "TradingModule",
+    "FlashLiquidator",
+    "PendlePTGeneric"
+]
+# Merge single sided lp with vault rewarder lib
+MERGED_ABIS = {
+    "ISingleSidedLPStrategyVault": ["ISingleSidedLPStrategyVault", "VaultRewarderLib"],
+}
+
+
+def find_artifact(name, outDir=FORGE_OUT):
+    """
+    Returns the forge artifact for a contract. If the name is compiled from more than
+    one source file, artifacts from contracts/ and interfaces/ are preferred.
+    """
+    matches = sorted(glob.glob(f"{outDir}/*.sol/{name}.json"))
+    if not matches:
+        raise FileNotFoundError(f"no forge artifact for {name} in {outDir}, run forge build first")
+
+    for path in matches:
+        with open(path, "r") as f:
+            artifact = json.load(f)
+        target = artifact.get("metadata", {}).get("settings", {}).get("compilationTarget", {})
+        if any(src.startswith(("contracts/", "interfaces/")) for src in target.keys()):
+            return path
+    return matches[0]
 
-def merge_abis(abi1, abi2):
+def hash_artifacts(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def read_abi(path):
+    with open(path, "r") as f:
+        return json.load(f)["abi"]
+
+def abi_key(entry):
+    if entry["type"] in ("function", "event", "error"):
+        return (entry["type"], signature(entry))
+    # constructor, fallback and receive are unique per contract
+    return (entry["type"],)
+
+def merge_abis(*abis):
     """
-    Merge two JSON objects into a single object.
-    If there are duplicate keys, the value from obj2 will overwrite obj1.
+    Merge ABIs into a single ABI. Entries are matched by type, name and input types;
+    if there are duplicates the entry from the later ABI overwrites the earlier one.
     """
-    a1 = LeveragedVaultsProject._build.get(abi1)["abi"]
-    a2 = LeveragedVaultsProject._build.get(abi2)["abi"]
-    a1.extend(a2)
-
-    with open("abi/{}.json".format(abi1), "w") as f:
-        json.dump(a1, f, sort_keys=True, indent=4)
-
-def main():
-    abis = [
-        "TradingModule",
-        "FlashLiquidator",
-        "PendlePTGeneric"
-    ]
+    merged = {}
     for abi in abis:
-        write_abi(abi)
+        for entry in abi:
+            merged[abi_key(entry)] = entry
+    return list(merged.values())
+
+def write_abi(name, abi):
+    with open(f"{ABI_DIR}/{name}.json", "w") as f:
+        json.dump(abi, f, sort_keys=True, indent=4)
+
+def build_selector_index(abis):
+    """Maps function and error selectors and event topics to the signatures that produce them."""
+    index = { "functions": {}, "events": {}, "errors": {} }
+    for (name, abi) in sorted(abis.items()):
+        for entry in abi:
+            if entry["type"] == "function":
+                (table, key) = ("functions", "0x" + selector(entry).hex())
+            elif entry["type"] == "event":
+                (table, key) = ("events", "0x" + event_topic(entry).hex())
+            elif entry["type"] == "error":
+                (table, key) = ("errors", "0x" + selector(entry).hex())
+            else:
+                continue
+
+            sigs = index[table].setdefault(key, { "signature": signature(entry), "contracts": [] })
+            if name not in sigs["contracts"]:
+                sigs["contracts"].append(name)
+    return index
+
+def load_state():
+    """
+    Forge out directory => name => { artifacts, abi } hashes. Every out directory writes to the same
+    abi/ files, so an export is only skipped when the abi file is still the one written from outDir.
+    """
+    try:
+        with open(STATE_FILE, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    # Drops entries in the earlier layout, name => artifact hash, so that they are exported again
+    return { outDir: names for (outDir, names) in state.items() if isinstance(names, dict) }
+
+def export(outDir=FORGE_OUT, force=False):
+    allStates = load_state()
+    state = allStates.setdefault(os.path.normpath(outDir), {})
+    exports = { name: [name] for name in ABIS }
+    exports.update(MERGED_ABIS)
+    abis = {}
+    written = []
+
+    for (name, sources) in exports.items():
+        artifacts = [find_artifact(s, outDir) for s in sources]
+        artifactHash = hash_artifacts(artifacts)
+        outputFile = f"{ABI_DIR}/{name}.json"
+
+        previous = state.get(name, {})
+        if not force and previous.get("artifacts") == artifactHash and os.path.exists(outputFile) \
+                and previous.get("abi") == hash_artifacts([outputFile]):
+            with open(outputFile, "r") as f:
+                abis[name] = json.load(f)
+            continue
+
+        abis[name] = merge_abis(*[read_abi(a) for a in artifacts]) if len(artifacts) > 1 \
+            else read_abi(artifacts[0])
+        write_abi(name, abis[name])
+        state[name] = { "artifacts": artifactHash, "abi": hash_artifacts([outputFile]) }
+        written.append(name)
+
+    with open(SELECTOR_INDEX, "w") as f:
+        json.dump(build_selector_index(abis), f, sort_keys=True, indent=2)
+    with open(STATE_FILE, "w") as f:
+        json.dump(allStates, f, sort_keys=True, indent=2)
+
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exports ABIs from forge build artifacts")
+    parser.add_argument("--out", default=FORGE_OUT, help="Forge out directory (i.e. out_mainnet)")
+    parser.add_argument("--force", action="store_true", help="Export even if artifacts are unchanged")
+    args = parser.parse_args(argv)
+
+    written = export(args.out, args.force)
+    print(f"Exported {', '.join(written) if written else 'nothing, all ABIs are up to date'}")
 
-    # Merge single sided lp with vault rewarder lib
-    merge_abis("ISingleSidedLPStrategyVault", "VaultRewarderLib")
-    
+if __name__ == "__main__":
+    main()
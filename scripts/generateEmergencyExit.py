@@ -1,16 +1,19 @@
+import argparse
+import glob
 import json
 import os
-from brownie import interface, network
-from brownie.network.contract import Contract
+from scripts.abi_codec import load_abi, get_function, encode_call
+from scripts.registry import load_registry, normalize_network
 
-pools = json.load(open("vaults.json", "r"))
-
-def gnosisBatch(network, txns):
-    if network == "mainnet":
-        chainId = 1
-    elif network == "arbitrum":
-        chainId = 42161
+OUTPUT_DIR = "./emergency"
+# Conservative estimate for a single emergencyExit, override with --gas-estimates when
+# measured figures are available
+GAS_PER_EXIT = 2_500_000
+# Stay well under the block gas limit so the batch is not priced out during an incident
+MAX_BATCH_GAS = 15_000_000
+MAX_BATCH_TXNS = 20
 
+def gnosisBatch(chainId, txns):
     return {
         "chainId": str(chainId),
         "createdAt": 1701985180000,
@@ -22,10 +25,7 @@ def gnosisBatch(network, txns):
         "version": 1.0
     }
 
-def transactionTemplate(vault):
-    v = Contract.from_abi("", vault, interface.ISingleSidedLPStrategyVault.abi)
-    data = v.emergencyExit.encode_input(0, "")
-
+def transactionTemplate(vault, data):
     return {
         "contractMethod": {
             "inputs": [],
@@ -37,29 +37,79 @@ def transactionTemplate(vault):
         "value": "0"
     }
 
+def chunk_transactions(txns, gasEstimates, maxGas, maxTxns):
+    """Splits transactions into consecutive batches under the gas and transaction count ceilings."""
+    chunks = [[]]
+    gas = 0
+    for txn in txns:
+        txnGas = gasEstimates.get(txn["to"], GAS_PER_EXIT)
+        if chunks[-1] and (gas + txnGas > maxGas or len(chunks[-1]) >= maxTxns):
+            chunks.append([])
+            gas = 0
+        chunks[-1].append(txn)
+        gas += txnGas
+    return chunks
+
+def write_batch(path, chainId, txns):
+    with open(path, 'w') as f:
+        json.dump(gnosisBatch(chainId, txns), f, indent=2)
 
-def main():
-    # Can only generate exits for one network at a time
-    networkName = network.show_active()
-    if networkName == "arbitrum-one":
-        networkName = "arbitrum"
+def generate(registry, networks=None, gasEstimates=None, maxGas=MAX_BATCH_GAS, maxTxns=MAX_BATCH_TXNS,
+             outputDir=OUTPUT_DIR):
+    # Every vault exposes the same emergencyExit(uint256,bytes) so the calldata is encoded once. Brownie
+    # encoded the "" argument as a single zero byte, that is kept so existing batches do not change.
+    emergencyExit = get_function(load_abi("ISingleSidedLPStrategyVault"), "emergencyExit")
+    data = encode_call(emergencyExit, [0, b"\x00"])
+    gasEstimates = gasEstimates or {}
+    written = []
 
-    for (n, protocol) in pools.items():
-        if n != networkName:
+    for (n, protocols) in registry.vaults.items():
+        if networks is not None and n not in networks:
             continue
-        for (protocol, vaults) in protocol.items():
+        chainId = registry.deployment(n)["chainId"]
+
+        for (protocol, vaults) in protocols.items():
             allVaultTxns = []
+            os.makedirs(f"{outputDir}/{n}/{protocol}", exist_ok=True)
             for (vaultName, vaultAddress) in vaults.items():
-                txn = transactionTemplate(vaultAddress)
+                txn = transactionTemplate(vaultAddress, data)
                 allVaultTxns.append(txn)
 
-                os.makedirs('./emergency/%s/%s' % (n, protocol), exist_ok=True)
-
                 # Individual txn
-                with open('./emergency/%s/%s/%s.json' % (n, protocol, vaultName), 'w') as f:
-                    json.dump(gnosisBatch(n, [txn]), f, indent=2)
+                path = f"{outputDir}/{n}/{protocol}/{vaultName}.json"
+                write_batch(path, chainId, [txn])
+                written.append(path)
+
+            # All for a protocol, split into multiple batches if it exceeds the ceilings
+            for stale in glob.glob(f"{outputDir}/{n}/{protocol}_*.json") + glob.glob(f"{outputDir}/{n}/{protocol}.json"):
+                os.remove(stale)
+            chunks = chunk_transactions(allVaultTxns, gasEstimates, maxGas, maxTxns)
+            for (i, txns) in enumerate(chunks):
+                path = f"{outputDir}/{n}/{protocol}.json" if len(chunks) == 1 \
+                    else f"{outputDir}/{n}/{protocol}_{i + 1}.json"
+                write_batch(path, chainId, txns)
+                written.append(path)
+
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates emergency exit gnosis batches for every vault")
+    parser.add_argument("--network", action="append", help="Networks to generate, defaults to all")
+    parser.add_argument("--max-gas", type=int, default=MAX_BATCH_GAS, help="Gas ceiling per protocol batch")
+    parser.add_argument("--max-txns", type=int, default=MAX_BATCH_TXNS,
+                        help="Transaction count ceiling per protocol batch")
+    parser.add_argument("--gas-estimates", default=None,
+                        help="json file of vault address => emergencyExit gas used")
+    args = parser.parse_args(argv)
+
+    gasEstimates = None
+    if args.gas_estimates:
+        with open(args.gas_estimates, 'r') as f:
+            gasEstimates = json.load(f)
 
-            # All for a protocol
-            with open('./emergency/%s/%s.json' % (n, protocol), 'w') as f:
-                json.dump(gnosisBatch(n, allVaultTxns), f, indent=2)
+    networks = [normalize_network(n) for n in args.network] if args.network else None
+    written = generate(load_registry(), networks, gasEstimates, args.max_gas, args.max_txns)
+    print(f"Wrote {len(written)} emergency exit batches")
 
+if __name__ == "__main__":
+    main()
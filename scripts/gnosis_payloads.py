@@ -0,0 +1,432 @@
+"""
+Builds the gnosis batches that initialize and configure vault proxies directly from the yaml specs,
+without compiling or running the Deploy_ forge scripts. Calls are encoded the same way as
+scripts/deploy/DeployProxyVault.sol so that the outputs match the broadcast jsons in scripts/deploy.
+
+    python -m scripts gnosis-payloads updateConfig --network mainnet
+    python -m scripts gnosis-payloads initVault --vault PendlePT_sUSDe_28MAY2025_USDC --list-oracle sUSDe --pt-oracle 0x...
+    python -m scripts gnosis-payloads updateConfig --check
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from decimal import Decimal
+from scripts.abi_codec import decode_call, encode_call, get_function, keccak, load_abi, selector
+from scripts.chain import ZERO_ADDRESS
+from scripts.generateEmergencyExit import transactionTemplate
+from scripts.registry import load_registry, normalize_network
+
+OUTPUT_DIR = "./scripts/deploy"
+DEPLOYMENTS_FILE = "contracts/global/{}/Deployments.sol"
+KINDS = ["initVault", "updateConfig", "setMaxBorrowCapacity"]
+
+# Notional and CrossCurrency ABIs are not exported into abi/
+VAULT_CONFIG_PARAMS = {
+    "type": "tuple", "components": [{ "type": t } for t in [
+        "uint16", "uint16", "uint256", "uint16", "uint8", "uint8", "uint8", "uint8", "uint16",
+        "uint16[2]", "uint16", "uint256[2]", "uint8",
+    ]]
+}
+UPDATE_VAULT = { "type": "function", "name": "updateVault",
+                 "inputs": [{ "type": "address" }, VAULT_CONFIG_PARAMS, { "type": "uint80" }] }
+SET_MAX_BORROW_CAPACITY = { "type": "function", "name": "setMaxBorrowCapacity",
+                            "inputs": [{ "type": "address" }, { "type": "uint80" }] }
+GRANT_ROLE = { "type": "function", "name": "grantRole", "inputs": [{ "type": "bytes32" }, { "type": "address" }] }
+CROSS_CURRENCY_INITIALIZE = { "type": "function", "name": "initialize",
+                              "inputs": [{ "type": "string" }, { "type": "uint16" }, { "type": "uint16" }] }
+
+# getTestVaultConfig for each harness is read from the solidity source, getDeploymentConfig overrides
+# these from the yaml config
+STRATEGY_VAULT_HARNESS = "tests/StrategyVaultHarness.sol"
+TEST_VAULT_HARNESS = {
+    "SingleSidedLP": "tests/SingleSidedLP/harness/SingleSidedLPHarness.sol",
+    "PendlePT": "tests/Staking/harness/BaseStakingHarness.sol",
+    "CrossCurrency": "tests/CrossCurrency/CrossCurrencyHarness.sol",
+}
+HARNESS_FLAG = re.compile(r"uint16 internal constant (\w+)\s*=\s*1 << (\d+);")
+TEST_VAULT_CONFIG_BODY = re.compile(r"function getTestVaultConfig\(\)[^{]*\{(.*?)\n    \}", re.S)
+TEST_VAULT_CONFIG_FIELD = re.compile(r"p\.(\w+)\s*=\s*([^;]+);")
+YAML_CONFIG = [
+    "feeRate5BPS", "liquidationRate", "reserveFeeShare", "maxBorrowMarketIndex", "minCollateralRatioBPS",
+    "maxRequiredAccountCollateralRatioBPS", "maxDeleverageCollateralRatioBPS", "minAccountBorrowSize",
+]
+# VaultConfigParams in encoding order, used to name the fields that differ from a broadcast
+VAULT_CONFIG_FIELDS = [
+    "flags", "borrowCurrencyId", "minAccountBorrowSize", "minCollateralRatioBPS", "feeRate5BPS",
+    "liquidationRate", "reserveFeeShare", "maxBorrowMarketIndex", "maxDeleverageCollateralRatioBPS",
+    "secondaryBorrowCurrencies", "maxRequiredAccountCollateralRatioBPS", "minAccountSecondaryBorrow",
+    "excessCashLiquidationBonus",
+]
+
+SOLIDITY_UNITS = { "seconds": 1, "minutes": 60, "hours": 3600, "days": 86400, "weeks": 604800 }
+DEPLOYMENT_CONSTANT = re.compile(r"(\w+)\s*=\s*(?:\w+\()?(0x[0-9a-fA-F]{40})\)?;")
+
+
+def sol_int(value):
+    """Evaluates a yaml value the way solc reads it as a literal, i.e. 0.01e8, 10_000 or 1 days."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    (number, _, unit) = str(value).strip().partition(" ")
+    result = Decimal(number.replace("_", "")) * SOLIDITY_UNITS.get(unit.strip() or "seconds", 1)
+    if result != result.to_integral_value():
+        raise ValueError(f"{value} is not an integer literal")
+    return int(result)
+
+def sol_address(value):
+    return ZERO_ADDRESS if value == "address(0)" else value
+
+def deployment_constants(network):
+    """Address constants from the Deployments.sol the forge profile for the network compiles against."""
+    with open(DEPLOYMENTS_FILE.format(network), "r") as f:
+        return dict(DEPLOYMENT_CONSTANT.findall(f.read()))
+
+def role(name):
+    return keccak(name)
+
+def test_vault_config(family):
+    """Literal fields set by getTestVaultConfig in the harness for the family, flags are resolved
+    against the constants in StrategyVaultHarness."""
+    with open(STRATEGY_VAULT_HARNESS, "r") as f:
+        flags = { name: 1 << int(shift) for (name, shift) in HARNESS_FLAG.findall(f.read()) }
+    with open(TEST_VAULT_HARNESS[family], "r") as f:
+        body = TEST_VAULT_CONFIG_BODY.search(f.read())
+    if body is None:
+        raise ValueError(f"getTestVaultConfig not found in {TEST_VAULT_HARNESS[family]}")
+
+    config = {}
+    for (field, value) in TEST_VAULT_CONFIG_FIELD.findall(body.group(1)):
+        if field == "flags":
+            config[field] = sum(flags[f.strip()] for f in value.split("|"))
+        elif not value.startswith("_m."):
+            config[field] = sol_int(value)
+    return config
+
+def deployment_config(family, context):
+    """Returns (VaultConfigParams tuple, maxPrimaryBorrow) as returned by harness.getDeploymentConfig."""
+    p = test_vault_config(family)
+    p["borrowCurrencyId"] = context["borrowCurrencyId"] if family == "PendlePT" \
+        else context["borrowToken"]["currencyId"] if family == "CrossCurrency" \
+        else context["primaryBorrowCurrency"]
+    for key in YAML_CONFIG:
+        p[key] = sol_int(context["config"][key])
+
+    params = (
+        p["flags"], p["borrowCurrencyId"], p["minAccountBorrowSize"], p["minCollateralRatioBPS"],
+        p["feeRate5BPS"], p["liquidationRate"], p["reserveFeeShare"], p["maxBorrowMarketIndex"],
+        p["maxDeleverageCollateralRatioBPS"], [0, 0], p["maxRequiredAccountCollateralRatioBPS"],
+        [0, 0], p["excessCashLiquidationBonus"],
+    )
+    return (params, sol_int(context["config"]["maxPrimaryBorrow"]))
+
+def vault_name(family, context):
+    if family == "PendlePT":
+        return f"Pendle:PT {context['stakeSymbol']} {context['expiry']}:[{context['primaryBorrowCurrency']}]"
+    return context["vaultName"]
+
+def initialize_data(family, context):
+    if family == "SingleSidedLP":
+        s = context["settings"]
+        settings = (0, sol_int(s["maxPoolShare"]), sol_int(s["oraclePriceDeviationLimitPercent"]),
+                    sol_int(s["numRewardTokens"]), sol_int(s["forceClaimAfter"]))
+        initialize = get_function(load_abi("ISingleSidedLPStrategyVault"), "initialize")
+        return encode_call(initialize, [(vault_name(family, context), context["primaryBorrowCurrency"], settings)])
+    if family == "PendlePT":
+        initialize = get_function(load_abi("PendlePTGeneric"), "initialize")
+        return encode_call(initialize, [vault_name(family, context), context["borrowCurrencyId"]])
+    return encode_call(CROSS_CURRENCY_INITIALIZE, [
+        vault_name(family, context), context["borrowToken"]["currencyId"], context["lendToken"]["currencyId"]
+    ])
+
+def trading_permissions(family, context):
+    """(token, (allowSell, dexFlags, tradeTypeFlags)) pairs as returned by harness.getTradingPermissions."""
+    if family == "CrossCurrency":
+        return [(t["tokenAddress"], (True, t["dexFlags"], 0)) for t in (context["lendToken"], context["borrowToken"])]
+
+    permissions = []
+    if family == "PendlePT" or not context["settings"].get("useAccountClaim"):
+        # Rewards are sold on 0x with EXACT_IN_SINGLE and EXACT_IN_BATCH
+        permissions += [(r["tokenAddress"], (True, 8, 5)) for r in context["rewards"]]
+    permissions += [
+        (sol_address(p["tokenAddress"]), (True, 1 << sol_int(p["dexId"]), sol_int(p["tradeTypeFlags"])))
+        for p in context.get("permissions", [])
+    ]
+    return permissions
+
+def required_oracles(family, context, ptOracle):
+    """(symbol, token, oracle) as returned by harness.getRequiredOracles, the PT oracle is only known once deployed."""
+    if family == "CrossCurrency":
+        return [(t["symbol"], t["tokenAddress"], t["oracleAddress"]) for t in (context["lendToken"], context["borrowToken"])]
+    oracles = [(o["symbol"], o["tokenAddress"], o["oracleAddress"]) for o in context["oracles"]]
+    if family == "PendlePT":
+        oracles.insert(0, ("PT", context["ptAddress"], ptOracle))
+    return oracles
+
+def init_calls(family, context, proxy, constants, listOracles, ptOracle=None):
+    """
+    The initVault calls of DeployProxyVault.run. Whether an oracle is already listed on the trading
+    module is read on chain there, here listOracles names the symbols (or PT) that need setPriceOracle.
+    """
+    tradingModule = constants["TRADING_MODULE"]
+    rewardSettings = [r["tokenAddress"] for r in context["rewards"]] \
+        if family == "SingleSidedLP" and context["settings"].get("useAccountClaim") else []
+    reinvestmentRole = family == "SingleSidedLP" and not context["settings"].get("useAccountClaim")
+    calls = [(proxy, initialize_data(family, context))]
+
+    if rewardSettings:
+        updateRewardToken = get_function(load_abi("ISingleSidedLPStrategyVault"), "updateRewardToken")
+        calls += [(proxy, encode_call(updateRewardToken, [i, t, 0, 0])) for (i, t) in enumerate(rewardSettings)]
+    elif reinvestmentRole:
+        calls.append((proxy, encode_call(GRANT_ROLE, [role("REWARD_REINVESTMENT_ROLE"), constants["TREASURY_MANAGER"]])))
+    calls.append((proxy, encode_call(GRANT_ROLE, [role("EMERGENCY_EXIT_ROLE"), constants["EMERGENCY_EXIT_MANAGER"]])))
+
+    setTokenPermissions = get_function(load_abi("TradingModule"), "setTokenPermissions")
+    for (token, permission) in trading_permissions(family, context):
+        calls.append((tradingModule, encode_call(setTokenPermissions, [proxy, token, permission])))
+
+    setPriceOracle = get_function(load_abi("TradingModule"), "setPriceOracle")
+    for (symbol, token, oracle) in required_oracles(family, context, ptOracle):
+        if symbol in listOracles:
+            if oracle is None:
+                raise ValueError("--pt-oracle is required to list the PT oracle")
+            calls.append((tradingModule, encode_call(setPriceOracle, [token, oracle])))
+
+    # The forge script sizes the batch for three role calls when there are no reward settings, so
+    # a vault without the reinvestment role ends with one empty transaction. Kept so outputs match.
+    if not rewardSettings and not reinvestmentRole:
+        calls.append((ZERO_ADDRESS, "0x"))
+    return calls
+
+def update_config_calls(family, context, proxy, constants):
+    (params, maxPrimaryBorrow) = deployment_config(family, context)
+    return [(constants["NOTIONAL"], encode_call(UPDATE_VAULT, [proxy, params, maxPrimaryBorrow]))]
+
+def borrow_capacity_calls(family, context, proxy, constants):
+    (_, maxPrimaryBorrow) = deployment_config(family, context)
+    return [(constants["NOTIONAL"], encode_call(SET_MAX_BORROW_CAPACITY, [proxy, maxPrimaryBorrow]))]
+
+def to_transaction(to, data):
+    from eth_utils import to_checksum_address
+    return transactionTemplate(to_checksum_address(to), data)
+
+def gnosis_batch(chainId, txns, createdAt):
+    """Same layout as GnosisHelper.generateBatch after the deploy scripts convert numbers to strings."""
+    return {
+        "chainId": str(chainId),
+        "createdAt": createdAt,
+        "meta": {
+            "name": "Transactions Batch",
+            "txBuilderVersion": "1.16.1"
+        },
+        "transactions": txns,
+        "version": "1.0"
+    }
+
+def dump_batch(batch):
+    # forge writes numbers and no trailing newline, the deploy scripts pass the file through jq
+    # which converts numbers to strings and adds one
+    return json.dumps(batch, indent=2) + ("\n" if isinstance(batch["createdAt"], str) else "")
+
+def select_vaults(registry, networks, names):
+    """Yields (family, network, name, context) for every yaml entry matching the network and name filters."""
+    from tests.generate import FAMILIES, iter_entries, load_inputs
+    families = list(FAMILIES.keys())
+    (specs, _) = load_inputs(families, registry)
+    for (family, network, _, outputFile, context) in iter_entries(families, networks, specs, registry):
+        name = os.path.basename(outputFile)[:-len(".t.sol")]
+        proxy = context.get("existingDeployment")
+        if names and name not in names and (proxy or "").lower() not in names:
+            continue
+        yield (family, network, name, context)
+
+def build(kind, family, context, proxy, constants, listOracles=(), ptOracle=None):
+    if kind == "initVault":
+        return init_calls(family, context, proxy, constants, listOracles, ptOracle)
+    if kind == "updateConfig":
+        return update_config_calls(family, context, proxy, constants)
+    return borrow_capacity_calls(family, context, proxy, constants)
+
+def broadcast_oracles(transactions, tradingModule):
+    """token => oracle for each setPriceOracle call in a broadcast, the oracles that were unlisted when it was written."""
+    setPriceOracle = get_function(load_abi("TradingModule"), "setPriceOracle")
+    prefix = "0x" + selector(setPriceOracle).hex()
+    listed = {}
+    for t in transactions:
+        if t["to"].lower() == tradingModule.lower() and t["data"].lower().startswith(prefix):
+            (token, oracle) = decode_call([setPriceOracle], t["data"])[1]
+            listed[token.lower()] = oracle
+    return listed
+
+def listed_oracles(family, context, listed):
+    """The (listOracles, ptOracle) arguments of init_calls for the token => oracle pairs a broadcast lists."""
+    symbols = { symbol for (symbol, token, _) in required_oracles(family, context, None) if token.lower() in listed }
+    ptOracle = listed.get(context["ptAddress"].lower()) if family == "PendlePT" else None
+    return (symbols, ptOracle)
+
+def check(source, calls, chainId):
+    """Compares a rebuilt batch against an existing broadcast json using its createdAt, returns a diff or None."""
+    existing = json.loads(source)
+    rebuilt = dump_batch(gnosis_batch(chainId, [to_transaction(t, d) for (t, d) in calls], existing["createdAt"]))
+    if rebuilt == source:
+        return None
+
+    existingTxns = [(t["to"].lower(), t["data"].lower()) for t in existing["transactions"]]
+    rebuiltTxns = [(t.lower(), d.lower()) for (t, d) in calls]
+    for (i, (a, b)) in enumerate(zip(existingTxns, rebuiltTxns)):
+        if a != b:
+            return f"transaction {i} differs, {a[0]} {a[1][:10]} / {b[0]} {b[1][:10]}"
+    if len(existingTxns) != len(rebuiltTxns):
+        return f"{len(existingTxns)} transactions in the broadcast, {len(rebuiltTxns)} rebuilt"
+    return "transactions match, formatting differs"
+
+def stale_fields(kind, transactions, calls):
+    """
+    Names what the yaml or the vault contract changed since a broadcast was written, when that alone
+    explains why it differs from the rebuild. Returns None when anything else differs.
+    """
+    if kind == "initVault":
+        # The initialize selector only changes with the vault implementation, an earlier version of
+        # DeployProxyVault wrote the rest of those batches
+        if transactions[0]["data"][:10].lower() != calls[0][1][:10].lower():
+            return ["initialize signature"]
+        return None
+
+    entry = UPDATE_VAULT if kind == "updateConfig" else SET_MAX_BORROW_CAPACITY
+    if len(transactions) != 1 or transactions[0]["to"].lower() != calls[0][0].lower():
+        return None
+    try:
+        (_, existing) = decode_call([entry], transactions[0]["data"])
+    except ValueError:
+        return None
+    (_, rebuilt) = decode_call([entry], calls[0][1])
+    if existing[0].lower() != rebuilt[0].lower():
+        return None
+    (existingFields, rebuiltFields) = ({ "maxPrimaryBorrow": existing[-1] }, { "maxPrimaryBorrow": rebuilt[-1] })
+    if kind == "updateConfig":
+        existingFields.update(zip(VAULT_CONFIG_FIELDS, existing[1]))
+        rebuiltFields.update(zip(VAULT_CONFIG_FIELDS, rebuilt[1]))
+    changed = [k for k in rebuiltFields if existingFields[k] != rebuiltFields[k]]
+    if not changed or any(k not in YAML_CONFIG + ["maxPrimaryBorrow"] for k in changed):
+        return None
+    return [f"{k} {existingFields[k]} => {rebuiltFields[k]}" for k in changed]
+
+def check_broadcasts(kind, outDir, registry, networks, selected, proxy=None, names=()):
+    """
+    Rebuilds every tracked broadcast json of the kind from the yaml and compares it byte for byte. The
+    oracles a broadcast lists are taken from its own setPriceOracle calls, since whether an oracle was
+    already on the trading module depends on when it was written. Returns the process exit status.
+    """
+    byProxy = {}
+    for (family, network, name, context) in selected:
+        address = proxy or context.get("existingDeployment")
+        if address is not None:
+            byProxy[address.lower()] = (family, network, name, context)
+    chainIds = { str(registry.deployment(n)["chainId"]) for n in networks }
+
+    counts = { "identical": 0, "stale": 0, "mismatched": 0, "unmatched": 0 }
+    for fileName in sorted(os.listdir(outDir)):
+        (address, _, suffix) = fileName.partition(".")
+        if suffix != f"{kind}.json":
+            continue
+        path = os.path.join(outDir, fileName)
+        with open(path, "r") as f:
+            source = f.read()
+        existing = json.loads(source)
+        if existing["chainId"] not in chainIds or ((names or proxy) and address.lower() not in byProxy):
+            continue
+        if address.lower() not in byProxy:
+            # i.e. a vault whose spec moved on to the next expiry
+            counts["unmatched"] += 1
+            print(f"{path}: no yaml entry for this vault, skipped")
+            continue
+
+        (family, network, _, context) = byProxy[address.lower()]
+        constants = deployment_constants(network)
+        (listOracles, ptOracle) = listed_oracles(
+            family, context, broadcast_oracles(existing["transactions"], constants["TRADING_MODULE"])
+        ) if kind == "initVault" else ((), None)
+        calls = build(kind, family, context, address, constants, listOracles, ptOracle)
+        result = check(source, calls, registry.deployment(network)["chainId"])
+        if result is None:
+            counts["identical"] += 1
+            print(f"{path}: identical")
+            continue
+
+        stale = stale_fields(kind, existing["transactions"], calls)
+        if stale is None:
+            counts["mismatched"] += 1
+            print(f"{path}: {result}")
+        else:
+            counts["stale"] += 1
+            print(f"{path}: written before the current yaml, {', '.join(stale)}")
+
+    checked = counts["identical"] + counts["stale"] + counts["mismatched"]
+    print(f"{counts['identical']} of {checked} broadcast jsons rebuilt byte for byte, {counts['stale']} written "
+          f"before the current yaml, {counts['unmatched']} without a yaml entry")
+    return 1 if counts["mismatched"] else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds vault gnosis batches from the yaml specs without forge")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--network", action="append", default=None)
+    parser.add_argument("--vault", action="append", default=[],
+                        help="Generated test name (i.e. PendlePT_sUSDe_28MAY2025_USDC) or proxy address")
+    parser.add_argument("--proxy", default=None, help="Proxy address for a vault that is not in vaults.json yet")
+    parser.add_argument("--list-oracle", action="append", default=[], metavar="SYMBOL",
+                        help="initVault: token whose oracle is not yet on the trading module, PT for the pendle oracle")
+    parser.add_argument("--pt-oracle", default=None, help="initVault: the deployed PendlePTOracle")
+    parser.add_argument("--per-network", action="store_true",
+                        help="Write one batch per network instead of one per vault")
+    parser.add_argument("--created-at", type=int, default=None, help="Batch timestamp in ms, defaults to now")
+    parser.add_argument("--out", default=OUTPUT_DIR)
+    parser.add_argument("--check", action="store_true",
+                        help="Compare against the existing broadcast jsons instead of writing")
+    args = parser.parse_args(argv)
+
+    registry = load_registry()
+    networks = [normalize_network(n) for n in (args.network or registry.networks)]
+    names = { v.lower() if v.startswith("0x") else v for v in args.vault }
+    listOracles = set(args.list_oracle)
+    if args.pt_oracle:
+        listOracles.add("PT")
+    createdAt = str(args.created_at if args.created_at is not None else int(time.time()) * 1000)
+
+    selected = list(select_vaults(registry, networks, names))
+    if args.proxy and len(selected) != 1:
+        print(f"--proxy applies to a single vault but {len(selected)} are selected, narrow with --vault",
+              file=sys.stderr)
+        return 1
+    if args.check:
+        if args.list_oracle or args.pt_oracle:
+            parser.error("--check takes the listed oracles from each broadcast")
+        return check_broadcasts(args.kind, args.out, registry, networks, selected, args.proxy, names)
+
+    batches = {}
+    for (family, network, name, context) in selected:
+        proxy = args.proxy or context.get("existingDeployment")
+        if proxy is None:
+            if names:
+                print(f"{name} has no deployment in vaults.json, pass --proxy", file=sys.stderr)
+                return 1
+            continue
+
+        constants = deployment_constants(network)
+        chainId = registry.deployment(network)["chainId"]
+        calls = build(args.kind, family, context, proxy, constants, listOracles, args.pt_oracle)
+        key = network if args.per_network else proxy
+        batches.setdefault(key, (chainId, []))[1].extend(calls)
+
+    os.makedirs(args.out, exist_ok=True)
+    for (key, (chainId, calls)) in batches.items():
+        path = os.path.join(args.out, f"{key}.{args.kind}.json")
+        with open(path, "w") as f:
+            f.write(dump_batch(gnosis_batch(chainId, [to_transaction(t, d) for (t, d) in calls], createdAt)))
+        print(f"Wrote {path} with {len(calls)} transactions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+Streams vault accounts that are close to liquidation. Health factors are read through Multicall3
+in JSON-RPC batches over a small pool of keep alive connections, with a bounded request rate.
+
+Accounts are rescanned on a schedule that depends on how close they are to their vault's minimum
+collateral ratio, so that each new block only reads the accounts that could have become
+liquidatable plus any account touched by a Notional transfer in that block.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scripts.abi_codec import encode_call, event_topic, selector
+from scripts.chain import AGGREGATE3, AGGREGATE3_OUTPUT, MULTICALL3, ZERO_ADDRESS, decode_hex
+from scripts.registry import load_registry, normalize_network
+
+HEALTH_FACTORS = { "type": "function", "name": "getVaultAccountHealthFactors",
+                   "inputs": [{ "type": "address" }, { "type": "address" }] }
+HEALTH_FACTORS_OUTPUT = ["(int256,int256,int256,int256[3])", "int256[3]", "uint256[3]"]
+VAULT_CONFIG = { "type": "function", "name": "getVaultConfig", "inputs": [{ "type": "address" }] }
+VAULT_CONFIG_OUTPUT = [
+    "(address,uint16,uint16,int256,int256,int256,int256,int256,uint256,int256,uint16[2],(int256,int256,uint256),int256,int256[2])"
+]
+TRANSFER_EVENTS = [
+    { "type": "event", "name": "TransferSingle",
+      "inputs": [{ "type": "address" }, { "type": "address" }, { "type": "address" }, { "type": "uint256" }, { "type": "uint256" }] },
+    { "type": "event", "name": "TransferBatch",
+      "inputs": [{ "type": "address" }, { "type": "address" }, { "type": "address" }, { "type": "uint256[]" }, { "type": "uint256[]" }] },
+]
+
+# Accounts under NEAR_RATIO times their minimum collateral ratio are reported and read every block,
+# healthier accounts are read less often, up to once every MAX_INTERVAL blocks
+NEAR_RATIO = 1.1
+MAX_INTERVAL = 50
+CALLS_PER_MULTICALL = 200
+MAX_BATCH_SIZE = 20
+MAX_CALLS_PER_BLOCK = 5_000
+POLL_INTERVAL = 2.0
+# Providers cap the block range or the result size of eth_getLogs, transfers are queried in windows
+# of LOG_WINDOW blocks and a window is halved whenever the provider rejects it as too large
+LOG_WINDOW = 2_000
+LOG_RANGE_ERROR = re.compile(r"range|too many|more than|limit exceeded|response size|-32005", re.IGNORECASE)
+
+
+class RateLimiter:
+    """Spaces out requests so that no more than rate are started per second."""
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next - now
+            self.next = max(now, self.next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class RpcClient:
+    """
+    Async JSON-RPC client over a fixed pool of keep alive HTTP connections. Requests are grouped
+    into JSON-RPC batches and blocking socket io runs on worker threads, one per connection.
+    """
+    def __init__(self, url, connections=4, rate=20, maxBatchSize=MAX_BATCH_SIZE):
+        self.url = urllib.parse.urlsplit(url)
+        self.path = (self.url.path or "/") + (f"?{self.url.query}" if self.url.query else "")
+        self.connections = connections
+        self.limiter = RateLimiter(rate)
+        self.maxBatchSize = maxBatchSize
+        self.pool = None
+        self.requests = 0
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.url.scheme == "https" else http.client.HTTPConnection
+        return cls(self.url.hostname, self.url.port, timeout=30)
+
+    def _post(self, conn, body):
+        conn.request("POST", self.path, body, { "Content-Type": "application/json" })
+        resp = conn.getresponse()
+        return json.loads(resp.read())
+
+    async def _send(self, batch):
+        if self.pool is None:
+            self.pool = asyncio.Queue()
+            for _ in range(self.connections):
+                self.pool.put_nowait(self._connect())
+
+        await self.limiter.acquire()
+        conn = await self.pool.get()
+        body = json.dumps(batch)
+        try:
+            try:
+                results = await asyncio.to_thread(self._post, conn, body)
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle keep alive connection, retry once on a new one
+                conn.close()
+                conn = self._connect()
+                results = await asyncio.to_thread(self._post, conn, body)
+        finally:
+            self.pool.put_nowait(conn)
+        self.requests += 1
+
+        if not isinstance(results, list):
+            # The whole batch was rejected
+            raise RuntimeError(f"rpc batch failed: {results.get('error')}")
+        return { r["id"]: r for r in results }
+
+    async def batch(self, calls, errors=False):
+        """
+        Sends (method, params) calls in batches, returns the results in order or raises on an rpc error.
+        With errors set a failed call is returned as a RuntimeError in its place instead.
+        """
+        payloads = [{ "jsonrpc": "2.0", "id": i, "method": m, "params": p } for (i, (m, p)) in enumerate(calls)]
+        chunks = [payloads[i:i + self.maxBatchSize] for i in range(0, len(payloads), self.maxBatchSize)]
+        responses = {}
+        for r in await asyncio.gather(*[self._send(c) for c in chunks]):
+            responses.update(r)
+
+        results = []
+        for p in payloads:
+            r = responses.get(p["id"], { "error": "missing response" })
+            if "error" in r:
+                error = RuntimeError(f"{p['method']} failed: {r['error']}")
+                if not errors:
+                    raise error
+                results.append(error)
+            else:
+                results.append(r["result"])
+        return results
+
+    async def call(self, method, params):
+        return (await self.batch([(method, params)]))[0]
+
+    def close(self):
+        while self.pool is not None and not self.pool.empty():
+            self.pool.get_nowait().close()
+
+class HealthScanner:
+    """
+    Tracks the collateral ratio of every (vault, account) pair. ratio is the account collateral
+    ratio divided by the vault minimum, below one the account can be liquidated.
+    """
+    def __init__(self, client, notional, vaults, accounts=None, nearRatio=NEAR_RATIO,
+                 maxCallsPerBlock=MAX_CALLS_PER_BLOCK, callsPerMulticall=CALLS_PER_MULTICALL, logWindow=LOG_WINDOW):
+        self.client = client
+        self.notional = notional
+        self.vaults = vaults
+        self.nearRatio = nearRatio
+        self.maxCallsPerBlock = maxCallsPerBlock
+        self.callsPerMulticall = callsPerMulticall
+        self.logWindow = logWindow
+        self.minCollateralRatio = {}
+        # (vault, account) => { "ratio", "block", "next" }
+        self.positions = {}
+        self.pending = set()
+        for (vault, vaultAccounts) in (accounts or {}).items():
+            for account in vaultAccounts:
+                self.pending.add((vault.lower(), account.lower()))
+
+    async def multicall(self, calls, block):
+        """Reads (target, calldata) calls through Multicall3, one eth_call per chunk in a single rpc batch."""
+        chunks = [calls[i:i + self.callsPerMulticall] for i in range(0, len(calls), self.callsPerMulticall)]
+        results = await self.client.batch([
+            ("eth_call", [{ "to": MULTICALL3, "data": encode_call(AGGREGATE3, [[(t, True, d) for (t, d) in c]]) }, hex(block)])
+            for c in chunks
+        ])
+        return [r for data in results for r in decode_hex(AGGREGATE3_OUTPUT, data)[0]]
+
+    async def load_configs(self, block):
+        calls = [(self.notional, bytes.fromhex(encode_call(VAULT_CONFIG, [v])[2:])) for v in self.vaults]
+        for (vault, (success, data)) in zip(self.vaults, await self.multicall(calls, block)):
+            if success:
+                # minCollateralRatio is in the same precision as the account collateral ratio
+                self.minCollateralRatio[vault.lower()] = decode_hex(VAULT_CONFIG_OUTPUT, data.hex())[0][5]
+
+    def next_interval(self, ratio):
+        if ratio < self.nearRatio:
+            return 1
+        # Linear in the distance to the near threshold, an account 2x over its minimum is read every 10 blocks
+        return max(1, min(MAX_INTERVAL, int((ratio - self.nearRatio) * 10 / self.nearRatio) + 1))
+
+    def due(self, block):
+        """Pairs to read at this block, lowest ratio first, capped at maxCallsPerBlock. New pairs go first."""
+        due = [(0, p) for p in self.pending]
+        due += [(s["ratio"], p) for (p, s) in self.positions.items() if s["next"] <= block and p not in self.pending]
+        # Ties in pair order so that the same state always reads with the same calldata
+        due.sort()
+        return [p for (_, p) in due[:self.maxCallsPerBlock]]
+
+    async def scan(self, block):
+        """Reads every due pair at a block, returns the positions that are near or below liquidation."""
+        pairs = self.due(block)
+        calls = [
+            (self.notional, bytes.fromhex(encode_call(HEALTH_FACTORS, [account, vault])[2:]))
+            for (vault, account) in pairs
+        ]
+        found = []
+        for ((vault, account), (success, data)) in zip(pairs, await self.multicall(calls, block) if calls else []):
+            self.pending.discard((vault, account))
+            if not success or vault not in self.minCollateralRatio:
+                continue
+            (h, maxDeposit, sharesToLiquidator) = decode_hex(HEALTH_FACTORS_OUTPUT, data.hex())
+            (collateralRatio, totalDebt, vaultShareValue, _) = h
+            if totalDebt == 0 and vaultShareValue == 0:
+                # No position in this vault
+                self.positions.pop((vault, account), None)
+                continue
+
+            ratio = collateralRatio / self.minCollateralRatio[vault] if self.minCollateralRatio[vault] else float("inf")
+            # Some spreading so that accounts scanned together do not all come due on the same block
+            interval = self.next_interval(ratio)
+            self.positions[(vault, account)] = {
+                "ratio": ratio, "block": block, "next": block + interval + random.randrange(interval),
+            }
+            if ratio < self.nearRatio:
+                found.append({
+                    "block": block,
+                    "vault": vault,
+                    "account": account,
+                    "collateralRatio": collateralRatio,
+                    "minCollateralRatio": self.minCollateralRatio[vault],
+                    "ratio": round(ratio, 6),
+                    "liquidatable": ratio < 1,
+                    "debtInPrimary": totalDebt,
+                    "vaultShareValue": vaultShareValue,
+                    "maxLiquidatorDeposit": list(maxDeposit),
+                    "vaultSharesToLiquidator": list(sharesToLiquidator),
+                })
+        return (found, len(pairs))
+
+    async def transfer_logs(self, fromBlock, toBlock):
+        """Notional ERC1155 transfer logs in the block range, queried in windows the provider accepts."""
+        logs = []
+        start = fromBlock
+        while start <= toBlock:
+            end = min(start + self.logWindow - 1, toBlock)
+            try:
+                logs.extend(await self.client.call("eth_getLogs", [{
+                    "address": self.notional, "fromBlock": hex(start), "toBlock": hex(end),
+                    "topics": [["0x" + event_topic(e).hex() for e in TRANSFER_EVENTS]],
+                }]))
+            except RuntimeError as e:
+                if self.logWindow == 1 or not LOG_RANGE_ERROR.search(str(e)):
+                    raise
+                # Later windows keep the smaller size, the provider limit does not change
+                self.logWindow = max(1, self.logWindow // 2)
+                continue
+            start = end + 1
+        return logs
+
+    async def touched_accounts(self, fromBlock, toBlock):
+        """Marks every account in a Notional ERC1155 transfer in the block range for a rescan in every vault."""
+        logs = await self.transfer_logs(fromBlock, toBlock)
+        accounts = set()
+        for log in logs:
+            for topic in log["topics"][2:4]:
+                account = "0x" + topic[-40:]
+                if account not in (ZERO_ADDRESS, self.notional.lower()):
+                    accounts.add(account.lower())
+        for account in accounts:
+            for vault in self.vaults:
+                self.pending.add((vault.lower(), account))
+        return accounts
+
+    async def watch(self, fromBlock=None, poll=POLL_INTERVAL, maxBlocks=None):
+        """Yields (block, found, stats) for each new block, stats include the number of calls and latency."""
+        block = int(await self.client.call("eth_blockNumber", []), 16)
+        await self.load_configs(block)
+        lastBlock = (fromBlock - 1) if fromBlock is not None else block - 1
+        seen = 0
+        while maxBlocks is None or seen < maxBlocks:
+            if block > lastBlock:
+                start = time.monotonic()
+                touched = await self.touched_accounts(lastBlock + 1, block)
+                (found, reads) = await self.scan(block)
+                lastBlock = block
+                seen += 1
+                yield (block, found, {
+                    "reads": reads, "touched": len(touched), "tracked": len(self.positions),
+                    "latency": round(time.monotonic() - start, 3), "requests": self.client.requests,
+                })
+            else:
+                await asyncio.sleep(poll)
+            block = int(await self.client.call("eth_blockNumber", []), 16)
+
+class MockNode:
+    """
+    Minimal stand in for a node with Notional deployed, answers eth_blockNumber, eth_getLogs and
+    Multicall3 eth_calls to getVaultConfig / getVaultAccountHealthFactors from in memory state.
+    Collateral ratios drift randomly each block so that accounts cross the liquidation threshold.
+    """
+    def __init__(self, notional, vaults, accountsPerVault, seed=0, blockTime=1.0, maxLogRange=None):
+        self.rng = random.Random(seed)
+        self.notional = notional.lower()
+        self.start = time.monotonic()
+        self.blockTime = blockTime
+        self.lock = threading.Lock()
+        self.minCollateralRatio = { v.lower(): 100_000_000 for v in vaults }
+        self.accounts = {
+            (v.lower(), "0x" + self.rng.randbytes(20).hex()): self.rng.uniform(0.9, 5.0) * 100_000_000
+            for v in vaults for _ in range(accountsPerVault)
+        }
+        self.lastBlock = 0
+        self.calls = 0
+        # Rejects eth_getLogs over more blocks than this, as hosted providers do
+        self.maxLogRange = maxLogRange
+        self.logRanges = []
+
+    def block(self):
+        return 1_000_000 + int((time.monotonic() - self.start) / self.blockTime)
+
+    def _drift(self):
+        with self.lock:
+            current = self.block()
+            for _ in range(current - self.lastBlock if self.lastBlock else 0):
+                for k in self.accounts:
+                    self.accounts[k] *= self.rng.uniform(0.995, 1.005)
+            self.lastBlock = current
+
+    def health_factors(self, vault, account):
+        from eth_abi import encode
+        cr = int(self.accounts.get((vault.lower(), account.lower()), 0))
+        (debt, value) = (10**8, 10**8 + cr // 1000) if cr else (0, 0)
+        return encode(HEALTH_FACTORS_OUTPUT, [(cr, debt, value, [debt, 0, 0]), [0, 0, 0], [0, 0, 0]])
+
+    def vault_config(self, vault):
+        from eth_abi import encode
+        minCR = self.minCollateralRatio[vault.lower()]
+        return encode(VAULT_CONFIG_OUTPUT, [(vault, 0, 1, 0, 0, minCR, 0, 0, 2, 0, [0, 0], (0, 0, 0), 0, [0, 0])])
+
+    def inner_call(self, target, data):
+        args = decode_hex(["address", "address"] if data[:4] == selector(HEALTH_FACTORS) else ["address"], data[4:].hex())
+        if target.lower() != self.notional:
+            return (False, b"")
+        if data[:4] == selector(HEALTH_FACTORS):
+            return (True, self.health_factors(args[1], args[0]))
+        if data[:4] == selector(VAULT_CONFIG) and args[0].lower() in self.minCollateralRatio:
+            return (True, self.vault_config(args[0]))
+        return (False, b"")
+
+    def handle_one(self, r):
+        from eth_abi import encode
+        self.calls += 1
+        (method, params) = (r.get("method"), r.get("params", []))
+        if method == "eth_blockNumber":
+            result = hex(self.block())
+        elif method == "eth_getLogs":
+            (fromBlock, toBlock) = (int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16))
+            if self.maxLogRange is not None and toBlock - fromBlock + 1 > self.maxLogRange:
+                return { "jsonrpc": "2.0", "id": r.get("id"),
+                         "error": { "code": -32005, "message": f"block range is too large, max {self.maxLogRange}" } }
+            self.logRanges.append((fromBlock, toBlock))
+            result = []
+        elif method == "eth_call" and params[0]["to"].lower() == MULTICALL3.lower():
+            data = bytes.fromhex(params[0]["data"][2:])
+            (calls,) = decode_hex(["(address,bool,bytes)[]"], data[4:].hex())
+            result = "0x" + encode(AGGREGATE3_OUTPUT, [[self.inner_call(t, d) for (t, _, d) in calls]]).hex()
+        else:
+            return { "jsonrpc": "2.0", "id": r.get("id"), "error": { "code": -32601, "message": f"{method} not mocked" } }
+        return { "jsonrpc": "2.0", "id": r.get("id"), "result": result }
+
+    def handle(self, payload):
+        self._drift()
+        return [self.handle_one(r) for r in payload] if isinstance(payload, list) else self.handle_one(payload)
+
+def start_mock(node, host="127.0.0.1", port=0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            data = json.dumps(node.handle(payload)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, f"http://{host}:{server.server_address[1]}")
+
+def load_accounts(path):
+    """json file of vault => [accounts], i.e. exported from the subgraph."""
+    if path is None:
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+async def run(scanner, fromBlock, maxBlocks, output):
+    try:
+        async for (block, found, stats) in scanner.watch(fromBlock, maxBlocks=maxBlocks):
+            for f in found:
+                print(json.dumps(f), file=output, flush=True)
+            print(f"block {block}: {stats['reads']} reads, {len(found)} near liquidation, "
+                  f"{stats['tracked']} positions tracked in {stats['latency']}s", file=sys.stderr)
+    finally:
+        scanner.client.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streams vault accounts near liquidation as json lines")
+    parser.add_argument("--network", required=True)
+    parser.add_argument("--rpc", default=None, help="JSON-RPC url, required unless --mock is set")
+    parser.add_argument("--accounts", default=None, help="json file of vault => [accounts] to seed the scan")
+    parser.add_argument("--from-block", type=int, default=None,
+                        help="Discover accounts from Notional transfers since this block")
+    parser.add_argument("--log-window", type=int, default=LOG_WINDOW,
+                        help="Blocks per eth_getLogs query, halved when the provider rejects the range")
+    parser.add_argument("--near-ratio", type=float, default=NEAR_RATIO)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20, help="Maximum http requests per second")
+    parser.add_argument("--max-calls-per-block", type=int, default=MAX_CALLS_PER_BLOCK)
+    parser.add_argument("--blocks", type=int, default=None, help="Stop after this many blocks")
+    parser.add_argument("--mock", type=int, default=None, metavar="ACCOUNTS_PER_VAULT",
+                        help="Scan a local mock node with this many random accounts per vault")
+    args = parser.parse_args(argv)
+
+    registry = load_registry()
+    network = normalize_network(args.network)
+    notional = registry.deployment(network)["notional"]
+    vaults = [v for pools in registry.vaults[network].values() for v in pools.values()]
+    accounts = load_accounts(args.accounts)
+
+    rpc = args.rpc
+    if args.mock is not None:
+        node = MockNode(notional, vaults, args.mock)
+        (_, rpc) = start_mock(node)
+        accounts = {}
+        for (vault, account) in node.accounts:
+            accounts.setdefault(vault, []).append(account)
+    elif rpc is None:
+        parser.error("--rpc is required unless --mock is set")
+
+    scanner = HealthScanner(
+        RpcClient(rpc, args.connections, args.rate), notional, vaults, accounts,
+        args.near_ratio, args.max_calls_per_block, logWindow=args.log_window
+    )
+    try:
+        asyncio.run(run(scanner, args.from_block, args.blocks, sys.stdout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 # flake8: noqa
-import json
 from brownie import network, interface, FlashLiquidator, accounts
 from brownie.network.contract import Contract
+from scripts.registry import load_registry
 
 def get_router_args(router):
     return [
@@ -28,23 +28,10 @@ def get_addresses():
         networkName = "mainnet"
     if networkName == "arbitrum-fork" or networkName == "arbitrum-current":
         networkName = "arbitrum-one"
-    output_file = "v3.{}.json".format(networkName)
-    addresses = None
-    with open(output_file, "r") as f:
-        addresses = json.load(f)
 
-    if networkName == "mainnet":
-        liquidators = [
-            FlashLiquidator.at('0x77B4507981607402aB9692A1628053c39eCf4fFb'),
-            FlashLiquidator.at('0xA573bD9cAF777B354f46f635Ca339d074bD40A66'),
-            FlashLiquidator.at('0x12AEC56DFc38413C5FEa5506041F49416b17BdA1')
-        ]
-    elif networkName == "arbitrum-one":
-        liquidators = [
-            FlashLiquidator.at('0xe8f28Cf944aBCFD98dACdcbA284AcFC56a6E929b'),
-            FlashLiquidator.at('0x24B5FF402440aB10618F3798253d2cD5801E40F7'),
-            FlashLiquidator.at('0xc91864Be1b097c9c85565cDB013Ba2307FFB492a')
-        ]
+    registry = load_registry()
+    addresses = registry.deployment(networkName)
+    liquidators = [FlashLiquidator.at(l) for l in registry.liquidators(networkName)]
 
     notional = Contract.from_abi("Notional", addresses["notional"], abi=interface.NotionalProxy.abi)
     tradingModule = Contract.from_abi("TradingModule", addresses["tradingModule"], abi=interface.ITradingModule.abi)
@@ -86,3 +73,10 @@ def main():
     # WARNING: you cannot liquidate two accounts with different maturities in one batch,
     # you will need to use two liquidator contracts or wait the 1 minute exit vault time
     # between liquidation contracts.
+    #
+    # To split calldata into batches by maturity across all the liquidator contracts, use:
+    #   python -m scripts.liquidation <INPUT_JSON> --network <NETWORK>
+    #
+    # Or leave it to the liquidation daemon, which watches every block and rotates the batches
+    # across the liquidator contracts itself:
+    #   python -m scripts liquidation-daemon --network <NETWORK> --rpc <RPC> --templates <TEMPLATES_JSON>
@@ -0,0 +1,180 @@
+import argparse
+import json
+import sys
+from scripts.abi_codec import load_abi, get_function, decode_call, encode_call, to_json
+from scripts.registry import load_registry
+
+# Rough gas estimates for a flashLiquidate call, override on the command line if the
+# vault being liquidated is more expensive to exit (i.e. withdraw requests, many pool tokens).
+BASE_GAS = 600_000
+GAS_PER_ACCOUNT = 900_000
+MAX_BATCH_GAS = 15_000_000
+
+
+def decode_liquidations(abi, calldata):
+    """
+    Expands flashLiquidate or flashLiquidateBatch calldata into one entry per liquidation
+    params struct, each with the flash loan that was requested for it.
+    """
+    (entry, args) = decode_call(abi, calldata)
+    if entry["name"] == "flashLiquidate":
+        (lenders, assets, amounts, params) = ([args[0]], [args[1]], [args[2]], [args[3]])
+    elif entry["name"] == "flashLiquidateBatch":
+        (lenders, assets, amounts, params) = args
+    else:
+        raise ValueError(f"cannot plan liquidations from a call to {entry['name']}")
+
+    return [{
+        "flashLender": to_json(lender),
+        "asset": to_json(asset),
+        "amount": amount,
+        "liquidationType": p[0],
+        "vault": to_json(p[1]),
+        "accounts": to_json(p[2]),
+        "redeemData": to_json(p[3]),
+        "currencyId": p[4],
+        "currencyIndex": p[5],
+    } for (lender, asset, amount, p) in zip(lenders, assets, amounts, params)]
+
+def group_accounts(liquidations, maturities, amounts):
+    """
+    Groups accounts that can be liquidated in a single call, accounts must share a vault,
+    maturity and liquidation parameters. Flash loan amounts are taken from the amounts
+    map or else split evenly (rounding up) from the original call.
+    """
+    groups = {}
+    for l in liquidations:
+        evenSplit = -(-l["amount"] // len(l["accounts"])) if l["accounts"] else 0
+        key = (l["vault"], l["flashLender"], l["asset"], l["liquidationType"],
+               l["redeemData"], l["currencyId"], l["currencyIndex"])
+        for account in l["accounts"]:
+            maturity = maturities.get(account, maturities.get(account.lower()))
+            if maturity is None:
+                raise ValueError(f"no maturity provided for account {account}")
+            amount = amounts.get(account, amounts.get(account.lower(), evenSplit))
+            groups.setdefault((maturity, *key), []).append((account, amount))
+
+    return groups
+
+def split_group(accounts, maxAccounts, maxFlashLoan):
+    """
+    Splits a group of (account, amount) into batches under the account and flash loan limits.
+    Returns (batches, oversized), oversized holds the accounts whose amount alone is over the
+    flash loan limit, a batch with one of them would revert at the flash lender.
+    """
+    batches = [[]]
+    oversized = []
+    total = 0
+    for (account, amount) in sorted(accounts, key=lambda a: -a[1]):
+        if maxFlashLoan is not None and amount > maxFlashLoan:
+            oversized.append((account, amount))
+            continue
+        batch = batches[-1]
+        if batch and (len(batch) >= maxAccounts or (maxFlashLoan is not None and total + amount > maxFlashLoan)):
+            batches.append([])
+            batch = batches[-1]
+            total = 0
+        batch.append((account, amount))
+        total += amount
+    return ([b for b in batches if b], oversized)
+
+def assign_batches(batches, liquidators):
+    """
+    Bin packs batches onto liquidator contracts. A liquidator can only hold one maturity
+    per vault at a time, so within a round each (liquidator, vault) is limited to a single
+    maturity. Batches that do not fit are pushed to the next round, which must wait for
+    the vault exit delay. Largest batches are placed first onto the least loaded liquidator.
+    """
+    rounds = []
+    for b in sorted(batches, key=lambda b: (-b["amount"], -len(b["accounts"]))):
+        placed = False
+        for (r, slots) in enumerate(rounds):
+            candidates = [
+                l for l in liquidators
+                if slots["maturity"].get((l, b["vault"]), b["maturity"]) == b["maturity"]
+            ]
+            if candidates:
+                liquidator = min(candidates, key=lambda l: slots["gas"].get(l, 0))
+                placed = True
+                break
+
+        if not placed:
+            rounds.append({ "maturity": {}, "gas": {} })
+            (r, slots) = (len(rounds) - 1, rounds[-1])
+            liquidator = min(liquidators, key=lambda l: slots["gas"].get(l, 0))
+
+        slots["maturity"][(liquidator, b["vault"])] = b["maturity"]
+        slots["gas"][liquidator] = slots["gas"].get(liquidator, 0) + b["gas"]
+        b["round"] = r
+        b["liquidator"] = liquidator
+
+    return sorted(batches, key=lambda b: (b["round"], b["liquidator"], b["maturity"]))
+
+def plan(calldata, maturities, liquidators, amounts=None, maxGas=MAX_BATCH_GAS,
+         maxFlashLoan=None, baseGas=BASE_GAS, gasPerAccount=GAS_PER_ACCOUNT, abi=None):
+    """Returns (batches, skipped), skipped are the (account, amount) over maxFlashLoan on their own."""
+    abi = abi or load_abi("FlashLiquidator")
+    flashLiquidate = get_function(abi, "flashLiquidate")
+    maxAccounts = max(1, (maxGas - baseGas) // gasPerAccount)
+
+    liquidations = [l for data in calldata for l in decode_liquidations(abi, data)]
+    groups = group_accounts(liquidations, maturities, amounts or {})
+
+    (batches, skipped) = ([], [])
+    for ((maturity, vault, lender, asset, liqType, redeemData, currencyId, currencyIndex), accounts) in groups.items():
+        (split, oversized) = split_group(accounts, maxAccounts, maxFlashLoan)
+        skipped.extend(oversized)
+        for batch in split:
+            batchAccounts = [a for (a, _) in batch]
+            amount = sum(a for (_, a) in batch)
+            params = (liqType, vault, batchAccounts, bytes.fromhex(redeemData[2:]), currencyId, currencyIndex)
+            batches.append({
+                "maturity": maturity,
+                "vault": vault,
+                "accounts": batchAccounts,
+                "asset": asset,
+                "flashLender": lender,
+                "amount": amount,
+                "gas": baseGas + gasPerAccount * len(batchAccounts),
+                "calldata": encode_call(flashLiquidate, [lender, asset, amount, params]),
+            })
+
+    return (assign_batches(batches, liquidators), skipped)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plans flash liquidation batches offline")
+    parser.add_argument("input", help="""json file with "calldata" (list of flashLiquidate calldata from the
+        vault liquidator service), "maturities" (account => maturity) and optionally "amounts"
+        (account => flash loan amount)""")
+    parser.add_argument("--network", required=True, help="Network to look up liquidator contracts for")
+    parser.add_argument("--max-gas", type=int, default=MAX_BATCH_GAS, help="Gas budget per batch")
+    parser.add_argument("--max-flash-loan", type=int, default=None,
+                        help="Maximum flash loan per batch in asset precision")
+    parser.add_argument("--base-gas", type=int, default=BASE_GAS)
+    parser.add_argument("--gas-per-account", type=int, default=GAS_PER_ACCOUNT)
+    parser.add_argument("--output", default=None, help="Write the plan to a file instead of stdout")
+    args = parser.parse_args(argv)
+
+    with open(args.input, "r") as f:
+        spec = json.load(f)
+
+    calldata = spec["calldata"] if isinstance(spec["calldata"], list) else [spec["calldata"]]
+    (batches, skipped) = plan(
+        calldata, spec["maturities"], load_registry().liquidators(args.network), spec.get("amounts"),
+        args.max_gas, args.max_flash_loan, args.base_gas, args.gas_per_account
+    )
+
+    output = json.dumps(batches, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    rounds = max((b["round"] for b in batches), default=-1) + 1
+    print(f"{len(batches)} batches over {rounds} rounds", file=sys.stderr)
+    for (account, amount) in skipped:
+        print(f"WARNING: skipped {account}, its flash loan of {amount} alone is over --max-flash-loan", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,781 @@
+"""
+Long running vault liquidator. Everything that does not change between blocks is built once at
+start up and kept in memory: the rpc connections, the liquidator contracts, the flashLiquidate
+calldata for each vault up to the accounts and flash loan amount, gas estimates per vault and batch
+size and the next nonce of each sending account.
+
+On every new block the health scanner finds the liquidatable accounts, they are grouped into
+batches by vault and maturity, and each batch is placed on a liquidator contract that is free to
+take that maturity. A liquidator holds the vault shares of one maturity until the one minute vault
+exit delay has passed, so rotating batches across the liquidators sends different maturities in the
+same block instead of waiting out the delay.
+
+    python -m scripts liquidation-daemon --network mainnet --rpc $MAINNET_RPC_URL \\
+        --templates templates.json --accounts accounts.json --key-env LIQUIDATOR_KEY
+    python -m scripts liquidation-daemon --network mainnet --e2e --mock-send-failures 0.2
+    python -m scripts liquidation-daemon --network mainnet --e2e --anvil SingleSidedLP_Convex_USDC_xUSDT \\
+        --templates templates.json --accounts accounts.json
+
+templates.json maps each vault to the flashLiquidate arguments other than the accounts and amount,
+{ "<vault>": { "flashLender", "asset", "decimals", "liquidationType", "redeemData", "currencyId",
+"currencyIndex", "maxFlashLoan" }}, everything but the first three is optional.
+
+Each block prints a json line with the time spent in detection, encoding (including any gas estimate
+not in the cache), signing and submission, percentiles over the run are written to --metrics.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from scripts.abi_codec import decode_call, encode_call, get_function, load_abi, selector
+from scripts.chain import NETWORKS, decode_hex
+from scripts.health_scanner import (
+    HEALTH_FACTORS_OUTPUT, NEAR_RATIO, HealthScanner, MockNode, RpcClient, load_accounts, start_mock
+)
+from scripts.liquidation import BASE_GAS, GAS_PER_ACCOUNT, MAX_BATCH_GAS, split_group
+from scripts.registry import load_registry, normalize_network
+
+# Seconds a liquidator must hold the vault shares of one maturity before it can take another
+EXIT_DELAY = 60
+GAS_MARGIN = 1.2
+POLL_INTERVAL = 0.25
+INTERNAL_PRECISION = 10**8
+# Liquidation types in FlashLiquidator.LiquidationType
+DELEVERAGE_VAULT_ACCOUNT = 1
+# Accounts found liquidatable this many blocks before the end of an e2e run must have been liquidated
+SETTLE_BLOCKS = 3
+RECEIPT_TIMEOUT = 15
+
+GET_VAULT_ACCOUNT = { "type": "function", "name": "getVaultAccount",
+                      "inputs": [{ "type": "address" }, { "type": "address" }] }
+VAULT_ACCOUNT_OUTPUT = ["(int256,uint256,uint256,address,int256,uint256)"]
+OWNER = { "type": "function", "name": "owner", "inputs": [] }
+
+
+@functools.lru_cache(maxsize=None)
+def flash_liquidate():
+    return get_function(load_abi("FlashLiquidator"), "flashLiquidate")
+
+def word(value):
+    if isinstance(value, str):
+        return bytes(12) + bytes.fromhex(value[2:])
+    return value.to_bytes(32, "big")
+
+class Template:
+    """
+    flashLiquidate calldata for one vault with everything except the flash loan amount and the
+    accounts encoded up front, encode() only splices those two into the static parts.
+    """
+    def __init__(self, vault, flashLender, asset, decimals=18, liquidationType=DELEVERAGE_VAULT_ACCOUNT,
+                 redeemData="0x", currencyId=0, currencyIndex=0, maxFlashLoan=None):
+        from eth_abi import encode
+        self.vault = vault
+        self.decimals = decimals
+        self.currencyIndex = currencyIndex
+        self.maxFlashLoan = maxFlashLoan
+        # flashLiquidate(address,address,uint256,(uint8,address,address[],bytes,uint16,uint16)), the
+        # params tuple is dynamic so it sits after the four head words and starts with its own six
+        self.head = selector(flash_liquidate()) + word(flashLender) + word(asset)
+        self.params = word(4 * 32) + word(liquidationType) + word(vault) + word(6 * 32)
+        self.currency = word(currencyId) + word(currencyIndex)
+        # Drops the offset word, leaving the length and padded bytes of redeemData
+        self.redeemData = encode(["bytes"], [bytes.fromhex(redeemData[2:])])[32:]
+
+    def amount(self, maxLiquidatorDeposit):
+        """Flash loan in asset precision for an account's deposit, which is in internal precision."""
+        return maxLiquidatorDeposit[self.currencyIndex] * 10**self.decimals // INTERNAL_PRECISION
+
+    def encode(self, amount, accounts):
+        redeemOffset = 7 * 32 + 32 * len(accounts)
+        return "0x" + b"".join([
+            self.head, word(amount), self.params, word(redeemOffset), self.currency,
+            word(len(accounts)), *[word(a) for a in accounts], self.redeemData,
+        ]).hex()
+
+def load_templates(path):
+    with open(path, "r") as f:
+        spec = json.load(f)
+    return { vault.lower(): Template(vault, **t) for (vault, t) in spec.items() }
+
+class LiquidatorSlots:
+    """
+    Tracks the maturity each liquidator holds in each vault. A batch goes to a liquidator that
+    already holds its maturity, else to the next liquidator in rotation whose hold has expired.
+    """
+    def __init__(self, liquidators, exitDelay=EXIT_DELAY):
+        self.liquidators = liquidators
+        self.exitDelay = exitDelay
+        # (liquidator, vault) => (maturity, until)
+        self.held = {}
+        self.next = 0
+
+    def acquire(self, vault, maturity, now):
+        """Returns (liquidator, previous hold) or (None, None) when every liquidator holds another maturity."""
+        n = len(self.liquidators)
+        order = [self.liquidators[(self.next + i) % n] for i in range(n)]
+        candidates = [l for l in order if self.held.get((l, vault), (None,))[0] == maturity]
+        candidates += [l for l in order if self.held.get((l, vault), (None, 0))[1] <= now]
+        if not candidates:
+            return (None, None)
+        liquidator = candidates[0]
+        self.next = (self.liquidators.index(liquidator) + 1) % n
+        previous = self.held.get((liquidator, vault))
+        self.held[(liquidator, vault)] = (maturity, now + self.exitDelay)
+        return (liquidator, previous)
+
+    def release(self, liquidator, vault, previous):
+        """Restores the hold from before a batch that was never sent."""
+        if previous is None:
+            self.held.pop((liquidator, vault), None)
+        else:
+            self.held[(liquidator, vault)] = previous
+
+    def confirm(self, liquidator, vault, maturity, now):
+        # The exit delay runs from the block the liquidation was mined in
+        self.held[(liquidator, vault)] = (maturity, now + self.exitDelay)
+
+class Signer:
+    """
+    Signs with the private keys in the given environment variables, or leaves signing to the node
+    for unlocked senders (anvil, a local node) and sends with eth_sendTransaction.
+    """
+    def __init__(self, senders=(), keyEnvs=()):
+        self.accounts = {}
+        if keyEnvs:
+            from eth_account import Account
+            for env in keyEnvs:
+                account = Account.from_key(os.environ[env])
+                self.accounts[account.address.lower()] = account
+        self.senders = [s.lower() for s in senders] + list(self.accounts.keys())
+
+    def sign(self, tx):
+        """Returns the (method, params) that submits the transaction."""
+        account = self.accounts.get(tx["from"])
+        if account is None:
+            return ("eth_sendTransaction", [{ k: hex(v) if isinstance(v, int) else v for (k, v) in tx.items() }])
+        signed = account.sign_transaction({ k: v for (k, v) in tx.items() if k != "from" })
+        raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+        return ("eth_sendRawTransaction", ["0x" + bytes(raw).hex()])
+
+class Metrics:
+    STAGES = ["detection", "encoding", "signing", "submission"]
+
+    def __init__(self):
+        self.timings = { s: [] for s in self.STAGES }
+        self.counts = {}
+
+    def record(self, stage, seconds):
+        self.timings[stage].append(seconds * 1000)
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def summary(self):
+        stages = {}
+        for (stage, values) in self.timings.items():
+            ordered = sorted(values)
+            pct = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3) if ordered else None
+            stages[stage] = { "count": len(ordered), "p50": pct(0.5), "p95": pct(0.95), "max": pct(1) }
+        return { "latencyMs": stages, **self.counts }
+
+class LiquidationDaemon:
+    def __init__(self, client, scanner, liquidators, templates, signer, exitDelay=EXIT_DELAY,
+                 maxGas=MAX_BATCH_GAS, baseGas=BASE_GAS, gasPerAccount=GAS_PER_ACCOUNT):
+        self.client = client
+        self.scanner = scanner
+        self.templates = templates
+        self.signer = signer
+        self.slots = LiquidatorSlots(liquidators, exitDelay)
+        self.maxAccounts = max(1, (maxGas - baseGas) // gasPerAccount)
+        # Each liquidator is always sent from the same account so their nonces advance independently
+        self.senderOf = { l: signer.senders[i % len(signer.senders)] for (i, l) in enumerate(liquidators) }
+        self.chainId = None
+        self.nonces = {}
+        self.startNonces = {}
+        # (vault, number of accounts) => gas limit
+        self.gasCache = {}
+        # (vault, account) => maturity
+        self.maturities = {}
+        # tx hash => sent batch
+        self.inflight = {}
+        self.pendingAccounts = set()
+        self.liquidatableSince = {}
+        self.sent = []
+        self.lastBlock = None
+        self.metrics = Metrics()
+
+    async def start(self):
+        senders = sorted(set(self.senderOf.values()))
+        results = await self.client.batch(
+            [("eth_chainId", [])] + [("eth_getTransactionCount", [s, "pending"]) for s in senders]
+        )
+        self.chainId = int(results[0], 16)
+        for (s, nonce) in zip(senders, results[1:]):
+            self.nonces[s] = self.startNonces[s] = int(nonce, 16)
+
+    async def resync_nonce(self, sender):
+        self.nonces[sender] = int(await self.client.call("eth_getTransactionCount", [sender, "pending"]), 16)
+
+    async def load_maturities(self, keys, block):
+        missing = [k for k in keys if k not in self.maturities]
+        calls = [
+            (self.scanner.notional, bytes.fromhex(encode_call(GET_VAULT_ACCOUNT, [account, vault])[2:]))
+            for (vault, account) in missing
+        ]
+        for (key, (success, data)) in zip(missing, await self.scanner.multicall(calls, block) if calls else []):
+            if success:
+                self.maturities[key] = decode_hex(VAULT_ACCOUNT_OUTPUT, data.hex())[0][1]
+
+    async def detect(self, block, found):
+        """Liquidatable positions that are not already in flight, with their maturities, and the gas price."""
+        for f in found:
+            key = (f["vault"], f["account"])
+            if f["liquidatable"]:
+                self.liquidatableSince.setdefault(key, block)
+            else:
+                self.liquidatableSince.pop(key, None)
+        positions = [
+            f for f in found
+            if f["liquidatable"] and f["vault"] in self.templates and (f["vault"], f["account"]) not in self.pendingAccounts
+        ]
+        (_, gasPrice) = await asyncio.gather(
+            self.load_maturities([(f["vault"], f["account"]) for f in positions], block),
+            self.client.call("eth_gasPrice", []),
+        )
+        return ([f for f in positions if (f["vault"], f["account"]) in self.maturities], int(gasPrice, 16))
+
+    def build_batches(self, positions, now):
+        groups = {}
+        for f in positions:
+            template = self.templates[f["vault"]]
+            amount = template.amount(f["maxLiquidatorDeposit"])
+            if amount > 0:
+                groups.setdefault((f["vault"], self.maturities[(f["vault"], f["account"])]), []).append((f["account"], amount))
+
+        (batches, deferred) = ([], 0)
+        for ((vault, maturity), accounts) in sorted(groups.items()):
+            template = self.templates[vault]
+            (split, oversized) = split_group(accounts, self.maxAccounts, template.maxFlashLoan)
+            for (account, amount) in oversized:
+                print(f"{vault}: {account} needs a flash loan of {amount}, over the template maximum", file=sys.stderr)
+            self.metrics.count("oversized", len(oversized))
+            for batch in split:
+                (liquidator, previous) = self.slots.acquire(vault, maturity, now)
+                if liquidator is None:
+                    # Picked up again on a later block once a liquidator's hold expires
+                    deferred += len(batch)
+                    continue
+                batchAccounts = [a for (a, _) in batch]
+                amount = sum(a for (_, a) in batch)
+                batches.append({
+                    "vault": vault, "maturity": maturity, "liquidator": liquidator, "previous": previous,
+                    "sender": self.senderOf[liquidator], "accounts": batchAccounts, "amount": amount,
+                    "data": template.encode(amount, batchAccounts),
+                })
+        return (batches, deferred)
+
+    async def estimate_gas(self, batches):
+        """Fills in the gas limit from the cache, estimating the misses concurrently. Drops batches that revert."""
+        misses = {}
+        for b in batches:
+            key = (b["vault"], len(b["accounts"]))
+            if key in self.gasCache:
+                self.metrics.count("gasCacheHits")
+            else:
+                misses.setdefault(key, b)
+        results = await self.client.batch([
+            ("eth_estimateGas", [{ "from": b["sender"], "to": b["liquidator"], "data": b["data"] }])
+            for b in misses.values()
+        ], errors=True) if misses else []
+
+        failed = set()
+        for (key, result) in zip(misses.keys(), results):
+            self.metrics.count("gasCacheMisses")
+            if isinstance(result, Exception):
+                print(f"{key[0]}: gas estimate for {key[1]} accounts failed, {result}", file=sys.stderr)
+                failed.add(key)
+            else:
+                self.gasCache[key] = int(int(result, 16) * GAS_MARGIN)
+
+        ready = []
+        for b in batches:
+            key = (b["vault"], len(b["accounts"]))
+            if key in failed:
+                self.slots.release(b["liquidator"], b["vault"], b["previous"])
+                self.metrics.count("estimateFailed")
+                continue
+            b["gas"] = self.gasCache[key]
+            ready.append(b)
+        return ready
+
+    def sign(self, batches, gasPrice):
+        for b in batches:
+            sender = b["sender"]
+            b["nonce"] = self.nonces[sender]
+            b["gasPrice"] = gasPrice
+            self.nonces[sender] += 1
+            b["request"] = self.signer.sign({
+                "from": sender, "to": b["liquidator"], "data": b["data"], "value": 0,
+                "gas": b["gas"], "gasPrice": gasPrice, "nonce": b["nonce"], "chainId": self.chainId,
+            })
+
+    async def submit(self, batches):
+        """
+        Sends the next batch of every sender in one json rpc batch, so a round where each sender has a
+        single batch is one round trip. A failed send would leave a nonce gap that holds every later
+        transaction of the sender, so its nonce is synced from the node and the sender's remaining
+        batches are signed again before they are sent.
+        """
+        queues = {}
+        for b in sorted(batches, key=lambda b: b["nonce"]):
+            queues.setdefault(b["sender"], []).append(b)
+        submitted = 0
+        while queues:
+            wave = [q.pop(0) for q in queues.values()]
+            results = await self.client.batch([b["request"] for b in wave], errors=True)
+            now = time.time()
+            for (b, result) in zip(wave, results):
+                if isinstance(result, Exception):
+                    print(f"{b['liquidator']}: {b['vault']} batch of {len(b['accounts'])} not sent, {result}", file=sys.stderr)
+                    self.slots.release(b["liquidator"], b["vault"], b["previous"])
+                    self.metrics.count("sendFailed")
+                    await self.resync_nonce(b["sender"])
+                    remaining = queues[b["sender"]]
+                    self.sign(remaining, b["gasPrice"])
+                    self.metrics.count("resigned", len(remaining))
+                    continue
+                b["hash"] = result
+                b["sentAt"] = now
+                self.inflight[result] = b
+                self.pendingAccounts.update((b["vault"], a.lower()) for a in b["accounts"])
+                self.sent.append(b)
+                submitted += 1
+            queues = { s: q for (s, q) in queues.items() if q }
+        self.metrics.count("submitted", submitted)
+        return submitted
+
+    async def check_receipts(self):
+        hashes = list(self.inflight.keys())
+        if not hashes:
+            return 0
+        receipts = await self.client.batch([("eth_getTransactionReceipt", [h]) for h in hashes])
+        now = time.time()
+        for (h, receipt) in zip(hashes, receipts):
+            if receipt is None:
+                continue
+            b = self.inflight.pop(h)
+            b["status"] = int(receipt["status"], 16)
+            b["gasUsed"] = int(receipt["gasUsed"], 16)
+            keys = [(b["vault"], a.lower()) for a in b["accounts"]]
+            self.pendingAccounts.difference_update(keys)
+            for key in keys:
+                # The position changed, read its maturity again if it comes back
+                self.maturities.pop(key, None)
+            if b["status"] == 1:
+                self.slots.confirm(b["liquidator"], b["vault"], b["maturity"], now)
+                for key in keys:
+                    self.liquidatableSince.pop(key, None)
+                self.metrics.count("confirmed")
+            else:
+                # The cached gas limit may be too low, estimate again next time
+                self.gasCache.pop((b["vault"], len(b["accounts"])), None)
+                self.metrics.count("reverted")
+                print(f"{h}: {b['vault']} liquidation reverted", file=sys.stderr)
+        return len(self.inflight)
+
+    async def on_block(self, block, found, stats):
+        start = time.perf_counter()
+        (positions, gasPrice) = await self.detect(block, found)
+        detected = time.perf_counter()
+        # Holds are timed by the wall clock, close enough to block time for a one minute delay
+        (batches, deferred) = self.build_batches(positions, time.time())
+        batches = await self.estimate_gas(batches)
+        encoded = time.perf_counter()
+        self.sign(batches, gasPrice)
+        signed = time.perf_counter()
+        submitted = await self.submit(batches) if batches else 0
+        done = time.perf_counter()
+        await self.check_receipts()
+
+        latency = {
+            # The scan itself is timed by the scanner
+            "detection": stats["latency"] + detected - start,
+            "encoding": encoded - detected,
+            "signing": signed - encoded,
+            "submission": done - signed,
+        }
+        if batches:
+            for (stage, seconds) in latency.items():
+                self.metrics.record(stage, seconds)
+        else:
+            self.metrics.record("detection", latency["detection"])
+        self.metrics.count("deferred", deferred)
+        self.lastBlock = block
+        return {
+            "block": block, "found": len(found), "liquidatable": len(positions), "batches": len(batches),
+            "submitted": submitted, "deferred": deferred, "inflight": len(self.inflight),
+            "latencyMs": { k: round(v * 1000, 3) for (k, v) in latency.items() },
+        }
+
+    async def run(self, fromBlock=None, poll=POLL_INTERVAL, maxBlocks=None, output=sys.stdout):
+        await self.start()
+        async for (block, found, stats) in self.scanner.watch(fromBlock, poll=poll, maxBlocks=maxBlocks):
+            print(json.dumps(await self.on_block(block, found, stats)), file=output, flush=True)
+
+    async def drain(self, timeout=RECEIPT_TIMEOUT, poll=POLL_INTERVAL):
+        deadline = time.monotonic() + timeout
+        while await self.check_receipts() and time.monotonic() < deadline:
+            await asyncio.sleep(poll)
+
+def verify(daemon, settleBlocks=SETTLE_BLOCKS):
+    """End to end checks over a finished run, returns a list of failures."""
+    failures = []
+    for b in daemon.sent:
+        if b.get("status") is None:
+            failures.append(f"{b['hash']} was never mined")
+        elif b["status"] != 1:
+            failures.append(f"{b['hash']} liquidating {len(b['accounts'])} accounts in {b['vault']} reverted")
+
+    for (sender, start) in daemon.startNonces.items():
+        nonces = sorted(b["nonce"] for b in daemon.sent if b["sender"] == sender)
+        if nonces != list(range(start, start + len(nonces))):
+            failures.append(f"{sender} sent nonces {nonces}, expected a contiguous run from {start}")
+
+    last = {}
+    for b in sorted(daemon.sent, key=lambda b: b["sentAt"]):
+        key = (b["liquidator"], b["vault"])
+        if key in last and last[key]["maturity"] != b["maturity"] \
+                and b["sentAt"] - last[key]["sentAt"] < daemon.slots.exitDelay:
+            failures.append(f"{b['liquidator']} took maturities {last[key]['maturity']} and {b['maturity']} "
+                            f"of {b['vault']} inside the exit delay")
+        last[key] = b
+
+    for ((vault, account), since) in daemon.liquidatableSince.items():
+        if vault in daemon.templates and since <= daemon.lastBlock - settleBlocks:
+            failures.append(f"{account} in {vault} liquidatable since block {since} was not liquidated")
+    return failures
+
+class MockChain(MockNode):
+    """
+    MockNode that also mines transactions, for the end to end run when anvil is not installed.
+    Transactions are mined in nonce order per sender on the next block. flashLiquidate reverts if an
+    account is not liquidatable, the accounts are in different maturities or the liquidator still
+    holds another maturity of the vault inside the exit delay, liquidated accounts become healthy.
+    A sendFailureRate share of sends is rejected before reaching the pool, as a full txpool would.
+    """
+    MATURITIES = [1_719_792_000, 1_727_740_800, 1_735_689_600]
+
+    def __init__(self, notional, vaults, accountsPerVault, liquidators, exitDelay=EXIT_DELAY, seed=0, blockTime=0.5,
+                 sendFailureRate=0):
+        super().__init__(notional, vaults, accountsPerVault, seed, blockTime)
+        # Separate from rng so that failures do not change the accounts a seed generates
+        self.failures = random.Random(seed + 1)
+        self.sendFailureRate = sendFailureRate
+        # Closer to the minimum than a health scan mock so that accounts keep crossing it during a short run
+        for key in self.accounts:
+            self.accounts[key] = self.rng.uniform(0.9, 1.3) * 100_000_000
+        self.maturity = { key: self.rng.choice(self.MATURITIES) for key in self.accounts }
+        self.liquidators = { l.lower() for l in liquidators }
+        self.exitDelay = exitDelay
+        self.abi = load_abi("FlashLiquidator")
+        self.txLock = threading.Lock()
+        self.confirmed = {}
+        # (sender, nonce) => (tx, block sent)
+        self.pending = {}
+        self.receipts = {}
+        # (liquidator, vault) => (maturity, mined at)
+        self.held = {}
+
+    def _drift(self):
+        # Ratios only fall so that an account found liquidatable stays so until it is liquidated
+        with self.lock:
+            current = self.block()
+            for _ in range(current - self.lastBlock if self.lastBlock else 0):
+                for k in self.accounts:
+                    self.accounts[k] *= self.rng.uniform(0.995, 1.0)
+            self.lastBlock = current
+
+    def health_factors(self, vault, account):
+        from eth_abi import encode
+        cr = int(self.accounts.get((vault.lower(), account.lower()), 0))
+        (debt, value) = (10**8, 10**8 + cr // 1000) if cr else (0, 0)
+        return encode(HEALTH_FACTORS_OUTPUT, [(cr, debt, value, [debt, 0, 0]), [debt // 4, 0, 0], [10**8, 0, 0]])
+
+    def inner_call(self, target, data):
+        if data[:4] != selector(GET_VAULT_ACCOUNT):
+            return super().inner_call(target, data)
+        from eth_abi import encode
+        (account, vault) = decode_hex(["address", "address"], data[4:].hex())
+        key = (vault.lower(), account.lower())
+        if target.lower() != self.notional or key not in self.accounts:
+            return (False, b"")
+        return (True, encode(VAULT_ACCOUNT_OUTPUT, [(-10**8, self.maturity[key], 10**8, account, 0, 0)]))
+
+    def liquidate(self, to, data, execute):
+        """Returns (gas, revert reason), applies the liquidation when execute is set."""
+        if to.lower() not in self.liquidators:
+            return (0, "not a liquidator")
+        (_, (lender, asset, amount, params)) = decode_call(self.abi, data)
+        if encode_call(flash_liquidate(), [lender, asset, amount, params]) != data:
+            return (0, "calldata does not round trip")
+        vault = params[1].lower()
+        keys = [(vault, a.lower()) for a in params[2]]
+        if amount == 0 or not keys:
+            return (0, "empty liquidation")
+        if any(self.accounts.get(k, float("inf")) >= self.minCollateralRatio[vault] for k in keys):
+            return (0, "account is not liquidatable")
+        maturities = { self.maturity[k] for k in keys }
+        if len(maturities) > 1:
+            return (0, "accounts in different maturities")
+        maturity = maturities.pop()
+        held = self.held.get((to.lower(), vault))
+        now = time.time()
+        if held is not None and held[0] != maturity and now < held[1] + self.exitDelay:
+            return (0, "liquidator holds another maturity")
+        if execute:
+            for k in keys:
+                self.accounts[k] = 2 * self.minCollateralRatio[vault]
+            self.held[(to.lower(), vault)] = (maturity, now)
+        return (400_000 + 700_000 * len(keys), None)
+
+    def mine(self):
+        with self.txLock:
+            block = self.block()
+            progress = True
+            while progress:
+                progress = False
+                for ((sender, nonce), (tx, sentBlock)) in sorted(self.pending.items()):
+                    if nonce != self.confirmed.get(sender, 0) or sentBlock >= block:
+                        continue
+                    (gas, reason) = self.liquidate(tx["to"], tx["data"], execute=True)
+                    self.receipts[tx["hash"]] = {
+                        "transactionHash": tx["hash"], "blockNumber": hex(block), "from": sender, "to": tx["to"],
+                        "status": "0x0" if reason else "0x1", "gasUsed": hex(gas or 50_000),
+                    }
+                    del self.pending[(sender, nonce)]
+                    self.confirmed[sender] = nonce + 1
+                    progress = True
+
+    def send(self, tx):
+        with self.txLock:
+            (sender, nonce) = (tx["from"].lower(), int(tx["nonce"], 16))
+            if nonce < self.confirmed.get(sender, 0):
+                return (None, "nonce too low")
+            if (sender, nonce) in self.pending:
+                return (None, "replacement transaction underpriced")
+            if self.failures.random() < self.sendFailureRate:
+                return (None, "txpool is full")
+            h = "0x" + self.rng.randbytes(32).hex()
+            self.pending[(sender, nonce)] = ({ **tx, "hash": h }, self.block())
+            return (h, None)
+
+    def handle_one(self, r):
+        (method, params) = (r.get("method"), r.get("params", []))
+        error = None
+        if method == "eth_chainId":
+            result = "0x1"
+        elif method == "eth_gasPrice":
+            result = hex(10**10)
+        elif method == "eth_getTransactionCount":
+            sender = params[0].lower()
+            with self.txLock:
+                result = self.confirmed.get(sender, 0)
+                # Like a node, transactions queued behind a nonce gap do not count
+                while params[1] == "pending" and (sender, result) in self.pending:
+                    result += 1
+            result = hex(result)
+        elif method == "eth_estimateGas":
+            (gas, reason) = self.liquidate(params[0]["to"], params[0]["data"], execute=False)
+            (result, error) = (hex(gas), reason and f"execution reverted: {reason}")
+        elif method == "eth_sendTransaction":
+            (result, error) = self.send(params[0])
+        elif method == "eth_getTransactionReceipt":
+            result = self.receipts.get(params[0])
+        else:
+            return super().handle_one(r)
+        self.calls += 1
+        if error:
+            return { "jsonrpc": "2.0", "id": r.get("id"), "error": { "code": 3, "message": error } }
+        return { "jsonrpc": "2.0", "id": r.get("id"), "result": result }
+
+    def handle(self, payload):
+        self._drift()
+        self.mine()
+        return [self.handle_one(r) for r in payload] if isinstance(payload, list) else self.handle_one(payload)
+
+def mock_templates(vaults):
+    return { v.lower(): Template(v, "0x" + "11" * 20, "0x" + "22" * 20, decimals=8) for v in vaults }
+
+def start_anvil(network, forkBlock, offline):
+    """Anvil forking through the rpc cache with one second blocks, returns (process, proxy server, url)."""
+    from scripts.emergency_dryrun import free_port, wait_for
+    from tests.rpc_cache import RpcCache, start_proxy
+    upstreams = {} if offline else {
+        n: os.environ[c["rpcEnv"]] for (n, c) in NETWORKS.items() if n == network and os.environ.get(c["rpcEnv"])
+    }
+    (server, proxyUrl) = start_proxy(RpcCache(), upstreams)
+    forkBlock = forkBlock or NETWORKS[network]["forkBlock"]
+    port = free_port()
+    proc = subprocess.Popen(
+        ["anvil", "--fork-url", f"{proxyUrl}/{network}/{forkBlock}", "--fork-block-number", str(forkBlock),
+         "--port", str(port), "--block-time", "1", "--silent"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_for(url)
+    return (proc, server, url)
+
+def raise_min_collateral_ratio(url, registry, network, notional, name):
+    """
+    Sends updateVault as the Notional owner with the vault's yaml config and the minimum collateral
+    ratio raised to just under the deleverage ratio, so that most of its accounts become liquidatable.
+    """
+    from scripts.emergency_dryrun import rpc
+    from scripts.gnosis_payloads import UPDATE_VAULT, deployment_config, select_vaults
+    matches = list(select_vaults(registry, [network], { name }))
+    if not matches or matches[0][3].get("existingDeployment") is None:
+        raise ValueError(f"{name} is not a deployed vault on {network}")
+    (family, _, _, context) = matches[0]
+    (params, maxPrimaryBorrow) = deployment_config(family, context)
+    params = list(params)
+    params[3] = min(params[8], params[10]) - 1
+
+    (owner,) = decode_hex(["address"], rpc(url, "eth_call", [{ "to": notional, "data": encode_call(OWNER, []) }, "latest"]))
+    rpc(url, "anvil_impersonateAccount", [owner])
+    rpc(url, "anvil_setBalance", [owner, hex(10**20)])
+    h = rpc(url, "eth_sendTransaction", [{
+        "from": owner, "to": notional,
+        "data": encode_call(UPDATE_VAULT, [context["existingDeployment"], tuple(params), maxPrimaryBorrow]),
+    }])
+    rpc(url, "anvil_stopImpersonatingAccount", [owner])
+    deadline = time.monotonic() + RECEIPT_TIMEOUT
+    while (receipt := rpc(url, "eth_getTransactionReceipt", [h])) is None:
+        if time.monotonic() > deadline:
+            raise RuntimeError("updateVault was not mined")
+        time.sleep(0.2)
+    if int(receipt["status"], 16) != 1:
+        raise RuntimeError(f"updateVault reverted for {name}")
+    return context["existingDeployment"].lower()
+
+async def run(daemon, fromBlock, poll, maxBlocks, drain):
+    try:
+        await daemon.run(fromBlock, poll, maxBlocks)
+    finally:
+        if drain:
+            await daemon.drain(poll=poll)
+        daemon.client.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="scripts liquidation-daemon",
+                                     description="Liquidates vault accounts as blocks arrive from warm state")
+    parser.add_argument("--network", required=True)
+    parser.add_argument("--rpc", default=None, help="JSON-RPC url, required unless --e2e is set")
+    parser.add_argument("--templates", default=None, help="json file of vault => flashLiquidate template")
+    parser.add_argument("--accounts", default=None, help="json file of vault => [accounts] to watch")
+    parser.add_argument("--from-block", type=int, default=None,
+                        help="Discover accounts from Notional transfers since this block")
+    parser.add_argument("--sender", action="append", default=[], help="Unlocked account to send from")
+    parser.add_argument("--key-env", action="append", default=[],
+                        help="Environment variable holding a private key to sign with")
+    parser.add_argument("--exit-delay", type=int, default=EXIT_DELAY)
+    parser.add_argument("--max-gas", type=int, default=MAX_BATCH_GAS, help="Gas budget per batch")
+    parser.add_argument("--near-ratio", type=float, default=NEAR_RATIO)
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="Seconds between eth_blockNumber polls")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50, help="Maximum http requests per second")
+    parser.add_argument("--blocks", type=int, default=None, help="Stop after this many blocks")
+    parser.add_argument("--metrics", default=None, help="Write latency percentiles and counters to this file")
+    parser.add_argument("--e2e", action="store_true",
+                        help="Run against a local node and check that every liquidatable account was liquidated")
+    parser.add_argument("--anvil", default=None, metavar="VAULT",
+                        help="With --e2e, fork with anvil and make this vault's accounts liquidatable")
+    parser.add_argument("--fork-block", type=int, default=None)
+    parser.add_argument("--offline", action="store_true", help="Fork only from the rpc cache")
+    parser.add_argument("--mock-accounts", type=int, default=10, help="Accounts per vault on the e2e mock node")
+    parser.add_argument("--mock-send-failures", type=float, default=0,
+                        help="Share of sends the e2e mock node rejects")
+    args = parser.parse_args(argv)
+
+    registry = load_registry()
+    network = normalize_network(args.network)
+    notional = registry.deployment(network)["notional"]
+    liquidators = [l.lower() for l in registry.liquidators(network)]
+    vaults = [v for pools in registry.vaults[network].values() for v in pools.values()]
+    accounts = load_accounts(args.accounts)
+    maxBlocks = args.blocks if args.blocks is not None or not args.e2e else 20
+    rpc = args.rpc
+    (proc, server) = (None, None)
+
+    if args.anvil and not args.e2e:
+        parser.error("--anvil is only used with --e2e")
+    if args.e2e and args.anvil is None:
+        node = MockChain(notional, vaults, args.mock_accounts, liquidators, args.exit_delay,
+                         sendFailureRate=args.mock_send_failures)
+        (server, rpc) = start_mock(node)
+        templates = mock_templates(vaults)
+        senders = ["0x" + node.rng.randbytes(20).hex() for _ in liquidators]
+        accounts = {}
+        for (vault, account) in node.accounts:
+            accounts.setdefault(vault, []).append(account)
+    else:
+        if args.templates is None:
+            parser.error("--templates is required")
+        templates = load_templates(args.templates)
+        senders = args.sender
+        if args.e2e:
+            if shutil.which("anvil") is None:
+                parser.error("anvil is not installed, install foundry or run --e2e without --anvil")
+            from scripts.emergency_dryrun import rpc as call
+            (proc, server, rpc) = start_anvil(network, args.fork_block, args.offline)
+            vault = raise_min_collateral_ratio(rpc, registry, network, notional, args.anvil)
+            # Only the vault under test, one unlocked anvil account per liquidator
+            templates = { vault: templates[vault] } if vault in templates else {}
+            senders = senders or call(rpc, "eth_accounts", [])[:len(liquidators)]
+            if not templates:
+                parser.error(f"no template for {args.anvil} in {args.templates}")
+        elif rpc is None:
+            parser.error("--rpc is required unless --e2e is set")
+        if not senders and not args.key_env:
+            parser.error("pass --sender or --key-env")
+
+    signer = Signer(senders, args.key_env)
+    client = RpcClient(rpc, args.connections, args.rate)
+    scanner = HealthScanner(client, notional, vaults, accounts, args.near_ratio)
+    daemon = LiquidationDaemon(client, scanner, liquidators, templates, signer, args.exit_delay, args.max_gas)
+    try:
+        asyncio.run(run(daemon, args.from_block, args.poll, maxBlocks, args.e2e))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if server is not None:
+            server.shutdown()
+
+    summary = daemon.metrics.summary()
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            json.dump(summary, f, indent=2)
+    for (stage, s) in summary["latencyMs"].items():
+        print(f"{stage}: p50 {s['p50']}ms p95 {s['p95']}ms max {s['max']}ms over {s['count']} blocks", file=sys.stderr)
+    print(f"{summary.get('submitted', 0)} liquidations sent, {summary.get('confirmed', 0)} confirmed, "
+          f"{summary.get('reverted', 0)} reverted", file=sys.stderr)
+
+    if args.e2e:
+        failures = verify(daemon)
+        for f in failures:
+            print(f"FAIL {f}", file=sys.stderr)
+        print(f"e2e {'failed' if failures else 'passed'}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Reads TradingModule.priceOracles for every token in tests/config.py with a single Multicall3
+eth_call per network and writes a patch that brings the oracle table up to date. Oracles hard
+coded into the generated tests by getRequiredOracles are checked as well, those are fixed by
+regenerating once the patch is applied.
+
+Responses can be recorded to and replayed from a json fixture so the sync runs offline.
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from scripts.abi_codec import encode_call
+from scripts.chain import AGGREGATE3, AGGREGATE3_OUTPUT, MULTICALL3, NETWORKS, ZERO_ADDRESS, decode_hex
+from scripts.registry import CONFIG_FILE, load_registry, normalize_network
+from tests.rpc_cache import http_post
+
+PATCH_FILE = "./oracle-sync.patch"
+GENERATED_DIR = "./tests/generated"
+
+PRICE_ORACLES = { "type": "function", "name": "priceOracles", "inputs": [{ "type": "address" }] }
+PRICE_ORACLES_OUTPUT = ["address", "uint8"]
+
+ORACLE_TABLE = re.compile(r"^oracle\s*=\s*\{")
+NETWORK_LINE = re.compile(r"^\s*[\"'](\w+)[\"']\s*:\s*\{")
+ENTRY_LINE = re.compile(r"^(\s*)([\"'])(\w+)\2(\s*:\s*)\"(0x[0-9a-fA-F]{40})\"(,?)(.*)$")
+REQUIRED_ORACLES = re.compile(r"function getRequiredOracles\(\).*?\n    \}", re.DOTALL)
+ORACLE_ASSIGNMENT = re.compile(r"(token|oracle)\[(\d+)\]\s*=\s*(0x[0-9a-fA-F]{40});")
+
+
+def rpc_transport(urls):
+    def call(network, tx, block):
+        resp = http_post(urls[network], { "jsonrpc": "2.0", "id": 1, "method": "eth_call", "params": [tx, block] })
+        if "error" in resp:
+            raise RuntimeError(f"eth_call on {network} failed: {resp['error']}")
+        return resp["result"]
+    return call
+
+def fixture_transport(fixture):
+    """Replays recorded eth_call results, the calldata must match what was recorded."""
+    def call(network, tx, block):
+        recorded = fixture.get(network)
+        if recorded is None or recorded["data"] != tx["data"]:
+            raise RuntimeError(f"no recorded response for {network}, the token table has changed since it was recorded")
+        return recorded["result"]
+    return call
+
+def fetch_oracles(call, network, tradingModule, tokens, block="latest", recording=None):
+    """Returns symbol => oracle address as set on the trading module, in one multicall."""
+    from eth_utils import to_checksum_address
+    symbols = list(tokens.keys())
+    calls = [(tradingModule, True, bytes.fromhex(encode_call(PRICE_ORACLES, [tokens[s]])[2:])) for s in symbols]
+    tx = { "to": MULTICALL3, "data": encode_call(AGGREGATE3, [calls]) }
+    result = call(network, tx, block)
+    if recording is not None:
+        recording[network] = { "block": block, "data": tx["data"], "result": result }
+
+    oracles = {}
+    for (symbol, (success, data)) in zip(symbols, decode_hex(AGGREGATE3_OUTPUT, result)[0]):
+        if not success:
+            raise RuntimeError(f"priceOracles({symbol}) reverted on {network}")
+        oracles[symbol] = to_checksum_address(decode_hex(PRICE_ORACLES_OUTPUT, data.hex())[0])
+    return oracles
+
+def read_required_oracles(path):
+    """Returns the (token, oracle) pairs hard coded in a generated test, skipping custom oracles."""
+    with open(path, "r") as f:
+        match = REQUIRED_ORACLES.search(f.read())
+    if match is None:
+        return []
+    slots = {}
+    for (kind, index, address) in ORACLE_ASSIGNMENT.findall(match.group(0)):
+        slots.setdefault(index, {})[kind] = address
+    return [(s["token"], s["oracle"]) for s in slots.values() if "token" in s and "oracle" in s]
+
+def diff_network(network, tokens, configured, onChain, generatedDir=GENERATED_DIR):
+    """
+    Returns (updates, findings). updates is symbol => new oracle for the config table, findings
+    describe every difference including ones that are not patched automatically.
+    """
+    updates = {}
+    findings = []
+    for (symbol, oracle) in onChain.items():
+        current = configured.get(symbol)
+        if oracle == ZERO_ADDRESS:
+            if current not in (None, ZERO_ADDRESS):
+                # Left in place, a test that needs this oracle would fail on the fork either way
+                findings.append(f"[{network}] {symbol}: no oracle on chain, config has {current}")
+            continue
+        if current is None:
+            findings.append(f"[{network}] {symbol}: missing from the oracle table, on chain {oracle}")
+            updates[symbol] = oracle
+        elif current.lower() != oracle.lower():
+            findings.append(f"[{network}] {symbol}: {current} => {oracle}")
+            updates[symbol] = oracle
+
+    for symbol in configured.keys() - tokens.keys():
+        findings.append(f"[{network}] {symbol}: in the oracle table but not the token table")
+
+    bySymbol = { a.lower(): s for (s, a) in tokens.items() }
+    for path in sorted(glob.glob(os.path.join(generatedDir, network, "*.t.sol"))):
+        for (token, oracle) in read_required_oracles(path):
+            symbol = bySymbol.get(token.lower())
+            expected = onChain.get(symbol)
+            if expected is not None and expected != ZERO_ADDRESS and expected.lower() != oracle.lower():
+                findings.append(f"[{network}] {os.path.basename(path)}: {symbol} oracle {oracle} => {expected}")
+    return (updates, findings)
+
+def patch_config(source, updates):
+    """Rewrites the oracle table in the source of tests/config.py, appending missing symbols to each network."""
+    from eth_utils import to_checksum_address
+    lines = source.splitlines(keepends=True)
+    output = []
+    (inTable, network, lastEntry, pending) = (False, None, None, {})
+    for line in lines:
+        if not inTable:
+            inTable = ORACLE_TABLE.match(line) is not None
+            output.append(line)
+            continue
+
+        if network is None:
+            m = NETWORK_LINE.match(line)
+            if m:
+                network = m.group(1)
+                pending = dict(updates.get(network, {}))
+                lastEntry = None
+            elif line.strip() == "}":
+                inTable = False
+            output.append(line)
+            continue
+
+        m = ENTRY_LINE.match(line)
+        if m:
+            (indent, quote, symbol, sep, address, comma, rest) = m.groups()
+            if symbol in pending:
+                address = to_checksum_address(pending.pop(symbol))
+            output.append(f"{indent}{quote}{symbol}{quote}{sep}\"{address}\"{comma}{rest}\n")
+            lastEntry = (len(output) - 1, indent, quote, comma)
+        elif line.strip().startswith("}"):
+            if pending and lastEntry is not None:
+                (i, indent, quote, comma) = lastEntry
+                if not comma:
+                    output[i] = output[i].rstrip("\n") + ",\n"
+                for (symbol, address) in pending.items():
+                    output.append(f"{indent}{quote}{symbol}{quote}: \"{to_checksum_address(address)}\",\n")
+                if not comma:
+                    # Keep the file's style of no trailing comma on the last entry
+                    output[-1] = output[-1][:-2] + "\n"
+            network = None
+            output.append(line)
+        else:
+            output.append(line)
+    return "".join(output)
+
+def make_patch(path, before, after):
+    rel = os.path.relpath(path)
+    return "".join(difflib.unified_diff(
+        before.splitlines(keepends=True), after.splitlines(keepends=True), f"a/{rel}", f"b/{rel}"
+    ))
+
+def sync(call, registry, networks, block="latest", recording=None):
+    """Fetches every network concurrently, returns (updates, findings) over all of them."""
+    def fetch(network):
+        tokens = dict(registry.tables["token"][network])
+        tradingModule = registry.deployment(network)["tradingModule"]
+        return fetch_oracles(call, network, tradingModule, tokens, block, recording)
+
+    with ThreadPoolExecutor(max_workers=len(networks) or 1) as pool:
+        results = dict(zip(networks, pool.map(fetch, networks)))
+
+    updates = {}
+    findings = []
+    for network in networks:
+        (u, f) = diff_network(
+            network, registry.tables["token"][network], registry.tables["oracle"].get(network, {}), results[network]
+        )
+        if u:
+            updates[network] = u
+        findings += f
+    return (updates, findings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the oracle table in tests/config.py with the trading module")
+    parser.add_argument("--network", action="append", default=None)
+    parser.add_argument("--rpc", action="append", default=[], metavar="NETWORK=URL",
+                        help="RPC url per network, defaults to the MAINNET_RPC_URL / ARBITRUM_RPC_URL env vars")
+    parser.add_argument("--block", default="latest")
+    parser.add_argument("--fixture", default=None, help="Replay responses from a recorded json fixture")
+    parser.add_argument("--record", default=None, help="Record responses to a json fixture")
+    parser.add_argument("--patch", default=PATCH_FILE, help="Where to write the patch for tests/config.py")
+    parser.add_argument("--apply", action="store_true", help="Rewrite tests/config.py instead of writing a patch")
+    args = parser.parse_args(argv)
+
+    registry = load_registry()
+    networks = [normalize_network(n) for n in (args.network or registry.networks)]
+    block = args.block if args.block.startswith("0x") or not args.block.isdigit() else hex(int(args.block))
+
+    if args.fixture:
+        with open(args.fixture, "r") as f:
+            call = fixture_transport(json.load(f))
+    else:
+        urls = { n: os.environ[NETWORKS[n]["rpcEnv"]] for n in networks if os.environ.get(NETWORKS[n]["rpcEnv"]) }
+        urls.update(dict(r.split("=", 1) for r in args.rpc))
+        missing = [n for n in networks if n not in urls]
+        if missing:
+            parser.error(f"no rpc url for {', '.join(missing)}, set --rpc or {NETWORKS[missing[0]]['rpcEnv']}")
+        call = rpc_transport(urls)
+
+    recording = {} if args.record else None
+    (updates, findings) = sync(call, registry, networks, block, recording)
+    if recording is not None:
+        with open(args.record, "w") as f:
+            json.dump(recording, f, indent=2)
+
+    for f in findings:
+        print(f)
+    if not updates and findings:
+        print(f"{len(findings)} findings have no oracle to patch in, fix them by hand")
+        return 1
+    if not updates:
+        print("Oracle table is up to date")
+        return 0
+
+    with open(CONFIG_FILE, "r") as f:
+        before = f.read()
+    after = patch_config(before, updates)
+    if args.apply:
+        with open(CONFIG_FILE, "w") as f:
+            f.write(after)
+        print(f"Updated {CONFIG_FILE}, run `python -m scripts generate` to refresh the generated tests")
+    else:
+        with open(args.patch, "w") as f:
+            f.write(make_patch(CONFIG_FILE, before, after))
+        print(f"Wrote {args.patch}, apply with `git apply {args.patch}`")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+from types import MappingProxyType
+from scripts.chain import ZERO_ADDRESS
+
+CONFIG_FILE = "tests/config.py"
+VAULTS_FILE = "vaults.json"
+V3_FILES = {
+    "mainnet": "v3.mainnet.json",
+    "arbitrum": "v3.arbitrum-one.json",
+}
+V2_FILES = {
+    "mainnet": "v2.mainnet.json",
+    "goerli": "v2.goerli.json",
+}
+# Literal tables read out of tests/config.py
+CONFIG_TABLES = ["currencyIds", "token", "oracle", "DexIds", "networks", "liquidators"]
+CACHE_FILE = "./.registry-cache.pickle"
+CACHE_VERSION = 1
+
+NETWORK_ALIASES = {
+    "arbitrum-one": "arbitrum",
+    "arbitrum-fork": "arbitrum",
+    "arbitrum-current": "arbitrum",
+    "mainnet-fork": "mainnet",
+    "mainnet-current": "mainnet",
+}
+ADDRESS_PATTERN = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+
+def normalize_network(name):
+    return NETWORK_ALIASES.get(name, name)
+
+def _source_files():
+    return [CONFIG_FILE, VAULTS_FILE, *V3_FILES.values(), *V2_FILES.values()]
+
+def source_hash():
+    h = hashlib.sha256()
+    for path in _source_files():
+        with open(path, "rb") as f:
+            h.update(path.encode() + b"\0" + f.read() + b"\0")
+    return h.hexdigest()
+
+def _load_json(path, errors):
+    def check_pairs(pairs):
+        seen = set()
+        for (k, _) in pairs:
+            if k in seen:
+                errors.append(f"{path}: duplicate key '{k}'")
+            seen.add(k)
+        return dict(pairs)
+
+    with open(path, "r") as f:
+        return json.load(f, object_pairs_hook=check_pairs)
+
+def _load_config_tables(path, errors):
+    """
+    Reads the address tables out of tests/config.py without executing it. Duplicate keys in
+    a python dict literal are silently dropped on import so they are checked on the syntax tree.
+    """
+    with open(path, "r") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Dict):
+            continue
+        seen = {}
+        for k in node.keys:
+            if isinstance(k, ast.Constant):
+                if k.value in seen:
+                    errors.append(
+                        f"{path}:{k.lineno}: duplicate key '{k.value}' (first defined on line {seen[k.value]})"
+                    )
+                seen.setdefault(k.value, k.lineno)
+
+    tables = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id in CONFIG_TABLES:
+            tables[node.targets[0].id] = ast.literal_eval(node.value)
+
+    for name in CONFIG_TABLES:
+        if name not in tables:
+            errors.append(f"{path}: missing table '{name}'")
+    return tables
+
+def _walk(value, path=()):
+    if isinstance(value, dict):
+        for (k, v) in value.items():
+            yield from _walk(v, (*path, k))
+    elif isinstance(value, list):
+        for (i, v) in enumerate(value):
+            yield from _walk(v, (*path, str(i)))
+    else:
+        yield (path, value)
+
+def _check_checksums(source, value, errors):
+    # Only needed when the cache is rebuilt, eth_utils is slow to import
+    from eth_utils import to_checksum_address
+    for (path, v) in _walk(value):
+        if isinstance(v, str) and ADDRESS_PATTERN.match(v) and v != v.lower() and v != to_checksum_address(v):
+            errors.append(f"{source}: {'.'.join(path)} has an invalid checksum {v}")
+
+def build():
+    """Loads and validates every source, raising a ValueError listing all of the errors found."""
+    errors = []
+    tables = _load_config_tables(CONFIG_FILE, errors)
+    vaults = _load_json(VAULTS_FILE, errors)
+    v3 = { n: _load_json(path, errors) for (n, path) in V3_FILES.items() }
+    v2 = { n: _load_json(path, errors) for (n, path) in V2_FILES.items() }
+
+    sources = [(CONFIG_FILE, tables), (VAULTS_FILE, vaults)] \
+        + [(V3_FILES[n], d) for (n, d) in v3.items()] \
+        + [(V2_FILES[n], d) for (n, d) in v2.items()]
+    for (source, value) in sources:
+        _check_checksums(source, value, errors)
+
+    # Reverse index of (network, lowercase address) => [(role, name)]
+    reverse = {}
+    def index(network, address, role, name):
+        if isinstance(address, str) and ADDRESS_PATTERN.match(address) and address != ZERO_ADDRESS:
+            reverse.setdefault(network, {}).setdefault(address.lower(), []).append((role, name))
+
+    for (network, tokens) in tables.get("token", {}).items():
+        for (symbol, address) in tokens.items():
+            index(network, address, "token", symbol)
+    for (network, oracles) in tables.get("oracle", {}).items():
+        for (symbol, address) in oracles.items():
+            index(network, address, "oracle", symbol)
+    for (network, addresses) in tables.get("liquidators", {}).items():
+        for (i, address) in enumerate(addresses):
+            index(network, address, "liquidator", str(i))
+    for (network, protocols) in vaults.items():
+        for (protocol, pools) in protocols.items():
+            for (poolName, address) in pools.items():
+                index(network, address, "vault", f"{protocol}/{poolName}")
+    for (network, deployment) in v3.items():
+        for (path, address) in _walk(deployment):
+            index(network, address, "v3", ".".join(path))
+    for (network, deployment) in v2.items():
+        for (path, address) in _walk(deployment):
+            index(network, address, "v2", ".".join(path))
+
+    if errors:
+        raise ValueError("Invalid address registry:\n  " + "\n  ".join(errors))
+
+    return { "tables": tables, "vaults": vaults, "v3": v3, "v2": v2, "reverse": reverse }
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({ k: freeze(v) for (k, v) in value.items() })
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+class Registry:
+    """
+    Read only index over the address tables in tests/config.py, vaults.json and the
+    v2/v3 deployment files. Networks may be given by any alias (i.e. arbitrum-one).
+    """
+    def __init__(self, data, sourceHash):
+        self.sourceHash = sourceHash
+        self.tables = freeze(data["tables"])
+        self.vaults = freeze(data["vaults"])
+        self.v3 = freeze(data["v3"])
+        self.v2 = freeze(data["v2"])
+        self._reverse = freeze(data["reverse"])
+
+    @property
+    def networks(self):
+        return self.tables["networks"]
+
+    def token(self, network, symbol):
+        return self.tables["token"][normalize_network(network)][symbol]
+
+    def oracle(self, network, symbol):
+        return self.tables["oracle"][normalize_network(network)][symbol]
+
+    def currency_id(self, network, symbol):
+        return self.tables["currencyIds"][normalize_network(network)][symbol]
+
+    def dex_id(self, dex):
+        return self.tables["DexIds"][dex]
+
+    def liquidators(self, network):
+        return self.tables["liquidators"][normalize_network(network)]
+
+    def deployment(self, network):
+        return self.v3[normalize_network(network)]
+
+    def vault(self, network, protocol, poolName):
+        """Returns the deployed vault address or None if the vault has not been deployed."""
+        return self.vaults.get(normalize_network(network), {}).get(protocol, {}).get(poolName)
+
+    def lookup(self, network, address):
+        """Returns all of the (role, name) pairs registered for an address."""
+        return self._reverse.get(normalize_network(network), {}).get(address.lower(), ())
+
+def load_registry(useCache=True, cacheFile=CACHE_FILE):
+    """
+    Returns the registry, using the precompiled cache file when the sources have not
+    changed since it was written.
+    """
+    sourceHash = source_hash()
+    if useCache:
+        try:
+            with open(cacheFile, "rb") as f:
+                cached = pickle.load(f)
+            if cached["version"] == CACHE_VERSION and cached["sourceHash"] == sourceHash:
+                return Registry(cached["data"], sourceHash)
+        except (FileNotFoundError, EOFError, KeyError, pickle.UnpicklingError):
+            pass
+
+    data = build()
+    if useCache:
+        tmp = f"{cacheFile}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({ "version": CACHE_VERSION, "sourceHash": sourceHash, "data": data }, f)
+        os.replace(tmp, cacheFile)
+
+    return Registry(data, sourceHash)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validates the address registry or looks up an address")
+    parser.add_argument("network", nargs="?", help="Network to look up the address on")
+    parser.add_argument("address", nargs="?", help="Address to look up")
+    args = parser.parse_args(argv)
+
+    try:
+        registry = load_registry(useCache=False)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.address:
+        for (role, name) in registry.lookup(args.network, args.address):
+            print(f"{role}: {name}")
+    else:
+        print(f"Registry is valid ({registry.sourceHash[:12]})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,821 @@
+"""
+Offline route quoting for the trading module adapters. Pool states are snapshotted at a block, quotes
+are computed over arrays of trade sizes with the integer math the pools run on chain and routes are
+ranked by execution price to suggest the primaryDex and exchangeData for PendlePTTests.yml.
+
+    python -m scripts route-quote snapshot pools.yml --rpc $ARBITRUM_RPC_URL --block 259045792 --out route-snapshot.yml
+    python -m scripts route-quote suggest route-snapshot.yml PendlePT_rsETH_26DEC2024_ETH
+    python -m scripts route-quote snapshot tests/routeQuotePools.yml --network mainnet --rpc $MAINNET_RPC_URL --block 21023919 --out route-snapshot.yml
+    python -m scripts route-quote vectors route-snapshot.yml
+
+Snapshots are local, route-snapshot.yml is ignored by git. The tests/testRouteQuotes.t.sol written
+from a snapshot of the pools pinned in tests/routeQuotePools.yml carries its own expected quotes and
+is the file to commit.
+
+UniswapV2 pairs, UniswapV3 pools (crossing the ticks inside the snapshotted bitmap words), Curve
+plain stableswap pools (scripts.pool_math) and Balancer composable stable and weighted pools are
+modeled exactly. CamelotV3 pools are Algebra pools, they are quoted with the UniswapV3 step math at
+the fee in globalState so their quotes are approximate. Curve cryptoswap pools are not modeled.
+"""
+import argparse
+import functools
+import sys
+import numpy as np
+import yaml
+from scripts.chain import ZERO_ADDRESS
+from scripts.pool_math import ONE, curve_dy, stable_invariant, stable_out_given_in, uint_array
+
+VECTORS_FILE = "tests/testRouteQuotes.t.sol"
+# Dex names in tests/config.py => DexId enum members
+DEX_IDS = {
+    "UniswapV2": "UNISWAP_V2",
+    "UniswapV3": "UNISWAP_V3",
+    "BalancerV2": "BALANCER_V2",
+    "CurveV2": "CURVE_V2",
+    "CamelotV3": "CAMELOT_V3",
+}
+# TradingModule._getExecutionData only dispatches these dexes on some chains, others trade everywhere
+DEX_NETWORKS = {
+    "UniswapV2": ("mainnet",),
+    "CamelotV3": ("arbitrum",),
+}
+NATIVE_ETH = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+# Exact in single and exact in batch, the trade types the vaults use
+TRADE_TYPE_FLAGS = 5
+UNIV2_FEE_BPS = 30
+TICK_WORDS = 4
+
+Q96 = 2**96
+MAX_UINT256 = 2**256 - 1
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+V3_FEE_DENOMINATOR = 1_000_000
+MAX_V3_STEPS = 1_000
+# TickMath.getSqrtRatioAtTick, ratio multipliers for each bit of the absolute tick
+TICK_RATIOS = [
+    0xfff97272373d413259a46990580e213a, 0xfff2e50f5f656932ef12357cf3c7fdcc, 0xffe5caca7e10e4e61c3624eaa0941cd0,
+    0xffcb9843d60f6159c9db58835c926644, 0xff973b41fa98c081472e6896dfb254c0, 0xff2ea16466c96a3843ec78b326b52861,
+    0xfe5dee046a99a2a811c461f1969c3053, 0xfcbe86c7900a88aedcffc83b479aa3a4, 0xf987a7253ac413176f2b074cf7815e54,
+    0xf3392b0822b70005940c7a398e4b70f3, 0xe7159475a2c29b7443b29c7fa6e889d9, 0xd097f3bdfd2022b8845ad8f792aa5825,
+    0xa9f746462d870fdf8a65dc1f90e061e5, 0x70d869a156d2a1b890bb3df62baf32f7, 0x31be135f97d08fd981231505542fcfa6,
+    0x9aa508b5b7a84e1c677de54f3e99bc9, 0x5d6af8dedb81196699c329225ee604, 0x2216e584f5fa1ea926041bedfe98,
+    0x48a170391f7dc42444e8fa2,
+]
+
+# Balancer LogExpMath, x_n are exponents and a_n = e^x_n. x0, x1 and a0, a1 have no decimals, the rest
+# have 20 decimals.
+ONE_20 = 10**20
+ONE_36 = 10**36
+MAX_NATURAL_EXPONENT = 130 * ONE
+MIN_NATURAL_EXPONENT = -41 * ONE
+LN_36_LOWER_BOUND = ONE - 10**17
+LN_36_UPPER_BOUND = ONE + 10**17
+MILD_EXPONENT_BOUND = 2**254 // ONE_20
+(X0, A0) = (128 * ONE, 38877084059945950922200000000000000000000000000000000000)
+(X1, A1) = (64 * ONE, 6235149080811616882910000000)
+EXP_TERMS = [
+    (3200 * 10**18, 7896296018268069516100000000000000),
+    (1600 * 10**18, 888611052050787263676000000),
+    (800 * 10**18, 298095798704172827474000),
+    (400 * 10**18, 5459815003314423907810),
+    (200 * 10**18, 738905609893065022723),
+    (100 * 10**18, 271828182845904523536),
+    (50 * 10**18, 164872127070012814685),
+    (25 * 10**18, 128402541668774148407),
+    (1250 * 10**16, 113314845306682631683),
+    (625 * 10**16, 106449445891785942956),
+]
+MAX_POW_RELATIVE_ERROR = 10_000
+MAX_IN_RATIO = 3 * 10**17
+
+
+def _sdiv(a, b):
+    """Solidity signed division, truncates towards zero."""
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def _smod(a, b):
+    return a - _sdiv(a, b) * b
+
+def _mul_div_up(a, b, d):
+    return -((-(a * b)) // d)
+
+def _safe(d):
+    return np.where(d == 0, 1, d)
+
+@functools.lru_cache(maxsize=None)
+def sqrt_ratio_at_tick(tick):
+    """TickMath.getSqrtRatioAtTick."""
+    absTick = abs(tick)
+    if absTick > MAX_TICK:
+        raise ValueError(f"tick {tick} out of range")
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if absTick & 0x1 else 2**128
+    for (bit, multiplier) in enumerate(TICK_RATIOS, start=1):
+        if absTick & (1 << bit):
+            ratio = (ratio * multiplier) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+def amount0_delta(a, b, liquidity, roundUp):
+    """SqrtPriceMath.getAmount0Delta over arrays of prices."""
+    (lo, hi) = (np.minimum(a, b), np.maximum(a, b))
+    numerator1 = liquidity * Q96
+    numerator2 = hi - lo
+    if roundUp:
+        return -((-_mul_div_up(numerator1, numerator2, hi)) // lo)
+    return ((numerator1 * numerator2) // hi) // lo
+
+def amount1_delta(a, b, liquidity, roundUp):
+    (lo, hi) = (np.minimum(a, b), np.maximum(a, b))
+    return _mul_div_up(liquidity, hi - lo, Q96) if roundUp else (liquidity * (hi - lo)) // Q96
+
+def next_sqrt_price_from_input(sqrtPrice, liquidity, amountIn, zeroForOne):
+    """SqrtPriceMath.getNextSqrtPriceFromInput, liquidity must be non zero where amountIn is."""
+    if not zeroForOne:
+        return sqrtPrice + (amountIn * Q96) // _safe(liquidity)
+    numerator1 = liquidity * Q96
+    product = amountIn * sqrtPrice
+    denominator = numerator1 + product
+    # The full precision formula is only used when the product does not overflow a uint256
+    fits = (product <= MAX_UINT256) & (denominator <= MAX_UINT256)
+    exact = _mul_div_up(numerator1, sqrtPrice, _safe(denominator))
+    fallback = -((-numerator1) // _safe(numerator1 // sqrtPrice + amountIn))
+    return np.where(amountIn == 0, sqrtPrice, np.where(fits, exact, fallback))
+
+def swap_step(sqrtPrice, target, liquidity, remaining, fee):
+    """SwapMath.computeSwapStep for exact input, returns (sqrtPriceNext, amountIn, amountOut, feeAmount)."""
+    zeroForOne = bool(sqrtPrice[0] >= target[0])
+    lessFee = (remaining * (V3_FEE_DENOMINATOR - fee)) // V3_FEE_DENOMINATOR
+    if zeroForOne:
+        maxIn = amount0_delta(target, sqrtPrice, liquidity, True)
+    else:
+        maxIn = amount1_delta(sqrtPrice, target, liquidity, True)
+    reached = lessFee >= maxIn
+    partial = next_sqrt_price_from_input(sqrtPrice, liquidity, np.where(reached, 0, lessFee), zeroForOne)
+    nextPrice = np.where(reached, target, partial)
+    atTarget = nextPrice == target
+    if zeroForOne:
+        amountIn = np.where(atTarget, maxIn, amount0_delta(nextPrice, sqrtPrice, liquidity, True))
+        amountOut = amount1_delta(nextPrice, sqrtPrice, liquidity, False)
+    else:
+        amountIn = np.where(atTarget, maxIn, amount1_delta(sqrtPrice, nextPrice, liquidity, True))
+        amountOut = amount0_delta(sqrtPrice, nextPrice, liquidity, False)
+    feeAmount = np.where(atTarget, _mul_div_up(amountIn, fee, V3_FEE_DENOMINATOR - fee), remaining - amountIn)
+    return (nextPrice, amountIn, amountOut, feeAmount)
+
+def v3_out_given_in(pool, zeroForOne, amounts):
+    """
+    UniswapV3Pool.swap for exact input with no price limit, lanes of the amounts array step through
+    the initialized ticks together. Swaps that leave the snapshotted bitmap words are not ok.
+    """
+    spacing = pool["tickSpacing"]
+    fee = pool["fee"]
+    netByTick = { int(t): int(net) for (t, net) in pool["ticks"] }
+    compressedTicks = np.array(sorted(t // spacing for t in netByTick), dtype=np.int64)
+    (minWord, maxWord) = pool["words"]
+    limit = MIN_SQRT_RATIO + 1 if zeroForOne else MAX_SQRT_RATIO - 1
+
+    n = len(amounts)
+    remaining = amounts.copy()
+    out = np.zeros(n, dtype=object)
+    sqrtPrice = np.full(n, int(pool["sqrtPriceX96"]), dtype=object)
+    tick = np.full(n, int(pool["tick"]), dtype=np.int64)
+    liquidity = np.full(n, int(pool["liquidity"]), dtype=object)
+    ok = amounts > 0
+
+    for _ in range(MAX_V3_STEPS):
+        active = np.flatnonzero(ok & (remaining != 0) & (sqrtPrice != limit))
+        if len(active) == 0:
+            break
+        # TickBitmap.nextInitializedTickWithinOneWord against the snapshotted ticks
+        compressed = tick[active] // spacing
+        if zeroForOne:
+            word = compressed >> 8
+            i = np.searchsorted(compressedTicks, compressed, side="right") - 1
+            candidate = compressedTicks[np.clip(i, 0, None)] if len(compressedTicks) else compressed
+            initialized = (i >= 0) & ((candidate >> 8) == word) if len(compressedTicks) else np.zeros(len(active), bool)
+            nextCompressed = np.where(initialized, candidate, word << 8)
+        else:
+            word = (compressed + 1) >> 8
+            i = np.searchsorted(compressedTicks, compressed + 1, side="left")
+            candidate = compressedTicks[np.clip(i, None, len(compressedTicks) - 1)] if len(compressedTicks) else compressed
+            initialized = (i < len(compressedTicks)) & ((candidate >> 8) == word) if len(compressedTicks) \
+                else np.zeros(len(active), bool)
+            nextCompressed = np.where(initialized, candidate, (word << 8) + 255)
+
+        inSnapshot = (word >= minWord) & (word <= maxWord)
+        ok[active[~inSnapshot]] = False
+        (active, initialized, nextCompressed) = (active[inSnapshot], initialized[inSnapshot], nextCompressed[inSnapshot])
+        if len(active) == 0:
+            break
+        tickNext = np.clip(nextCompressed * spacing, MIN_TICK, MAX_TICK)
+        sqrtNextTick = np.array([sqrt_ratio_at_tick(int(t)) for t in tickNext], dtype=object)
+        if zeroForOne:
+            target = np.where(sqrtNextTick < limit, limit, sqrtNextTick)
+        else:
+            target = np.where(sqrtNextTick > limit, limit, sqrtNextTick)
+
+        (nextPrice, amountIn, amountOut, feeAmount) = swap_step(
+            sqrtPrice[active], target, liquidity[active], remaining[active], fee
+        )
+        sqrtPrice[active] = nextPrice
+        remaining[active] = remaining[active] - amountIn - feeAmount
+        out[active] = out[active] + amountOut
+
+        # Crossing an initialized tick, swaps that stop inside a range do not step again so
+        # the tick is only tracked on crossings
+        crossed = nextPrice == sqrtNextTick
+        for (lane, t, init) in zip(active[crossed], tickNext[crossed], initialized[crossed]):
+            if init:
+                net = netByTick[int(t)]
+                liquidity[lane] = liquidity[lane] + (-net if zeroForOne else net)
+                ok[lane] &= liquidity[lane] >= 0
+            tick[lane] = t - 1 if zeroForOne else t
+
+    return (out, ok & (remaining == 0))
+
+def univ2_out_given_in(reserveIn, reserveOut, amounts, feeBps=UNIV2_FEE_BPS):
+    """UniswapV2Library.getAmountOut, a 30 bps fee is the 997 / 1000 of the router."""
+    amountInWithFee = amounts * (10_000 - feeBps)
+    out = (amountInWithFee * reserveOut) // (reserveIn * 10_000 + amountInWithFee)
+    return (out, (amounts > 0) & (out < reserveOut))
+
+def _ln_36(x):
+    x = x * ONE
+    z = _sdiv((x - ONE_36) * ONE_36, x + ONE_36)
+    zSquared = _sdiv(z * z, ONE_36)
+    num = z
+    seriesSum = num
+    for k in range(3, 16, 2):
+        num = _sdiv(num * zSquared, ONE_36)
+        seriesSum += _sdiv(num, k)
+    return seriesSum * 2
+
+def _ln(a):
+    if a < ONE:
+        return -_ln((ONE * ONE) // a)
+    total = 0
+    if a >= A0 * ONE:
+        a //= A0
+        total += X0
+    if a >= A1 * ONE:
+        a //= A1
+        total += X1
+    total *= 100
+    a *= 100
+    for (x, an) in EXP_TERMS:
+        if a >= an:
+            a = (a * ONE_20) // an
+            total += x
+    z = _sdiv((a - ONE_20) * ONE_20, a + ONE_20)
+    zSquared = _sdiv(z * z, ONE_20)
+    num = z
+    seriesSum = num
+    for k in range(3, 12, 2):
+        num = _sdiv(num * zSquared, ONE_20)
+        seriesSum += _sdiv(num, k)
+    return _sdiv(total + seriesSum * 2, 100)
+
+def _exp(x):
+    if not MIN_NATURAL_EXPONENT <= x <= MAX_NATURAL_EXPONENT:
+        raise ValueError("invalid exponent")
+    if x < 0:
+        return (ONE * ONE) // _exp(-x)
+    firstAN = 1
+    if x >= X0:
+        x -= X0
+        firstAN = A0
+    elif x >= X1:
+        x -= X1
+        firstAN = A1
+    x *= 100
+    product = ONE_20
+    # The last two terms are only used by ln
+    for (xn, an) in EXP_TERMS[:-2]:
+        if x >= xn:
+            x -= xn
+            product = (product * an) // ONE_20
+    seriesSum = ONE_20
+    term = x
+    seriesSum += term
+    for k in range(2, 13):
+        term = (term * x // ONE_20) // k
+        seriesSum += term
+    return (((product * seriesSum) // ONE_20) * firstAN) // 100
+
+def log_exp_pow(x, y):
+    """LogExpMath.pow for 18 decimal fixed point values."""
+    if y == 0:
+        return ONE
+    if x == 0:
+        return 0
+    if x >= 2**255 or y >= MILD_EXPONENT_BOUND:
+        raise ValueError("pow out of bounds")
+    if LN_36_LOWER_BOUND < x < LN_36_UPPER_BOUND:
+        ln36 = _ln_36(x)
+        logTimesY = _sdiv(ln36, ONE) * y + _sdiv(_smod(ln36, ONE) * y, ONE)
+    else:
+        logTimesY = _ln(x) * y
+    return _exp(_sdiv(logTimesY, ONE))
+
+def _pow_up(x, y):
+    """FixedPoint.powUp with the fast paths for exponents of one, two and four."""
+    def mul_up(a, b):
+        return 0 if a * b == 0 else (a * b - 1) // ONE + 1
+    if y == ONE:
+        return x
+    if y == 2 * ONE:
+        return mul_up(x, x)
+    if y == 4 * ONE:
+        return mul_up(mul_up(x, x), mul_up(x, x))
+    raw = log_exp_pow(x, y)
+    return raw + mul_up(raw, MAX_POW_RELATIVE_ERROR) + 1
+
+def weighted_out_given_in(balanceIn, weightIn, balanceOut, weightOut, amounts):
+    """WeightedMath._calcOutGivenIn, every argument except the amounts is scalar."""
+    ok = amounts <= (balanceIn * MAX_IN_RATIO) // ONE
+    base = -((-(balanceIn * ONE)) // (balanceIn + amounts))
+    exponent = (weightIn * ONE) // weightOut
+    power = np.frompyfunc(lambda b: _pow_up(int(b), exponent), 1, 1)(base)
+    complement = np.where(power < ONE, ONE - power, 0)
+    return ((balanceOut * complement) // ONE, ok)
+
+def balancer_out_given_in(pool, i, j, amounts):
+    """onSwap GIVEN_IN for weighted and composable stable pools, indices are into the vault tokens."""
+    scaling = [int(s) for s in pool["scalingFactors"]]
+    balances = [(int(b) * s) // ONE for (b, s) in zip(pool["balances"], scaling)]
+    fee = int(pool["swapFee"])
+    amountIn = amounts - np.where(amounts * fee == 0, 0, (amounts * fee - 1) // ONE + 1)
+    scaledIn = (amountIn * scaling[i]) // ONE
+
+    if pool["kind"] == "weighted":
+        weights = [int(w) for w in pool["weights"]]
+        (out, ok) = weighted_out_given_in(balances[i], weights[i], balances[j], weights[j], scaledIn)
+    else:
+        bptIndex = pool.get("bptIndex")
+        keep = [k for k in range(len(balances)) if k != bptIndex]
+        n = len(amounts)
+        xp = uint_array([[balances[k] for k in keep]] * n)
+        amp = uint_array([int(pool["amp"])] * n)
+        (invariant, ok) = stable_invariant(amp[:1], xp[:1])
+        (out, outOk) = stable_out_given_in(
+            amp, xp, keep.index(i), keep.index(j), scaledIn, np.full(n, invariant[0], dtype=object)
+        )
+        ok = np.full(n, ok[0]) & outOk
+    return ((out * ONE) // scaling[j], ok & (amounts > 0))
+
+def curve_out_given_in(pool, i, j, amounts):
+    n = len(amounts)
+    rates = uint_array([[10 ** (36 - d) for d in pool["decimals"]]] * n)
+    balances = uint_array([[int(b) for b in pool["balances"]]] * n)
+    return curve_dy(uint_array([int(pool["amp"])] * n), balances, rates, int(pool["fee"]), i, j, amounts)
+
+def dex_supported(dex, network):
+    return network in DEX_NETWORKS.get(dex, (network,))
+
+def route_token(address, weth):
+    """Pools quote native ETH as WETH, the adapters take address(0) for ETH."""
+    return weth.lower() if address.lower() in (ZERO_ADDRESS, NATIVE_ETH.lower()) else address.lower()
+
+def quote(pool, sell, buy, amounts, weth):
+    """Returns (amountOut, ok) for selling each of the amounts through the pool, or None if it does not hold both tokens."""
+    tokens = [route_token(t, weth) for t in pool["tokens"]]
+    (sell, buy) = (route_token(sell, weth), route_token(buy, weth))
+    if sell not in tokens or buy not in tokens or sell == buy:
+        return None
+    (i, j) = (tokens.index(sell), tokens.index(buy))
+    if pool.get("bptIndex") in (i, j):
+        # Joins and exits through the pool token are not routes the vaults trade
+        return None
+    dex = pool["dex"]
+    if dex == "UniswapV2":
+        return univ2_out_given_in(int(pool["reserves"][i]), int(pool["reserves"][j]), amounts, pool.get("feeBps", UNIV2_FEE_BPS))
+    if dex in ("UniswapV3", "CamelotV3"):
+        return v3_out_given_in(pool, i == 0, amounts)
+    if dex == "CurveV2":
+        if pool.get("kind", "stableswap") != "stableswap":
+            raise ValueError(f"curve pool {pool['pool']} is a {pool['kind']} pool, only stableswap pools are modeled")
+        return curve_out_given_in(pool, i, j, amounts)
+    if dex == "BalancerV2":
+        return balancer_out_given_in(pool, i, j, amounts)
+    raise ValueError(f"unknown dex {dex}")
+
+def exchange_data(pool, sell, buy, weth):
+    """The yaml exchangeData that tests/config.get_exchange_data renders for the pool, None if the dex takes none."""
+    dex = pool["dex"]
+    if dex == "UniswapV3":
+        return { "feeTier": int(pool["fee"]) }
+    if dex == "CurveV2":
+        tokens = [route_token(t, weth) for t in pool["tokens"]]
+        return {
+            "pool": pool["pool"],
+            "fromIndex": tokens.index(route_token(sell, weth)),
+            "toIndex": tokens.index(route_token(buy, weth)),
+        }
+    if dex == "BalancerV2":
+        return { "poolId": pool["poolId"] }
+    return None
+
+def pool_label(pool):
+    if pool.get("poolId"):
+        return pool["poolId"]
+    from eth_utils import to_checksum_address
+    if pool["dex"] == "UniswapV3":
+        return f"{to_checksum_address(pool['pool'])} ({pool['fee'] / 10_000:g}%)"
+    return to_checksum_address(pool["pool"])
+
+def rank_routes(snapshot, sell, buy, amounts):
+    """
+    Quotes every snapshotted pool holding both tokens, returns routes ordered by the amount out
+    at the largest size. Routes that cannot fill a size have zero out at that size.
+    """
+    weth = snapshot["weth"]
+    routes = []
+    for pool in snapshot["pools"]:
+        if not dex_supported(pool["dex"], snapshot["network"]):
+            continue
+        result = quote(pool, sell, buy, amounts, weth)
+        if result is None:
+            continue
+        (out, ok) = result
+        routes.append({ "pool": pool, "out": np.where(ok, out, 0), "ok": ok })
+    return sorted(routes, key=lambda r: [-int(v) for v in r["out"][::-1]])
+
+def trade_sizes(low, high, steps):
+    """Geometric grid of trade sizes between low and high inclusive."""
+    if steps <= 1 or low >= high:
+        return uint_array([high])
+    ratios = np.geomspace(1, high / low, steps)
+    return uint_array(sorted({ min(high, int(low * r)) for r in ratios } | { high }))
+
+def format_amount(value, decimals):
+    return f"{int(value) / 10 ** decimals:,.6g}"
+
+def print_ranking(snapshot, sell, buy, amounts, routes, file=sys.stdout):
+    decimals = snapshot["decimals"]
+    weth = snapshot["weth"]
+    (sellDecimals, buyDecimals) = (decimals[route_token(sell, weth)], decimals[route_token(buy, weth)])
+    header = "".join(f"{format_amount(a, sellDecimals):>16}" for a in amounts)
+    print(f"{'':4}{'dex':<12}{'pool':<70}{header}", file=file)
+    for (rank, r) in enumerate(routes, start=1):
+        prices = []
+        for (a, o, ok) in zip(amounts, r["out"], r["ok"]):
+            price = (int(o) / 10 ** buyDecimals) / (int(a) / 10 ** sellDecimals)
+            prices.append(f"{price:>16.8g}" if ok else f"{'-':>16}")
+        print(f"{rank:<4}{r['pool']['dex']:<12}{pool_label(r['pool']):<70}{''.join(prices)}", file=file)
+
+def load_snapshot(path):
+    with open(path, "r") as f:
+        snapshot = yaml.safe_load(f)
+    snapshot["decimals"] = { k.lower(): int(v) for (k, v) in snapshot["decimals"].items() }
+    return snapshot
+
+def suggest(snapshot, context, amounts):
+    """
+    Ranks the entry trade (borrow token into the stake token) of a PendlePT vault and returns the
+    yaml for primaryDex, exchangeData and permissions of the best route that the generator can render.
+    """
+    weth = snapshot["weth"]
+    routes = rank_routes(snapshot, context["borrowToken"], context["stakeToken"], amounts)
+    # UniswapV2 needs a path in exchangeData which get_exchange_data does not render
+    usable = [r for r in routes if r["pool"]["dex"] != "UniswapV2" and r["ok"].all()]
+    if not usable:
+        return (routes, None)
+    pool = usable[0]["pool"]
+    data = exchange_data(pool, context["borrowToken"], context["stakeToken"], weth)
+    symbols = [context["primaryBorrowCurrency"], context["stakeSymbol"]]
+    return (routes, {
+        "primaryDex": pool["dex"],
+        "exchangeData": data,
+        "permissions": [{ "token": s, "dex": pool["dex"], "tradeTypeFlags": TRADE_TYPE_FLAGS } for s in symbols],
+    })
+
+def rpc_reader(url, block):
+    """Returns read(calls) for a list of (to, entry, args, outputTypes), sent as one JSON-RPC batch."""
+    from scripts.abi_codec import encode_call
+    from scripts.chain import decode_hex
+    from tests.rpc_cache import http_post
+
+    def read(calls):
+        payload = [
+            { "jsonrpc": "2.0", "id": k, "method": "eth_call",
+              "params": [{ "to": to, "data": encode_call(entry, args) }, hex(block)] }
+            for (k, (to, entry, args, _)) in enumerate(calls)
+        ]
+        responses = { r["id"]: r for r in http_post(url, payload) } if payload else {}
+        results = []
+        for (k, (to, entry, _, outputs)) in enumerate(calls):
+            r = responses[k]
+            if "error" in r:
+                raise RuntimeError(f"{entry['name']} on {to} failed: {r['error']}")
+            # Only the leading words are decoded, i.e. the first fields of slot0 or ticks
+            data = r["result"][2:][:64 * len(outputs)] if "[]" not in "".join(outputs) else r["result"]
+            results.append(decode_hex(outputs, data))
+        return results
+    return read
+
+def _fn(name, *inputs):
+    return { "type": "function", "name": name, "inputs": [{ "type": t } for t in inputs] }
+
+def snapshot_v3(read, pool, algebra, tickWords):
+    """Reads the price, liquidity and the initialized ticks within tickWords bitmap words of the current tick."""
+    (token0, token1, spacing, liquidity) = [r[0] for r in read([
+        (pool, _fn("token0"), [], ["address"]),
+        (pool, _fn("token1"), [], ["address"]),
+        (pool, _fn("tickSpacing"), [], ["int24"]),
+        (pool, _fn("liquidity"), [], ["uint128"]),
+    ])]
+    if algebra:
+        (sqrtPrice, tick, fee) = read([(pool, _fn("globalState"), [], ["uint160", "int24", "uint16"])])[0]
+    else:
+        (sqrtPrice, tick) = read([(pool, _fn("slot0"), [], ["uint160", "int24"])])[0]
+        fee = read([(pool, _fn("fee"), [], ["uint24"])])[0][0]
+    word = (tick // spacing) >> 8
+    words = list(range(word - tickWords, word + tickWords + 1))
+    bitmap = read([(pool, _fn("tickTable" if algebra else "tickBitmap", "int16"), [w], ["uint256"]) for w in words])
+    ticks = [((w << 8) + bit) * spacing for (w, (bits,)) in zip(words, bitmap) for bit in range(256) if bits >> bit & 1]
+    nets = read([(pool, _fn("ticks", "int24"), [t], ["uint128", "int128"]) for t in ticks])
+    return {
+        "tokens": [token0, token1], "fee": fee, "tickSpacing": spacing, "sqrtPriceX96": sqrtPrice, "tick": tick,
+        "liquidity": liquidity, "words": [words[0], words[-1]], "ticks": [[t, n[1]] for (t, n) in zip(ticks, nets)],
+    }
+
+def snapshot_pool(read, candidate, balancerVault, tickWords):
+    dex = candidate["dex"]
+    if dex == "UniswapV2":
+        pool = candidate["pool"]
+        ((token0,), (token1,), reserves) = read([
+            (pool, _fn("token0"), [], ["address"]),
+            (pool, _fn("token1"), [], ["address"]),
+            (pool, _fn("getReserves"), [], ["uint112", "uint112"]),
+        ])
+        return { **candidate, "tokens": [token0, token1], "reserves": list(reserves) }
+    if dex in ("UniswapV3", "CamelotV3"):
+        return { **candidate, **snapshot_v3(read, candidate["pool"], dex == "CamelotV3", tickWords) }
+    if dex == "CurveV2":
+        pool = candidate["pool"]
+        coins = []
+        while len(coins) < 8:
+            try:
+                coins.append(read([(pool, _fn("coins", "uint256"), [len(coins)], ["address"])])[0][0])
+            except RuntimeError:
+                break
+        reads = read(
+            [(pool, _fn("balances", "uint256"), [k], ["uint256"]) for k in range(len(coins))]
+            + [(pool, _fn("A_precise"), [], ["uint256"]), (pool, _fn("fee"), [], ["uint256"])]
+        )
+        decimals = [18 if c.lower() == NATIVE_ETH.lower() else read([(c, _fn("decimals"), [], ["uint8"])])[0][0] for c in coins]
+        return {
+            "kind": "stableswap", **candidate, "tokens": coins, "balances": [r[0] for r in reads[:len(coins)]],
+            "amp": reads[-2][0], "fee": reads[-1][0], "decimals": decimals,
+        }
+    if dex == "BalancerV2":
+        poolId = candidate["poolId"]
+        pool = poolId[:42]
+        (tokens, balances, _) = read([(balancerVault, _fn("getPoolTokens", "bytes32"), [bytes.fromhex(poolId[2:])],
+                                       ["address[]", "uint256[]", "uint256"])])[0]
+        ((scaling,), (swapFee,)) = read([
+            (pool, _fn("getScalingFactors"), [], ["uint256[]"]),
+            (pool, _fn("getSwapFeePercentage"), [], ["uint256"]),
+        ])
+        state = { "kind": "composable", **candidate, "tokens": list(tokens), "balances": list(balances),
+                  "scalingFactors": list(scaling), "swapFee": swapFee }
+        if state["kind"] == "weighted":
+            state["weights"] = list(read([(pool, _fn("getNormalizedWeights"), [], ["uint256[]"])])[0][0])
+        else:
+            state["amp"] = read([(pool, _fn("getAmplificationParameter"), [], ["uint256", "bool", "uint256"])])[0][0]
+            state["bptIndex"] = read([(pool, _fn("getBptIndex"), [], ["uint256"])])[0][0]
+        return state
+    raise ValueError(f"unknown dex {dex}")
+
+def take_snapshot(read, network, block, candidates, tickWords=TICK_WORDS):
+    from scripts.gnosis_payloads import deployment_constants
+    constants = deployment_constants(network)
+    pools = [snapshot_pool(read, c, constants["BALANCER_VAULT"], tickWords) for c in candidates]
+    tokens = sorted({ t for p in pools for t in p["tokens"] if t.lower() != NATIVE_ETH.lower() })
+    decimals = read([(t, _fn("decimals"), [], ["uint8"]) for t in tokens])
+    return {
+        "network": network,
+        "block": block,
+        "weth": constants["WETH"],
+        "decimals": { t: d[0] for (t, d) in zip(tokens, decimals) },
+        "pools": pools,
+    }
+
+def _solidity_address(address):
+    """Solidity rejects address literals that are not checksummed, native ETH is traded as address(0)."""
+    from eth_utils import to_checksum_address
+    return ZERO_ADDRESS if address.lower() == NATIVE_ETH.lower() else to_checksum_address(address)
+
+def _solidity_exchange_data(pool, sell, buy, weth):
+    data = exchange_data(pool, sell, buy, weth)
+    dex = pool["dex"]
+    if dex == "UniswapV3":
+        return f"abi.encode(UniV3Adapter.UniV3SingleData({data['feeTier']}))"
+    if dex == "CurveV2":
+        return f"abi.encode(CurveV2Adapter.CurveV2SingleData({_solidity_address(data['pool'])}, " \
+               f"{data['fromIndex']}, {data['toIndex']}))"
+    if dex == "BalancerV2":
+        return f"abi.encode(BalancerV2Adapter.SingleSwapData({data['poolId']}))"
+    if dex == "UniswapV2":
+        return f"abi.encode(UniV2Adapter.UniV2Data(_path({sell}, {buy})))"
+    return '""'
+
+def write_vectors(snapshot, registry, sizes, path=VECTORS_FILE):
+    """
+    Writes a forge test that forks at the snapshot block and executes every quoted trade through the
+    trading module adapters, asserting the amount bought equals the python quote.
+    """
+    network = snapshot["network"]
+    deployment = registry.deployment(network)
+    weth = snapshot["weth"]
+    cases = []
+    for pool in snapshot["pools"]:
+        if not dex_supported(pool["dex"], network):
+            continue
+        tokens = [_solidity_address(t) for t in pool["tokens"] if route_token(t, weth) in snapshot["decimals"]]
+        for sell in tokens:
+            for buy in tokens:
+                if sell == buy:
+                    continue
+                amounts = uint_array([s * 10 ** snapshot["decimals"][route_token(sell, weth)] // ONE for s in sizes])
+                result = quote(pool, sell, buy, amounts, weth)
+                if result is None:
+                    continue
+                (out, ok) = result
+                # Algebra fees are not modeled exactly, those are checked to within 1e-6
+                tolerance = 10**12 if pool["dex"] == "CamelotV3" else 0
+                for (a, o, good) in zip(amounts, out, ok):
+                    if not good:
+                        continue
+                    cases.append(
+                        f"    function test_quote_{len(cases)}() public {{\n"
+                        f"        // {pool['dex']} {pool_label(pool)}\n"
+                        f"        _checkQuote(DexId.{DEX_IDS[pool['dex']]}, {sell}, {buy}, {a}, "
+                        f"{_solidity_exchange_data(pool, sell, buy, weth)}, {o}, {tolerance});\n"
+                        f"    }}"
+                    )
+
+    source = f"""// SPDX-License-Identifier: MIT
+pragma solidity 0.8.24;
+
+import "forge-std/Test.sol";
+import "@contracts/trading/TradingModule.sol";
+import "@contracts/trading/TradeHandler.sol";
+import "@contracts/trading/adapters/BalancerV2Adapter.sol";
+import "@contracts/trading/adapters/CurveV2Adapter.sol";
+import "@contracts/trading/adapters/UniV2Adapter.sol";
+import "@contracts/trading/adapters/UniV3Adapter.sol";
+import "@interfaces/notional/NotionalProxy.sol";
+import "@interfaces/trading/ITradingModule.sol";
+
+// Generated by `python -m scripts route-quote vectors`, do not edit. Expected amounts come from the
+// python model in scripts/route_quote.py quoting a {network} snapshot at block {snapshot['block']},
+// any mismatch means the model and the pools the adapters trade against differ.
+contract TestRouteQuotes is Test {{
+    using TradeHandler for Trade;
+
+    NotionalProxy constant NOTIONAL = NotionalProxy({_solidity_address(deployment['notional'])});
+    TradingModule constant TRADING_MODULE = TradingModule({_solidity_address(deployment['tradingModule'])});
+    uint256 constant FORK_BLOCK = {snapshot['block']};
+
+    function setUp() public {{
+        vm.createSelectFork(vm.envString("RPC_URL"), FORK_BLOCK);
+        TradingModule impl = new TradingModule(NOTIONAL, TRADING_MODULE);
+        vm.prank(NOTIONAL.owner());
+        TRADING_MODULE.upgradeTo(address(impl));
+    }}
+
+    function _path(address sell, address buy) internal pure returns (address[] memory path) {{
+        path = new address[](2);
+        path[0] = sell;
+        path[1] = buy;
+    }}
+
+    function _checkQuote(
+        DexId dexId,
+        address sellToken,
+        address buyToken,
+        uint256 amount,
+        bytes memory exchangeData,
+        uint256 expected,
+        uint256 maxRelDelta
+    ) internal {{
+        if (sellToken == address(0)) deal(address(this), amount);
+        else deal(sellToken, address(this), amount, true);
+        Trade memory t = Trade({{
+            tradeType: TradeType.EXACT_IN_SINGLE,
+            sellToken: sellToken,
+            buyToken: buyToken,
+            amount: amount,
+            limit: 0,
+            deadline: block.timestamp,
+            exchangeData: exchangeData
+        }});
+
+        vm.prank(NOTIONAL.owner());
+        TRADING_MODULE.setTokenPermissions(
+            address(this),
+            sellToken,
+            ITradingModule.TokenPermissions({{
+                allowSell: true,
+                dexFlags: uint32(1 << uint8(dexId)),
+                tradeTypeFlags: uint32(1 << uint8(TradeType.EXACT_IN_SINGLE))
+            }})
+        );
+
+        (/* */, uint256 amountBought) = t._executeTrade(uint16(dexId));
+        if (maxRelDelta == 0) assertEq(amountBought, expected, "quote");
+        else assertApproxEqRel(amountBought, expected, maxRelDelta, "quote");
+    }}
+
+{(chr(10) + chr(10)).join(cases)}
+}}
+"""
+    with open(path, "w") as f:
+        f.write(source)
+    return len(cases)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quote and rank trading module routes from pool snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("snapshot", help="Read pool states at a block")
+    s.add_argument("pools", help="yaml list of candidate pools, each with dex and pool (or poolId and kind for BalancerV2)")
+    s.add_argument("--network", default="arbitrum")
+    s.add_argument("--rpc", required=True)
+    s.add_argument("--block", type=int, required=True)
+    s.add_argument("--tick-words", type=int, default=TICK_WORDS,
+                   help="Bitmap words read on each side of the current tick of concentrated liquidity pools")
+    s.add_argument("--out", required=True, help="Snapshot yaml to write, i.e. route-snapshot.yml")
+
+    q = sub.add_parser("quote", help="Rank routes between two tokens")
+    q.add_argument("snapshot")
+    q.add_argument("--sell", required=True, help="Token symbol or address")
+    q.add_argument("--buy", required=True, help="Token symbol or address")
+    q.add_argument("--amounts", nargs="+", required=True, help="Sell amounts in token precision, i.e. 10e18")
+
+    g = sub.add_parser("suggest", help="Suggest primaryDex, exchangeData and permissions for PendlePT vaults")
+    g.add_argument("snapshot")
+    g.add_argument("vault", nargs="+", help="Generated test names, i.e. PendlePT_rsETH_26DEC2024_ETH")
+    g.add_argument("--steps", type=int, default=5, help="Trade sizes between minDeposit and maxDeposit")
+
+    v = sub.add_parser("vectors", help=f"Write the differential forge test to {VECTORS_FILE}")
+    v.add_argument("snapshot")
+    v.add_argument("--sizes", nargs="+", default=["1e15", "1e18", "100e18"],
+                   help="Trade sizes in 1e18 precision, scaled to each sell token's decimals")
+    args = parser.parse_args(argv)
+
+    from scripts.gnosis_payloads import sol_int
+    from scripts.registry import load_registry, normalize_network
+    registry = load_registry()
+
+    if args.command == "snapshot":
+        with open(args.pools, "r") as f:
+            candidates = yaml.safe_load(f)
+        network = normalize_network(args.network)
+        snapshot = take_snapshot(rpc_reader(args.rpc, args.block), network, args.block, candidates, args.tick_words)
+        with open(args.out, "w") as f:
+            yaml.safe_dump(snapshot, f, sort_keys=False)
+        print(f"Wrote {len(snapshot['pools'])} pools at block {args.block} to {args.out}")
+        return 0
+
+    snapshot = load_snapshot(args.snapshot)
+    network = snapshot["network"]
+    if args.command == "quote":
+        def token(value):
+            return value if value.startswith("0x") else registry.token(network, value)
+        amounts = uint_array([sol_int(a) for a in args.amounts])
+        (sell, buy) = (token(args.sell), token(args.buy))
+        print_ranking(snapshot, sell, buy, amounts, rank_routes(snapshot, sell, buy, amounts))
+        return 0
+
+    if args.command == "vectors":
+        count = write_vectors(snapshot, registry, [sol_int(s) for s in args.sizes])
+        print(f"Wrote {count} quotes to {VECTORS_FILE}, run with FOUNDRY_PROFILE={network} forge test --mp {VECTORS_FILE}")
+        return 0
+
+    from scripts.gnosis_payloads import select_vaults
+    found = 0
+    for (family, _, name, context) in select_vaults(registry, [network], set(args.vault)):
+        if family != "PendlePT":
+            continue
+        found += 1
+        amounts = trade_sizes(sol_int(context["setUp"]["minDeposit"]), sol_int(context["setUp"]["maxDeposit"]), args.steps)
+        (routes, suggestion) = suggest(snapshot, context, amounts)
+        print(f"# {name}: {context['primaryBorrowCurrency']} => {context['stakeSymbol']}, currently {context['primaryDex']}")
+        print_ranking(snapshot, context["borrowToken"], context["stakeToken"], amounts, routes, file=sys.stderr)
+        if suggestion is None:
+            print("# no snapshotted route fills every size")
+        else:
+            print(yaml.safe_dump(suggestion, sort_keys=False))
+    if found == 0:
+        print(f"No PendlePT vault on {network} matches {', '.join(args.vault)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.24;
+
+import "./harness/index.sol";
+import { SingleSidedLPHarness } from "./harness/SingleSidedLPHarness.sol";
+import { VaultConfigData } from "../StrategyVaultHarness.sol";
+
+// Everything that differs between the generated SingleSidedLP tests. Consolidated generation
+// renders one of these per vault instead of a Test and Harness contract pair, the tests then
+// share one harness contract per vault type.
+struct SingleSidedLPVault {
+    uint256 forkBlock;
+    address whale;
+    address flashLender;
+    uint256 minDeposit;
+    uint256 maxDeposit;
+    uint256 maxRelEntryValuation;
+    uint256 maxRelExitValuation;
+    string[] skipTests;
+
+    string vaultName;
+    address existingDeployment;
+    uint16 primaryBorrowCurrency;
+    StrategyVaultSettings settings;
+    address rewardPool;
+    address whitelistedReward;
+    address[] rewardTokens;
+    bool useAccountClaim;
+    address[] oracleTokens;
+    address[] oracles;
+    address[] permissionTokens;
+    ITradingModule.TokenPermissions[] permissions;
+    VaultConfigData config;
+
+    // ComposablePool
+    bytes32 balancerPoolId;
+    address balancerPool;
+    // Curve2Token and Curve2TokenConvex
+    address poolToken;
+    address lpToken;
+    CurveInterface curveInterface;
+    // WrappedComposablePool
+    uint32 defaultSlippage;
+    uint16 wrappedDexId;
+    bytes32 wrappedExchangeData;
+    address wrappedBorrowToken;
+}
+
+abstract contract SingleSidedLPDataHarness is SingleSidedLPHarness {
+    bytes vaultData;
+
+    constructor(SingleSidedLPVault memory d) {
+        vaultData = abi.encode(d);
+        EXISTING_DEPLOYMENT = d.existingDeployment;
+        setMetadata(getDataMetadata(d));
+    }
+
+    function getDataMetadata(SingleSidedLPVault memory d) internal pure returns (SingleSidedLPMetadata memory _m) {
+        _m.primaryBorrowCurrency = d.primaryBorrowCurrency;
+        _m.settings = d.settings;
+        _m.rewardPool = IERC20(d.rewardPool);
+        _m.whitelistedReward = d.whitelistedReward;
+        _m.poolToken = IERC20(d.poolToken);
+        _m.rewardTokens = new IERC20[](d.rewardTokens.length);
+        for (uint256 i; i < d.rewardTokens.length; i++) _m.rewardTokens[i] = IERC20(d.rewardTokens[i]);
+    }
+
+    function getVaultData() public view returns (SingleSidedLPVault memory) {
+        return abi.decode(vaultData, (SingleSidedLPVault));
+    }
+
+    function getVaultName() public view override returns (string memory) {
+        return getVaultData().vaultName;
+    }
+
+    function getDeploymentConfig() public view override returns (
+        VaultConfigParams memory params, uint80 maxPrimaryBorrow
+    ) {
+        return applyVaultConfig(getVaultData().config);
+    }
+
+    function getRequiredOracles() public view override returns (
+        address[] memory token, address[] memory oracle
+    ) {
+        SingleSidedLPVault memory d = getVaultData();
+        return (d.oracleTokens, d.oracles);
+    }
+
+    function getTradingPermissions() public view override returns (
+        address[] memory token, ITradingModule.TokenPermissions[] memory permissions
+    ) {
+        SingleSidedLPVault memory d = getVaultData();
+        return (d.permissionTokens, d.permissions);
+    }
+
+    function getRewardSettings() public view override returns (StrategyVaultHarness.RewardSettings[] memory rewards) {
+        SingleSidedLPVault memory d = getVaultData();
+        if (!d.useAccountClaim) return rewards;
+
+        rewards = new StrategyVaultHarness.RewardSettings[](d.rewardTokens.length);
+        for (uint256 i; i < d.rewardTokens.length; i++) {
+            rewards[i] = StrategyVaultHarness.RewardSettings({
+                token: d.rewardTokens[i],
+                emissionRatePerYear: 0,
+                endTime: 0
+            });
+        }
+    }
+
+    function hasRewardReinvestmentRole() public view virtual override returns (bool) {
+        return !getVaultData().useAccountClaim;
+    }
+}
+
+// NOTE: functions defined on both sides of the inheritance diamond, i.e. hasRewardReinvestmentRole,
+// have to be overridden explicitly in every harness below
+
+contract WeightedPoolDataHarness is WeightedPoolHarness, SingleSidedLPDataHarness {
+    constructor(SingleSidedLPVault memory d) SingleSidedLPDataHarness(d) { }
+
+    function hasRewardReinvestmentRole() public view override(SingleSidedLPHarness, SingleSidedLPDataHarness) returns (bool) {
+        return super.hasRewardReinvestmentRole();
+    }
+}
+
+contract ComposablePoolDataHarness is ComposablePoolHarness, SingleSidedLPDataHarness {
+    constructor(SingleSidedLPVault memory d) SingleSidedLPDataHarness(d) {
+        balancerPoolId = d.balancerPoolId;
+        balancerPool = d.balancerPool;
+    }
+
+    function hasRewardReinvestmentRole() public view override(SingleSidedLPHarness, SingleSidedLPDataHarness) returns (bool) {
+        return super.hasRewardReinvestmentRole();
+    }
+}
+
+contract WrappedComposablePoolDataHarness is WrappedComposablePoolHarness, SingleSidedLPDataHarness {
+    constructor(SingleSidedLPVault memory d) SingleSidedLPDataHarness(d) {
+        WrappedComposableMetadata memory meta;
+        meta.meta = getDataMetadata(d);
+        meta.defaultSlippage = d.defaultSlippage;
+        meta.dexId = d.wrappedDexId;
+        meta.exchangeData = d.wrappedExchangeData;
+        meta.borrowToken = d.wrappedBorrowToken;
+        setMetadata(meta);
+    }
+
+    function getMetadata() public view override(SingleSidedLPHarness, WrappedComposablePoolHarness) returns (
+        SingleSidedLPMetadata memory _m
+    ) {
+        return super.getMetadata();
+    }
+
+    function hasRewardReinvestmentRole() public view override(SingleSidedLPHarness, SingleSidedLPDataHarness) returns (bool) {
+        return super.hasRewardReinvestmentRole();
+    }
+}
+
+contract Curve2TokenConvexDataHarness is Curve2TokenConvexHarness, SingleSidedLPDataHarness {
+    constructor(SingleSidedLPVault memory d) SingleSidedLPDataHarness(d) {
+        lpToken = d.lpToken;
+        curveInterface = d.curveInterface;
+    }
+
+    function hasRewardReinvestmentRole() public view override(SingleSidedLPHarness, SingleSidedLPDataHarness) returns (bool) {
+        return super.hasRewardReinvestmentRole();
+    }
+}
+
+contract Curve2TokenDataHarness is Curve2TokenHarness, SingleSidedLPDataHarness {
+    constructor(SingleSidedLPVault memory d) SingleSidedLPDataHarness(d) {
+        lpToken = d.lpToken;
+        curveInterface = d.curveInterface;
+    }
+
+    function hasRewardReinvestmentRole() public view override(SingleSidedLPHarness, SingleSidedLPDataHarness) returns (bool) {
+        return super.hasRewardReinvestmentRole();
+    }
+}
+
+abstract contract SingleSidedLPDataTest is VaultRewarderTests {
+    function getVaultData() internal pure virtual returns (SingleSidedLPVault memory);
+
+    // Artifact of the shared harness, deploying it from the artifact keeps its bytecode and the
+    // vault bytecode out of every test contract
+    function harnessArtifact() internal pure virtual returns (string memory);
+
+    function _shouldSkip(string memory name) internal pure override returns(bool) {
+        string[] memory skipTests = getVaultData().skipTests;
+        for (uint256 i; i < skipTests.length; i++) {
+            if (keccak256(abi.encodePacked(name)) == keccak256(abi.encodePacked(skipTests[i]))) return true;
+        }
+        return false;
+    }
+
+    function setUp() public virtual override {
+        SingleSidedLPVault memory d = getVaultData();
+        if (d.forkBlock != 0) FORK_BLOCK = d.forkBlock;
+        harness = StrategyVaultHarness(deployCode(harnessArtifact(), abi.encode(d)));
+
+        WHALE = d.whale;
+        // NOTE: need to enforce some minimum deposit here b/c of rounding issues
+        // on the DEX side, even though we short circuit 0 deposits
+        minDeposit = d.minDeposit;
+        maxDeposit = d.maxDeposit;
+        maxRelEntryValuation = d.maxRelEntryValuation * BASIS_POINT;
+        maxRelExitValuation = d.maxRelExitValuation * BASIS_POINT;
+        if (d.flashLender != address(0)) flashLender = d.flashLender;
+
+        super.setUp();
+    }
+}
+
+abstract contract WeightedPoolDataTest is SingleSidedLPDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "SingleSidedLPData.sol:WeightedPoolDataHarness";
+    }
+}
+
+abstract contract ComposablePoolDataTest is SingleSidedLPDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "SingleSidedLPData.sol:ComposablePoolDataHarness";
+    }
+}
+
+abstract contract WrappedComposablePoolDataTest is SingleSidedLPDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "SingleSidedLPData.sol:WrappedComposablePoolDataHarness";
+    }
+}
+
+abstract contract Curve2TokenConvexDataTest is SingleSidedLPDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "SingleSidedLPData.sol:Curve2TokenConvexDataHarness";
+    }
+}
+
+abstract contract Curve2TokenDataTest is SingleSidedLPDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "SingleSidedLPData.sol:Curve2TokenDataHarness";
+    }
+}
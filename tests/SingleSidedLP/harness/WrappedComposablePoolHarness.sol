@@ -16,7 +16,7 @@ abstract contract WrappedComposablePoolHarness is SingleSidedLPHarness {
         address borrowToken;
     }
 
-    function getMetadata() override public view returns (SingleSidedLPMetadata memory _m) {
+    function getMetadata() virtual override public view returns (SingleSidedLPMetadata memory _m) {
         return abi.decode(metadata, (WrappedComposableMetadata)).meta;
     }
 
@@ -0,0 +1,324 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.24;
+
+import "./harness/index.sol";
+import {WithdrawRequestNFT} from "@contracts/vaults/staking/protocols/EtherFi.sol";
+import {WithdrawManager} from "@contracts/vaults/staking/protocols/Kelp.sol";
+import {
+    PendleDepositParams,
+    IPRouter,
+    IPMarket
+} from "@contracts/vaults/staking/protocols/PendlePrincipalToken.sol";
+import {PendlePTOracle} from "@contracts/oracles/PendlePTOracle.sol";
+import "@interfaces/chainlink/AggregatorV2V3Interface.sol";
+import "@interfaces/ethena/IsUSDe.sol";
+import { PendlePTGeneric } from "@contracts/vaults/staking/PendlePTGeneric.sol";
+import { PendlePTStakedUSDeVault } from "@contracts/vaults/staking/PendlePTStakedUSDeVault.sol";
+import { PendlePTEtherFiVault } from "@contracts/vaults/staking/PendlePTEtherFiVault.sol";
+import { PendlePTKelpVault } from "@contracts/vaults/staking/PendlePTKelpVault.sol";
+
+// Everything that differs between the generated PendlePT tests. Consolidated generation
+// renders one of these per vault instead of a Test and Harness contract pair, the tests
+// then share one harness contract per vault contract.
+struct PendlePTVault {
+    uint256 forkBlock;
+    address whale;
+    uint256 minDeposit;
+    uint256 maxDeposit;
+    uint256 maxRelEntryValuation;
+    uint256 maxRelExitValuation;
+    uint256 maxRelExitValuation_WithdrawRequest_Fixed;
+    uint256 maxRelExitValuation_WithdrawRequest_Variable;
+    int256 deleverageCollateralDecreaseRatio;
+    int256 defaultLiquidationDiscount;
+    int256 withdrawLiquidationDiscount;
+    int256 splitWithdrawPriceDecrease;
+    bool tradeOnEntry;
+    // Exit exchange data when it is not the entry exchange data, i.e. CurveV2 swaps its indexes
+    bytes redeemExchangeData;
+
+    string vaultName;
+    address existingDeployment;
+    address marketAddress;
+    address ptAddress;
+    bool useSyOracleRate;
+    address baseToUSDOracle;
+    address borrowToken;
+    address stakeToken;
+    uint16 borrowCurrencyId;
+    uint8 primaryDexId;
+    bytes exchangeData;
+    address[] oracleTokens;
+    address[] oracles;
+    address[] permissionTokens;
+    ITradingModule.TokenPermissions[] permissions;
+    VaultConfigData config;
+}
+
+interface ILRTOracle {
+    function getAssetPrice(address asset) external view returns (uint256);
+    function rsETHPrice() external view returns (uint256);
+}
+
+ILRTOracle constant lrtOracle = ILRTOracle(0x349A73444b1a310BAe67ef67973022020d70020d);
+address constant unstakingVault = 0xc66830E2667bc740c0BED9A71F18B14B8c8184bA;
+
+abstract contract PendlePTDataHarness is PendleStakingHarness {
+    bytes vaultData;
+
+    constructor(PendlePTVault memory d, bool hasWithdrawRequests) {
+        vaultData = abi.encode(d);
+        EXISTING_DEPLOYMENT = d.existingDeployment;
+        marketAddress = d.marketAddress;
+        ptAddress = d.ptAddress;
+        twapDuration = 15 minutes; // recommended 15 - 30 min
+        useSyOracleRate = d.useSyOracleRate;
+        baseToUSDOracle = d.baseToUSDOracle;
+        borrowToken = d.borrowToken;
+        tokenOutSy = d.stakeToken;
+
+        setMetadata(StakingMetadata(d.borrowCurrencyId, d.primaryDexId, d.exchangeData, hasWithdrawRequests));
+    }
+
+    function getVaultData() public view returns (PendlePTVault memory) {
+        return abi.decode(vaultData, (PendlePTVault));
+    }
+
+    function getVaultName() public view override returns (string memory) {
+        return getVaultData().vaultName;
+    }
+
+    function getRequiredOracles() public view override returns (
+        address[] memory token, address[] memory oracle
+    ) {
+        PendlePTVault memory d = getVaultData();
+        token = new address[](d.oracleTokens.length + 1);
+        oracle = new address[](d.oracles.length + 1);
+
+        // Custom PT Oracle
+        token[0] = ptAddress;
+        oracle[0] = ptOracle;
+
+        for (uint256 i; i < d.oracleTokens.length; i++) {
+            token[i + 1] = d.oracleTokens[i];
+            oracle[i + 1] = d.oracles[i];
+        }
+    }
+
+    function getTradingPermissions() public view override returns (
+        address[] memory token, ITradingModule.TokenPermissions[] memory permissions
+    ) {
+        PendlePTVault memory d = getVaultData();
+        return (d.permissionTokens, d.permissions);
+    }
+
+    function getDeploymentConfig() public view override returns (
+        VaultConfigParams memory params, uint80 maxPrimaryBorrow
+    ) {
+        return applyVaultConfig(getVaultData().config);
+    }
+}
+
+contract PendlePTGenericDataHarness is PendlePTDataHarness {
+    constructor(PendlePTVault memory d) PendlePTDataHarness(d, false) {
+        tokenInSy = d.stakeToken;
+        redemptionToken = d.stakeToken;
+    }
+
+    function deployImplementation() internal override returns (address impl) {
+        return address(new PendlePTGeneric(
+            marketAddress, tokenInSy, tokenOutSy, borrowToken, ptAddress, redemptionToken
+        ));
+    }
+}
+
+contract PendlePTStakedUSDeVaultDataHarness is PendlePTDataHarness {
+    constructor(PendlePTVault memory d) PendlePTDataHarness(d, true) { }
+
+    function deployImplementation() internal override returns (address impl) {
+        return address(new PendlePTStakedUSDeVault(marketAddress, ptAddress, borrowToken));
+    }
+
+    function withdrawToken(address /* vault */) public pure override returns (address) {
+        // USDe is the withdraw token
+        return 0x4c9EDD5852cd905f086C759E8383e09bff1E68B3;
+    }
+}
+
+contract PendlePTEtherFiVaultDataHarness is PendlePTDataHarness {
+    constructor(PendlePTVault memory d) PendlePTDataHarness(d, true) { }
+
+    function deployImplementation() internal override returns (address impl) {
+        return address(new PendlePTEtherFiVault(marketAddress, ptAddress));
+    }
+}
+
+contract PendlePTKelpVaultDataHarness is PendlePTDataHarness {
+    constructor(PendlePTVault memory d) PendlePTDataHarness(d, true) { }
+
+    function deployImplementation() internal override returns (address impl) {
+        return address(new PendlePTKelpVault(marketAddress, ptAddress));
+    }
+}
+
+abstract contract PendlePTDataTest is BasePendleTest {
+    function getVaultData() internal pure virtual returns (PendlePTVault memory);
+
+    // Artifact of the shared harness, deploying it from the artifact keeps its bytecode and the
+    // vault bytecode out of every test contract
+    function harnessArtifact() internal pure virtual returns (string memory);
+
+    function setUp() public virtual override {
+        PendlePTVault memory d = getVaultData();
+        if (d.forkBlock != 0) FORK_BLOCK = d.forkBlock;
+        WHALE = d.whale;
+        harness = StrategyVaultHarness(deployCode(harnessArtifact(), abi.encode(d)));
+
+        // NOTE: need to enforce some minimum deposit here b/c of rounding issues
+        // on the DEX side, even though we short circuit 0 deposits
+        minDeposit = d.minDeposit;
+        maxDeposit = d.maxDeposit;
+        maxRelEntryValuation = d.maxRelEntryValuation * BASIS_POINT;
+        maxRelExitValuation = d.maxRelExitValuation * BASIS_POINT;
+        maxRelExitValuation_WithdrawRequest_Fixed = d.maxRelExitValuation_WithdrawRequest_Fixed;
+        maxRelExitValuation_WithdrawRequest_Variable = d.maxRelExitValuation_WithdrawRequest_Variable;
+        deleverageCollateralDecreaseRatio = d.deleverageCollateralDecreaseRatio;
+        defaultLiquidationDiscount = d.defaultLiquidationDiscount;
+        withdrawLiquidationDiscount = d.withdrawLiquidationDiscount;
+        splitWithdrawPriceDecrease = d.splitWithdrawPriceDecrease;
+
+        super.setUp();
+    }
+
+    function getDepositParams(
+        uint256 /* depositAmount */,
+        uint256 /* maturity */
+    ) internal view override returns (bytes memory) {
+        StakingMetadata memory m = BaseStakingHarness(address(harness)).getMetadata();
+        bool tradeOnEntry = getVaultData().tradeOnEntry;
+
+        PendleDepositParams memory d = PendleDepositParams({
+            dexId: tradeOnEntry ? m.primaryDexId : 0,
+            minPurchaseAmount: 0,
+            exchangeData: tradeOnEntry ? m.exchangeData : bytes(""),
+            minPtOut: 0,
+            approxParams: IPRouter.ApproxParams({
+                guessMin: 0,
+                guessMax: type(uint256).max,
+                guessOffchain: 0,
+                maxIteration: 256,
+                eps: 1e15 // recommended setting (0.1%)
+            })
+        });
+
+        return abi.encode(d);
+    }
+
+    function getRedeemParams(
+        uint256 vaultShares,
+        uint256 maturity
+    ) internal view virtual override returns (bytes memory) {
+        bytes memory redeemExchangeData = getVaultData().redeemExchangeData;
+        if (redeemExchangeData.length == 0) return super.getRedeemParams(vaultShares, maturity);
+
+        RedeemParams memory r;
+        StakingMetadata memory m = BaseStakingHarness(address(harness)).getMetadata();
+        r.minPurchaseAmount = 0;
+        r.dexId = m.primaryDexId;
+        r.exchangeData = redeemExchangeData;
+
+        return abi.encode(r);
+    }
+}
+
+abstract contract PendlePTGenericDataTest is PendlePTDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "PendlePTData.sol:PendlePTGenericDataHarness";
+    }
+
+    function finalizeWithdrawRequest(address account) internal override {}
+}
+
+abstract contract PendlePTStakedUSDeVaultDataTest is PendlePTDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "PendlePTData.sol:PendlePTStakedUSDeVaultDataHarness";
+    }
+
+    function finalizeWithdrawRequest(address account) internal override {
+        WithdrawRequest memory w = v().getWithdrawRequest(account);
+        IsUSDe.UserCooldown memory wCooldown = sUSDe.cooldowns(address(uint160(w.requestId)));
+
+        setMaxOracleFreshness();
+        vm.warp(wCooldown.cooldownEnd);
+    }
+
+    function getRedeemParams(
+        uint256 /* vaultShares */,
+        uint256 /* maturity */
+    ) internal view virtual override returns (bytes memory) {
+        RedeemParams memory r;
+
+        r.minPurchaseAmount = 0;
+        r.dexId = 7; // CurveV2
+        // For CurveV2 we need to swap the in and out indexes on exit
+        CurveV2Adapter.CurveV2SingleData memory d;
+        d.pool = 0xbEbc44782C7dB0a1A60Cb6fe97d0b483032FF1C7;
+        d.fromIndex = 0; // DAI
+        d.toIndex = 1; // USDC
+        r.exchangeData = abi.encode(d);
+
+        return abi.encode(r);
+    }
+
+    function getRedeemParamsWithdrawRequest(
+        uint256 /* vaultShares */,
+        uint256 /* maturity */
+    ) internal view virtual override returns (bytes memory) {
+        RedeemParams memory r;
+        // On withdraw request, we need to swap USDe to USDC
+
+        r.minPurchaseAmount = 0;
+        r.dexId = 7; // CurveV2
+        // For CurveV2 we need to swap the in and out indexes on exit
+        CurveV2Adapter.CurveV2SingleData memory d;
+        d.pool = 0x02950460E2b9529D0E00284A5fA2d7bDF3fA4d72;
+        d.fromIndex = 0; // USDe
+        d.toIndex = 1; // USDC
+        r.exchangeData = abi.encode(d);
+
+        return abi.encode(r);
+    }
+}
+
+abstract contract PendlePTEtherFiVaultDataTest is PendlePTDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "PendlePTData.sol:PendlePTEtherFiVaultDataHarness";
+    }
+
+    function finalizeWithdrawRequest(address account) internal override {
+        WithdrawRequest memory w = v().getWithdrawRequest(account);
+
+        vm.prank(0x0EF8fa4760Db8f5Cd4d993f3e3416f30f942D705); // etherFi: admin
+        WithdrawRequestNFT.finalizeRequests(w.requestId);
+    }
+}
+
+abstract contract PendlePTKelpVaultDataTest is PendlePTDataTest {
+    function harnessArtifact() internal pure override returns (string memory) {
+        return "PendlePTData.sol:PendlePTKelpVaultDataHarness";
+    }
+
+    function finalizeWithdrawRequest(address /* account */) internal override {
+        // finalize withdraw request on Kelp
+        vm.deal(address(unstakingVault), 10_000e18);
+        vm.startPrank(0xCbcdd778AA25476F203814214dD3E9b9c46829A1); // kelp: operator
+        WithdrawManager.unlockQueue(
+            Deployments.ALT_ETH_ADDRESS,
+            type(uint256).max,
+            lrtOracle.getAssetPrice(Deployments.ALT_ETH_ADDRESS),
+            lrtOracle.rsETHPrice()
+        );
+        vm.stopPrank();
+        vm.roll(block.number + WithdrawManager.withdrawalDelayBlocks());
+    }
+}
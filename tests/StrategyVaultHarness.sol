@@ -5,6 +5,20 @@ import "@interfaces/notional/NotionalProxy.sol";
 import "@interfaces/notional/IStrategyVault.sol";
 import "@interfaces/trading/ITradingModule.sol";
 
+// Per vault overrides of the test vault config, used by the data driven harnesses
+// that consolidated test generation deploys
+struct VaultConfigData {
+    uint8 feeRate5BPS;
+    uint8 liquidationRate;
+    uint8 reserveFeeShare;
+    uint8 maxBorrowMarketIndex;
+    uint16 minCollateralRatioBPS;
+    uint16 maxRequiredAccountCollateralRatioBPS;
+    uint16 maxDeleverageCollateralRatioBPS;
+    uint256 minAccountBorrowSize;
+    uint80 maxPrimaryBorrow;
+}
+
 abstract contract StrategyVaultHarness {
     address public EXISTING_DEPLOYMENT;
     bytes public metadata;
@@ -30,7 +44,7 @@ abstract contract StrategyVaultHarness {
         EXISTING_DEPLOYMENT = deployment;
     }
 
-    function getVaultName() public pure virtual returns (string memory);
+    function getVaultName() public view virtual returns (string memory);
     function getTestVaultConfig() public view virtual returns (VaultConfigParams memory);
 
     function deployVaultImplementation() public virtual returns (
@@ -46,6 +60,23 @@ abstract contract StrategyVaultHarness {
         address[] memory token, ITradingModule.TokenPermissions[] memory permissions
     );
 
+    function applyVaultConfig(VaultConfigData memory c) internal view returns (
+        VaultConfigParams memory params, uint80 maxPrimaryBorrow
+    ) {
+        params = getTestVaultConfig();
+        params.feeRate5BPS = c.feeRate5BPS;
+        params.liquidationRate = c.liquidationRate;
+        params.reserveFeeShare = c.reserveFeeShare;
+        params.maxBorrowMarketIndex = c.maxBorrowMarketIndex;
+        params.minCollateralRatioBPS = c.minCollateralRatioBPS;
+        params.maxRequiredAccountCollateralRatioBPS = c.maxRequiredAccountCollateralRatioBPS;
+        params.maxDeleverageCollateralRatioBPS = c.maxDeleverageCollateralRatioBPS;
+
+        // NOTE: these are always in 8 decimals
+        params.minAccountBorrowSize = c.minAccountBorrowSize;
+        maxPrimaryBorrow = c.maxPrimaryBorrow;
+    }
+
     function getRewardSettings() public view virtual returns (RewardSettings[] memory rewards) {
         return rewards;
     }
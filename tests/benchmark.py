@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import yaml
+from tests.generate import FAMILIES, get_contract_name, generate
+from scripts.export_abi import merge_abis, build_selector_index
+from scripts.generateEmergencyExit import generate as generate_emergency_exit
+from scripts.registry import CONFIG_FILE, VAULTS_FILE, V2_FILES, V3_FILES, load_registry
+
+RESULTS_FILE = "./.benchmarks/latest.json"
+BASELINE_FILE = "./tests/benchmark_baseline.json"
+SCALES = [10, 1_000, 10_000]
+# A case regresses when it is this much slower or uses this much more memory than the baseline
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+# Timings below this, in the baseline or the new run, are dominated by noise and are not compared
+MIN_COMPARED_SECONDS = 0.25
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+
+def synthetic_expiry(i):
+    """A unique expiry that still matches the spec schema, i.e. 01JAN2100 for i = 0."""
+    return f"{i % 28 + 1:02d}{MONTHS[i // 28 % 12]}{2100 + i // (28 * 12)}"
+
+def synthetic_specs(n):
+    """
+    Builds yaml specs with n vaults in total by cycling through the real entries of every
+    family and network, suffixing the names or giving each PT its own expiry so that every
+    vault renders to its own file and still passes the spec schema.
+    """
+    specs = {}
+    templates = []
+    for (family, f) in FAMILIES.items():
+        with open(f['yaml'], 'r') as y:
+            spec = yaml.safe_load(y)
+        specs[family] = { "defaults": spec['defaults'] }
+        for (network, tests) in spec.items():
+            if network != "defaults":
+                templates.extend((family, network, t) for t in (tests or []))
+
+    for i in range(n):
+        (family, network, test) = templates[i % len(templates)]
+        test = dict(test)
+        if 'vaultName' in test:
+            test['vaultName'] = f"{test['vaultName']}_B{i}"
+        else:
+            test['expiry'] = synthetic_expiry(i)
+        specs[family].setdefault(network, []).append(test)
+
+    return specs
+
+def synthetic_vaults(specs):
+    """Registers a deployment for every synthetic vault, matching how the generators look them up."""
+    vaults = {}
+    i = 0
+    for (family, spec) in specs.items():
+        for (network, tests) in spec.items():
+            if network == "defaults":
+                continue
+            for test in tests:
+                i += 1
+                if family == "PendlePT":
+                    (protocol, poolName) = ("Pendle", f"[{test['primaryBorrowCurrency']}]:{test['stakeSymbol']}_{test['expiry']}")
+                else:
+                    [_, protocol, poolName] = get_contract_name(test).split("_", 2)
+                    poolName = f"[{test['primaryBorrowCurrency']}]:{poolName}"
+                # All lowercase addresses are valid without a checksum
+                vaults.setdefault(network, {}).setdefault(protocol, {})[poolName] = f"0x{i:040x}"
+    return vaults
+
+def synthetic_abis(n):
+    """n functions, events and errors spread over two ABIs with a quarter of them overlapping."""
+    def entries(start, end):
+        abi = []
+        for i in range(start, end):
+            inputs = [{ "internalType": "uint256", "name": "a", "type": "uint256" }]
+            abi.append({ "type": "function", "name": f"f{i}", "inputs": inputs, "outputs": [], "stateMutability": "nonpayable" })
+            abi.append({ "type": "event", "name": f"E{i}", "inputs": inputs, "anonymous": False })
+            abi.append({ "type": "error", "name": f"Err{i}", "inputs": inputs })
+        return abi
+
+    return (entries(0, n // 2 + n // 4), entries(n // 2, n))
+
+def make_workspace(n):
+    """Copies the generator inputs into a scratch directory and replaces the specs and vaults with synthetic ones."""
+    root = tempfile.mkdtemp(prefix="lv-bench-")
+    for path in [CONFIG_FILE, *V3_FILES.values(), *V2_FILES.values()] + [f['template'] for f in FAMILIES.values()]:
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        shutil.copy(path, os.path.join(root, path))
+    shutil.copytree("abi", os.path.join(root, "abi"))
+
+    specs = synthetic_specs(n)
+    for (family, f) in FAMILIES.items():
+        with open(os.path.join(root, f['yaml']), 'w') as y:
+            yaml.safe_dump(specs.get(family, { "defaults": {} }), y)
+    with open(os.path.join(root, VAULTS_FILE), 'w') as f:
+        json.dump(synthetic_vaults(specs), f)
+
+    return root
+
+def case_generate(n):
+    generate(workers=1)
+
+def case_generate_unchanged(n):
+    # Setup run so that the measured run only checks the manifest
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate(workers=1)
+    return lambda: generate(workers=1)
+
+def case_registry(n):
+    load_registry(useCache=False)
+
+def case_emergency_exit(n):
+    registry = load_registry()
+    return lambda: generate_emergency_exit(registry)
+
+def case_abi_merge(n):
+    (a, b) = synthetic_abis(n)
+    return lambda: build_selector_index({ "Merged": merge_abis(a, b) })
+
+# Cases return None when the call itself is the workload, or a function to measure after setup
+CASES = {
+    "generate": case_generate,
+    "generate-unchanged": case_generate_unchanged,
+    "registry": case_registry,
+    "emergency-exit": case_emergency_exit,
+    "abi-merge": case_abi_merge,
+}
+
+def measure(case, n, traceMemory):
+    cwd = os.getcwd()
+    root = make_workspace(n)
+    try:
+        os.chdir(root)
+        gc.collect()
+        if traceMemory:
+            tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            workload = CASES[case](n)
+            if workload is not None:
+                if traceMemory:
+                    tracemalloc.reset_peak()
+                start = time.perf_counter()
+                workload()
+            elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if traceMemory else None
+    finally:
+        tracemalloc.stop()
+        os.chdir(cwd)
+        shutil.rmtree(root)
+    return (elapsed, peak)
+
+def run(cases, scales, repeat):
+    """
+    Times each case as the median of repeat runs after an untimed warm up run, which pays for
+    imports and cold caches, then measures peak allocations in a separate run since tracemalloc
+    slows down the code it is tracing.
+    """
+    results = {}
+    for case in cases:
+        for n in scales:
+            measure(case, n, False)
+            seconds = statistics.median(measure(case, n, False)[0] for _ in range(repeat))
+            (_, peak) = measure(case, n, True)
+            results.setdefault(case, {})[str(n)] = { "seconds": round(seconds, 4), "peakMB": round(peak / 2**20, 2) }
+            print(f"{case:<20} {n:>6}: {seconds:8.3f}s {peak / 2**20:8.1f}MB", file=sys.stderr)
+    return results
+
+def compare(results, baseline, timeThreshold, memoryThreshold):
+    """Returns a list of regressions relative to the baseline, cases missing from either side are skipped."""
+    regressions = []
+    for (case, scales) in results.items():
+        for (n, r) in scales.items():
+            b = baseline.get(case, {}).get(n)
+            if b is None:
+                continue
+            timed = min(b["seconds"], r["seconds"]) >= MIN_COMPARED_SECONDS
+            if timed and r["seconds"] > b["seconds"] * (1 + timeThreshold):
+                regressions.append(f"{case} [{n}]: {r['seconds']}s vs {b['seconds']}s baseline")
+            if r["peakMB"] > b["peakMB"] * (1 + memoryThreshold):
+                regressions.append(f"{case} [{n}]: {r['peakMB']}MB vs {b['peakMB']}MB baseline")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the python tooling on synthetic vault sets")
+    parser.add_argument("--case", action="append", choices=list(CASES.keys()), help="Cases to run, defaults to all")
+    parser.add_argument("--scale", action="append", type=int, help=f"Number of vaults, defaults to {SCALES}")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per case after a warm up, the median is kept")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run(args.case or list(CASES.keys()), args.scale or SCALES, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, sort_keys=True, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, sort_keys=True, indent=2)
+        return 0
+
+    try:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    for r in regressions:
+        print(f"REGRESSION {r}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Compares cold compiles of the per vault generated tests against the consolidated ones written
+by `generate --consolidate`. For each network and mode the tests are regenerated, then built
+from scratch with `forge build --force` into a scratch directory, recording the wall time and
+the number and size of the artifacts.
+
+    python -m scripts compile-stats --network mainnet
+    python -m scripts compile-stats --static
+
+Counts of the source files and concrete contracts that solc has to generate bytecode for are
+read from the import graph and reported even when forge is not installed.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from tests.run_tests import NETWORKS, test_files
+
+RESULTS_FILE = "./.benchmarks/compile.json"
+# mode => consolidated
+MODES = { "per-vault": False, "consolidated": True }
+
+COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+# Abstract contracts, interfaces and libraries linked from the profile produce no test bytecode
+CONTRACT = re.compile(r"^\s*contract\s+(\w+)", re.MULTILINE)
+
+
+def contract_names(path):
+    try:
+        with open(path, 'r') as f:
+            return CONTRACT.findall(COMMENT.sub("", f.read()))
+    except FileNotFoundError:
+        # Files from lib submodules that are not checked out
+        return []
+
+def static_stats(graph, network, testFiles):
+    from tests.impact import dependencies, load_remappings
+    remappings = load_remappings(network)
+    closure = set()
+    for path in testFiles:
+        closure |= dependencies(graph, os.path.normpath(path), remappings)
+    return {
+        "testFiles": len(testFiles),
+        "testContracts": sum(1 for path in testFiles for name in contract_names(path) if name.startswith("Test_")),
+        "sourceFiles": len(closure),
+        "concreteContracts": sum(len(contract_names(path)) for path in closure),
+    }
+
+def dir_size(path):
+    (count, size) = (0, 0)
+    for (root, _, files) in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+            if name.endswith(".json"):
+                count += 1
+    return (count, size)
+
+def forge_build(network, testFiles, runs):
+    """Fastest of several forced builds, every build starts from an empty out and cache directory."""
+    env = { **os.environ, "FOUNDRY_PROFILE": network }
+    timings = []
+    for _ in range(runs):
+        scratch = tempfile.mkdtemp(prefix="compile-stats-")
+        try:
+            start = time.perf_counter()
+            proc = subprocess.run(
+                ["forge", "build", "--force", "--out", f"{scratch}/out", "--cache-path", f"{scratch}/cache", *testFiles],
+                env=env, capture_output=True, text=True
+            )
+            elapsed = time.perf_counter() - start
+            if proc.returncode != 0:
+                raise RuntimeError(f"forge build failed:\n{proc.stderr[-4000:]}")
+            timings.append(elapsed)
+            (artifacts, outBytes) = dir_size(f"{scratch}/out")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return { "seconds": min(timings), "artifacts": artifacts, "outBytes": outBytes }
+
+def measure(networks, runs, static, regenerate):
+    from tests.generate import generate
+    from tests.impact import load_graph
+    if regenerate:
+        for consolidated in MODES.values():
+            generate(generateNetworks=networks, consolidate=consolidated)
+
+    # Loaded after generation so the consolidated files are part of the graph
+    graph = load_graph()
+    results = {}
+    for network in networks:
+        for (mode, consolidated) in MODES.items():
+            # The same files run_tests would run, so hand written tests count in both modes
+            testFiles = test_files(network, consolidated)
+            result = static_stats(graph, network, testFiles)
+            if not static and testFiles:
+                result.update(forge_build(network, testFiles, runs))
+            results.setdefault(network, {})[mode] = result
+    return results
+
+def format_size(size):
+    return f"{size / 1_000_000:.1f}MB"
+
+def print_results(results):
+    print(f"{'network':<10} {'mode':<13} {'tests':>6} {'files':>6} {'sources':>8} {'contracts':>10} "
+          f"{'compile':>9} {'artifacts':>10} {'out/':>9}")
+    for (network, modes) in results.items():
+        for (mode, r) in modes.items():
+            (seconds, artifacts, outBytes) = (
+                (f"{r['seconds']:.1f}s", r['artifacts'], format_size(r['outBytes'])) if "seconds" in r else ("-", "-", "-")
+            )
+            print(
+                f"{network:<10} {mode:<13} {r['testContracts']:>6} {r['testFiles']:>6} {r['sourceFiles']:>8} "
+                f"{r['concreteContracts']:>10} {seconds:>9} {artifacts:>10} {outBytes:>9}"
+            )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="scripts compile-stats",
+                                     description="Compare compile time and out/ size of per vault and consolidated tests")
+    parser.add_argument("--network", action="append", choices=list(NETWORKS.keys()),
+                        help="Networks to measure, defaults to all")
+    parser.add_argument("--runs", type=int, default=1, help="Forced builds per mode, the fastest is reported")
+    parser.add_argument("--static", action="store_true", help="Only count files and contracts, do not run forge")
+    parser.add_argument("--no-generate", action="store_true", help="Measure the tests already on disk")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Where to write the results as json")
+    args = parser.parse_args(argv)
+
+    static = args.static
+    if not static and shutil.which("forge") is None:
+        print("forge is not installed, compile time and out/ size are not measured", file=sys.stderr)
+        static = True
+
+    results = measure(args.network or list(NETWORKS.keys()), args.runs, static, not args.no_generate)
+    print_results(results)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -78,7 +78,6 @@ token = {
         "crvUSD": "0x498Bf2B1e120FeD3ad3D42EA2165E9b73f99C1e5",
         "ezETH": "0x2416092f143378750bb29b79eD961ab195CcEea5",
         "weETH": "0x35751007a407ca6FEFfE80b3cB397736D2cf4dbe",
-        "WBTC": "0x2f2a2543B76A4166549F7aaB2e75Bef0aefC5B0f",
         "tBTC": "0x6c84a8f1c29108F47a79964b5Fe888D4f4D0dE40",
         "rsETH": "0x4186BFC76E2E237523CBC30FD220FE055156b41F",
         "USDe": "0x5d3a1Ff2b6BAb83b63cd9AD0787074081a52ef34",
@@ -86,11 +85,9 @@ token = {
 }
 
 """
-To read the most recent oracles from the blockchain:
-Load in brownie:
-m = TradingModule.at(...)
-tokens = { "ETH": 0x000.. }
-{ name: m.priceOracles(address)['oracle'] for (name, address) in tokens.items() }
+To read the most recent oracles from the blockchain for every token above:
+python -m scripts sync-oracles
+This writes oracle-sync.patch for this table, or rewrites it in place with --apply.
 """
 oracle = {
     "mainnet": {
@@ -142,6 +139,20 @@ oracle = {
 
 networks = ['arbitrum', 'mainnet']
 
+# FlashLiquidator contracts used by the vault liquidator service
+liquidators = {
+    "mainnet": [
+        "0x77B4507981607402aB9692A1628053c39eCf4fFb",
+        "0xA573bD9cAF777B354f46f635Ca339d074bD40A66",
+        "0x12AEC56DFc38413C5FEa5506041F49416b17BdA1",
+    ],
+    "arbitrum": [
+        "0xe8f28Cf944aBCFD98dACdcbA284AcFC56a6E929b",
+        "0x24B5FF402440aB10618F3798253d2cD5801E40F7",
+        "0xc91864Be1b097c9c85565cDB013Ba2307FFB492a",
+    ],
+}
+
 DexIds = {
    "UniswapV2": 1,
    "UniswapV3": 2,
@@ -0,0 +1,270 @@
+"""
+Records the gas of the vault entry points for the generated vault tests and flags regressions
+against the previous run. The generated tests of a network run as one shard, so they compile once,
+with `forge test --gas-report --json` and the report of the vault functions Notional calls
+(depositFromNotional on enterVault, redeemFromNotional on exitVault, ...) is split by the contract
+that implements them. Vaults of the same pool type share an implementation contract, so gas is
+tracked per vault contract rather than per vault. Unlike the whole test gas this excludes setUp,
+deals and assertions.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tests.run_tests import NETWORKS, shard_command, shard_env, test_files
+
+GAS_DB = "./.gas-profile/gas.sqlite"
+# A test regresses when its gas grows by more than this fraction and by at least MIN_GAS_INCREASE
+THRESHOLD = 0.02
+MIN_GAS_INCREASE = 1_000
+# Fuzz tests report median gas over their runs, a fixed seed keeps the inputs stable between commits
+FUZZ_SEED = "0x1"
+
+# Vault function => the vault operation it is the strategy side of
+VAULT_FUNCTIONS = {
+    "depositFromNotional": "enterVault",
+    "redeemFromNotional": "exitVault",
+    "convertVaultSharesToPrimeMaturity": "settleVault",
+    "deleverageAccount": "liquidation",
+    "liquidateVaultCashBalance": "liquidation",
+    "reinvestReward": "reinvest",
+    "claimRewardTokens": "claimReward",
+    "emergencyExit": "emergencyExit",
+    "restoreVault": "emergencyExit",
+    "initiateWithdraw": "initiateWithdraw",
+    "finalizeWithdrawsManual": "finalizeWithdraw",
+}
+
+def connect(path=GAS_DB):
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            git_commit TEXT NOT NULL,
+            dirty INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS gas (
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            network TEXT NOT NULL,
+            family TEXT NOT NULL,
+            harness TEXT NOT NULL,
+            vault TEXT NOT NULL,
+            test TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            gas INTEGER NOT NULL,
+            PRIMARY KEY (run_id, network, vault, test)
+        );
+        CREATE INDEX IF NOT EXISTS gas_by_vault ON gas (network, vault, test);
+    """)
+    return db
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip() != ""
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return ("unknown", False)
+    return (commit, dirty)
+
+def parse_gas_report(stdout):
+    """
+    Returns contract => function name => (calls, median gas) for the vault functions in a
+    `--gas-report --json` output. Forge writes a list of { "contract", "functions" } where contract
+    is "path:Name" and functions is keyed by signature, older versions nest the signatures under the
+    function name. Overloads of a function keep the one with the most calls.
+    """
+    report = None
+    decoder = json.JSONDecoder()
+    for (i, c) in enumerate(stdout):
+        if c == "[" and (i == 0 or stdout[i - 1] == "\n"):
+            try:
+                (report, _) = decoder.raw_decode(stdout, i)
+                break
+            except json.JSONDecodeError:
+                continue
+
+    gas = {}
+    for contract in report or []:
+        functions = contract.get("functions") or {}
+        for (key, value) in functions.items():
+            # { "sig(...)": stats } or { "name": { "sig(...)": stats } }
+            stats = [value] if "median" in value else list(value.values())
+            name = key.split("(")[0]
+            if name not in VAULT_FUNCTIONS:
+                continue
+            found = gas.setdefault(contract["contract"], {})
+            for s in stats:
+                if s.get("calls", 0) > found.get(name, (0, 0))[0]:
+                    found[name] = (s["calls"], s["median"])
+    return gas
+
+def network_shard(network):
+    """Every generated vault test of the network in a single shard."""
+    return { "name": f"{network}-gas", "network": network, "files": test_files(network) }
+
+def profile_network(shard, forgeArgs):
+    proc = subprocess.run(
+        shard_command(shard, ["--gas-report", *forgeArgs]), env=shard_env(shard), capture_output=True, text=True
+    )
+    return (shard, proc.returncode, parse_gas_report(proc.stdout), proc.stderr[-2000:])
+
+def profile(shards, jobs, forgeArgs):
+    """Runs each network shard, returns (network, gas report by contract) for the shards whose tests passed."""
+    reports = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(profile_network, s, forgeArgs) for s in shards if s["files"]]
+        for future in as_completed(futures):
+            (shard, returncode, gas, stderr) = future.result()
+            if returncode != 0:
+                # Gas from a failing run may stop part way through an operation, and a single failing
+                # test would shift the medians of every vault sharing its contract
+                print(f"[FAIL] {shard['name']}: not recorded\n{stderr}", file=sys.stderr)
+                continue
+            print(f"[ok] {shard['name']}: {len(gas)} vault contracts")
+            reports.append((shard["network"], gas))
+    return reports
+
+def attribute(reports):
+    """
+    One row per vault function of every contract in the gas reports. The family is the directory
+    of the contract under contracts/vaults (i.e. curve, balancer, staking), the harness and vault
+    columns hold the contract name and its "path:Name" id.
+    """
+    rows = []
+    for (network, gas) in reports:
+        for (contract, functions) in gas.items():
+            (path, _, name) = contract.rpartition(":")
+            parts = path.split("/")
+            family = parts[parts.index("vaults") + 1] if "vaults" in parts[:-1] else os.path.dirname(path)
+            for (function, (_, median)) in functions.items():
+                rows.append({
+                    "network": network,
+                    "family": family,
+                    "harness": name,
+                    "vault": contract,
+                    "test": function,
+                    "operation": VAULT_FUNCTIONS[function],
+                    "gas": median,
+                })
+    return rows
+
+def record(db, rows, commit, dirty):
+    cursor = db.execute(
+        "INSERT INTO runs (git_commit, dirty, timestamp) VALUES (?, ?, ?)", (commit, int(dirty), int(time.time()))
+    )
+    runId = cursor.lastrowid
+    db.executemany(
+        """INSERT OR REPLACE INTO gas (run_id, network, family, harness, vault, test, operation, gas)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(runId, r["network"], r["family"], r["harness"], r["vault"], r["test"], r["operation"], r["gas"]) for r in rows]
+    )
+    db.commit()
+    return runId
+
+def previous_run(db, runId):
+    row = db.execute("SELECT MAX(id) FROM runs WHERE id < ?", (runId,)).fetchone()
+    return row[0]
+
+def compare(db, runId, baseRunId, threshold=THRESHOLD, minIncrease=MIN_GAS_INCREASE):
+    """Returns every test whose gas grew past the threshold between two runs, largest increase first."""
+    rows = db.execute("""
+        SELECT cur.network, cur.family, cur.harness, cur.vault, cur.test, cur.operation, base.gas, cur.gas
+        FROM gas cur JOIN gas base
+            ON base.network = cur.network AND base.vault = cur.vault AND base.test = cur.test
+        WHERE cur.run_id = ? AND base.run_id = ?
+    """, (runId, baseRunId)).fetchall()
+
+    regressions = [
+        {
+            "network": network, "family": family, "harness": harness, "vault": vault,
+            "test": test, "operation": operation, "before": before, "after": after,
+            "change": (after - before) / before,
+        }
+        for (network, family, harness, vault, test, operation, before, after) in rows
+        if before > 0 and after - before >= minIncrease and after > before * (1 + threshold)
+    ]
+    return sorted(regressions, key=lambda r: -r["change"])
+
+def summarize_operations(db, runId):
+    """Median gas per (network, harness, operation) for a run, i.e. how expensive enterVault is per pool type."""
+    summary = {}
+    for (network, harness, operation, gas) in db.execute(
+        "SELECT network, harness, operation, gas FROM gas WHERE run_id = ? ORDER BY gas", (runId,)
+    ):
+        summary.setdefault((network, harness, operation), []).append(gas)
+    return { k: v[len(v) // 2] for (k, v) in summary.items() }
+
+def print_regressions(regressions, baseRunId):
+    for r in regressions:
+        print(f"[{r['network']}] {r['vault']} {r['test']} ({r['operation']}): "
+              f"{r['before']} => {r['after']} gas (+{r['change']:.1%})")
+    print(f"{len(regressions)} gas regressions against run {baseRunId}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tracks the gas used by the vault functions over time")
+    parser.add_argument("--db", default=GAS_DB, help="Path to the sqlite gas history")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    runParser = sub.add_parser("run", help="Run the generated tests and record the gas of the vault functions per contract")
+    runParser.add_argument("--network", action="append", choices=list(NETWORKS.keys()))
+    runParser.add_argument("--jobs", type=int, default=len(NETWORKS), help="Networks profiled at once")
+    runParser.add_argument("--threshold", type=float, default=THRESHOLD)
+    runParser.add_argument("forgeArgs", nargs=argparse.REMAINDER,
+                         help="Additional arguments passed to forge test after --")
+
+    report = sub.add_parser("compare", help="Compare two recorded runs, defaults to the latest two")
+    report.add_argument("--run", type=int, default=None)
+    report.add_argument("--base", type=int, default=None)
+    report.add_argument("--threshold", type=float, default=THRESHOLD)
+
+    history = sub.add_parser("history", help="Print the gas history of a vault contract")
+    history.add_argument("vault", help="Contract id as forge reports it, i.e. path/To.sol:Name")
+    history.add_argument("--test", default=None, help="Vault function, i.e. depositFromNotional")
+    args = parser.parse_args(argv)
+
+    db = connect(args.db)
+    if args.command == "run":
+        selected = args.network or list(NETWORKS.keys())
+        forgeArgs = [a for a in args.forgeArgs if a != "--"]
+        if "--fuzz-seed" not in forgeArgs:
+            forgeArgs += ["--fuzz-seed", FUZZ_SEED]
+
+        rows = attribute(profile([network_shard(n) for n in selected], args.jobs, forgeArgs))
+        runId = record(db, rows, *git_commit())
+        for ((network, harness, operation), gas) in sorted(summarize_operations(db, runId).items()):
+            print(f"[{network}] {harness} {operation}: {gas} median gas")
+
+        baseRunId = previous_run(db, runId)
+        if baseRunId is None:
+            print(f"Recorded {len(rows)} gas figures as run {runId}, no earlier run to compare against")
+            return 0
+        regressions = compare(db, runId, baseRunId, args.threshold)
+    elif args.command == "compare":
+        runId = args.run or db.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        baseRunId = args.base or previous_run(db, runId)
+        if runId is None or baseRunId is None:
+            print("Need at least two recorded runs to compare", file=sys.stderr)
+            return 1
+        regressions = compare(db, runId, baseRunId, args.threshold)
+    else:
+        query = """
+            SELECT runs.id, runs.git_commit, runs.dirty, gas.test, gas.gas FROM gas JOIN runs ON runs.id = gas.run_id
+            WHERE gas.vault = ? AND (? IS NULL OR gas.test = ?) ORDER BY gas.test, runs.id
+        """
+        for (runId, commit, dirty, test, gas) in db.execute(query, (args.vault, args.test, args.test)):
+            print(f"{test:<60} run {runId:>4} {commit[:10]}{'+' if dirty else ' '} {gas}")
+        return 0
+
+    print_regressions(regressions, baseRunId)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Selects the forge tests affected by a change. Imports are parsed from every Solidity file under
+contracts/, interfaces/, tests/ and lib/ and resolved with each network profile's remappings, so
+every test depends on the transitive closure of its imports. Generated tests also depend on the
+yaml spec and template of their family and on the generator itself, their concrete imports are
+read from the rendered files rather than the templates.
+
+    python -m scripts impact --since origin/main
+    python -m tests.run_tests --changed-since origin/main
+    forge test --mp "$(python -m scripts impact --network mainnet --format mp)"
+
+Parsed imports are cached by file size and mtime so only edited files are parsed again.
+"""
+import argparse
+import glob
+import json
+import os
+import pickle
+import re
+import subprocess
+import sys
+import tomllib
+from tests.run_tests import EXTRA_SHARDS, NETWORKS
+
+GRAPH_FILE = "./.import-graph.pickle"
+GRAPH_VERSION = 1
+SOURCE_DIRS = ["contracts", "interfaces", "tests", "lib"]
+FOUNDRY_CONFIG = "foundry.toml"
+REMAPPINGS_FILE = "remappings.txt"
+# Changes to any of these select every test
+GLOBAL_INPUTS = [FOUNDRY_CONFIG, REMAPPINGS_FILE]
+# Inputs to every generated test, changes only take effect once the tests are regenerated
+GENERATOR_INPUTS = ["tests/generate.py", "tests/spec.py", "tests/config.py", "vaults.json"]
+
+COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+IMPORT = re.compile(r"\bimport\s+(?:[^;\"']*?\bfrom\s+)?[\"']([^\"']+)[\"']", re.DOTALL)
+
+
+def parse_imports(path):
+    with open(path, "r") as f:
+        return IMPORT.findall(COMMENT.sub("", f.read()))
+
+def source_files(dirs=SOURCE_DIRS):
+    for root in dirs:
+        for (dirpath, _, filenames) in os.walk(root):
+            for name in filenames:
+                if name.endswith(".sol"):
+                    yield os.path.normpath(os.path.join(dirpath, name))
+
+def load_graph(useCache=True, graphFile=GRAPH_FILE):
+    """
+    Returns { version, files: path => { stat, imports } } with the unresolved import paths of
+    every Solidity source. Files whose size and mtime are unchanged keep their cached imports.
+    """
+    graph = None
+    if useCache:
+        try:
+            with open(graphFile, "rb") as f:
+                graph = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            graph = None
+    if graph is None or graph.get("version") != GRAPH_VERSION:
+        graph = { "version": GRAPH_VERSION, "files": {} }
+
+    files = {}
+    parsed = 0
+    for path in source_files():
+        st = os.stat(path)
+        stat = (st.st_size, st.st_mtime_ns)
+        cached = graph["files"].get(path)
+        if cached is not None and cached["stat"] == stat:
+            files[path] = cached
+        else:
+            files[path] = { "stat": stat, "imports": parse_imports(path) }
+            parsed += 1
+
+    changed = parsed > 0 or files.keys() != graph["files"].keys()
+    graph["files"] = files
+    if useCache and changed:
+        tmp = f"{graphFile}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, graphFile)
+    return graph
+
+def load_remappings(network):
+    """Remappings forge uses under the network profile, longest prefix first."""
+    with open(FOUNDRY_CONFIG, "rb") as f:
+        profiles = tomllib.load(f)["profile"]
+    lines = profiles.get(network, {}).get("remappings", profiles["default"].get("remappings", []))
+    if os.path.exists(REMAPPINGS_FILE):
+        with open(REMAPPINGS_FILE, "r") as f:
+            lines = lines + [l.strip() for l in f if l.strip() and not l.startswith("#")]
+    remappings = [tuple(l.split("=", 1)) for l in lines]
+    return sorted(remappings, key=lambda r: -len(r[0]))
+
+def resolve(importer, path, remappings):
+    if path.startswith("./") or path.startswith("../"):
+        return os.path.normpath(os.path.join(os.path.dirname(importer), path))
+    for (prefix, target) in remappings:
+        if path.startswith(prefix):
+            return os.path.normpath(target + path[len(prefix):])
+    return os.path.normpath(path)
+
+def dependencies(graph, root, remappings):
+    """Every file the root imports transitively, including itself. Solidity allows import cycles."""
+    seen = { root }
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        entry = graph["files"].get(path)
+        if entry is None:
+            # Missing files, i.e. a lib submodule that is not checked out, are kept as leaves
+            continue
+        for imported in entry["imports"]:
+            dep = resolve(path, imported, remappings)
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return seen
+
+def test_roots(network):
+    """The test files run for a network: the generated tests and the extra shards."""
+    roots = sorted(glob.glob(f"tests/generated/{network}/*.t.sol"))
+    roots += [f for s in EXTRA_SHARDS if s["network"] == network for f in s["files"]]
+    return [os.path.normpath(r) for r in roots]
+
+def generator_inputs():
+    """Maps each generated test to the yaml spec and template of the family that renders it."""
+    from tests.generate import FAMILIES, vault_entries
+    return {
+        path: [FAMILIES[v["family"]]["yaml"], FAMILIES[v["family"]]["template"], *GENERATOR_INPUTS]
+        for (path, v) in vault_entries().items()
+    }
+
+def changed_files(since):
+    """Files changed in the working tree relative to a git ref, including untracked files."""
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.splitlines()
+    return sorted(set(git("diff", "--name-only", since)) | set(git("ls-files", "--others", "--exclude-standard")))
+
+def _affects(changed, dep):
+    # A changed directory, i.e. a bumped lib submodule, affects everything under it
+    return dep == changed or dep.startswith(changed.rstrip("/") + "/")
+
+def select_tests(changed, networks, graph=None, inputs=None):
+    """
+    Returns { network: { test: [changed files it depends on] } } for the tests affected by the
+    changed files. inputs maps generated tests to their non Solidity inputs.
+    """
+    graph = graph or load_graph()
+    changed = [os.path.normpath(c) for c in changed]
+    needsInputs = inputs is None and any(c.endswith((".yml", ".j2", ".py", ".json")) for c in changed)
+    inputs = inputs if inputs is not None else (generator_inputs() if needsInputs else {})
+    everything = [c for c in changed if c in GLOBAL_INPUTS]
+
+    selected = {}
+    for network in networks:
+        remappings = load_remappings(network)
+        selected[network] = {}
+        for root in test_roots(network):
+            deps = dependencies(graph, root, remappings) | set(inputs.get(root, []))
+            causes = everything + [c for c in changed if any(_affects(c, d) for d in deps)]
+            if causes:
+                selected[network][root] = sorted(set(causes))
+    return selected
+
+def mp_pattern(files):
+    """A forge --mp glob matching exactly the given files."""
+    return files[0] if len(files) == 1 else "{" + ",".join(files) + "}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the forge tests affected by a change")
+    parser.add_argument("--since", default="HEAD", help="Git ref to diff the working tree against")
+    parser.add_argument("--files", nargs="+", default=None, help="Changed files, instead of a git diff")
+    parser.add_argument("--network", action="append", choices=list(NETWORKS.keys()),
+                        help="Networks to select tests for, defaults to all")
+    parser.add_argument("--format", choices=["list", "mp", "json"], default="list",
+                        help="list prints one test per line, mp a forge --mp glob for a single network")
+    parser.add_argument("--explain", action="store_true", help="Print the changed files each test depends on")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    networks = args.network or list(NETWORKS.keys())
+    if args.format == "mp" and len(networks) != 1:
+        parser.error("--format mp needs a single --network since each network compiles under its own profile")
+
+    changed = args.files if args.files is not None else changed_files(args.since)
+    selected = select_tests(changed, networks, load_graph(useCache=not args.no_cache))
+
+    if args.format == "json":
+        print(json.dumps(selected, indent=2))
+    elif args.format == "mp":
+        files = sorted(selected[networks[0]])
+        if files:
+            print(mp_pattern(files))
+    else:
+        for network in networks:
+            for (test, causes) in sorted(selected[network].items()):
+                print(f"{test}  <= {', '.join(causes)}" if args.explain else test)
+
+    total = sum(len(s) for s in selected.values())
+    print(f"{total} of {sum(len(test_roots(n)) for n in networks)} tests affected by {len(changed)} changed files",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "./tests/generated/.manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def hash_inputs(*inputs):
+    """
+    Hashes any JSON serializable inputs (yaml entries, config tables, etc) in a
+    stable way so that the same inputs always produce the same digest.
+    """
+    return hash_text(json.dumps(inputs, sort_keys=True, default=str))
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return { "version": MANIFEST_VERSION, "files": {} }
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return { "version": MANIFEST_VERSION, "files": {} }
+
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, sort_keys=True, indent=2)
+    os.replace(tmp, path)
+
+def is_current(manifest, output_file, input_hash):
+    """
+    True if the inputs are unchanged since the last run and the file on disk has
+    not been modified, in which case there is no need to render it again.
+    """
+    entry = manifest["files"].get(os.path.normpath(output_file))
+    if entry is None or entry["inputs"] != input_hash or not os.path.exists(output_file):
+        return False
+
+    return entry["output"] == hash_file(output_file)
+
+def record_output(manifest, output_file, input_hash, output, **tags):
+    """
+    Records a rendered output in the manifest and writes it to disk only if it
+    differs from the existing file. Returns True if the file was written.
+    """
+    output_hash = hash_text(output)
+    manifest["files"][os.path.normpath(output_file)] = { **tags, "inputs": input_hash, "output": output_hash }
+    if os.path.exists(output_file) and hash_file(output_file) == output_hash:
+        return False
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w') as f:
+        f.write(output)
+    return True
+
+def write_if_changed(manifest, output_file, input_hash, render, **tags):
+    """
+    Writes the output of render() to output_file only if it differs from what is
+    already on disk. If the inputs are unchanged since the last run and the file
+    has not been touched, render() is not called at all. Returns True if the file
+    was written.
+    """
+    if is_current(manifest, output_file, input_hash):
+        manifest["files"][os.path.normpath(output_file)].update(tags)
+        return False
+
+    return record_output(manifest, output_file, input_hash, render(), **tags)
+
+def remove_orphans(manifest, produced, **tags):
+    """
+    Deletes files previously written with the given tags (i.e. generator and network)
+    that were not produced in this run, such as vaults removed from the yaml file.
+    """
+    produced = set(os.path.normpath(p) for p in produced)
+    removed = []
+    for key, entry in list(manifest["files"].items()):
+        if key in produced or any(entry.get(k) != v for k, v in tags.items()):
+            continue
+
+        if os.path.exists(key):
+            os.remove(key)
+        del manifest["files"][key]
+        removed.append(key)
+
+    return removed
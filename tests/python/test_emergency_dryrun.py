@@ -0,0 +1,34 @@
+"""
+Targets that a fork cannot exit, a vault that is not deployed at the fork block and one that returns
+nothing decodable, fail their transaction instead of passing or ending the run.
+"""
+from scripts.emergency_dryrun import MockAnvil, pool_balances, simulate_transaction, start_mock
+
+MANAGER = "0x" + "22" * 20
+LP_VAULT = "0x" + "11" * 20
+DEPLOYED = "0x" + "33" * 20
+MISSING = "0x" + "44" * 20
+
+
+def test_vault_without_code_fails():
+    (server, url) = start_mock(MockAnvil([LP_VAULT], MANAGER, deployed=[DEPLOYED]))
+    try:
+        result = simulate_transaction(url, MANAGER, { "to": MISSING, "data": "0x" })
+        assert not result["success"]
+        assert result["revert"] == "no contract at the fork block"
+
+        result = simulate_transaction(url, MANAGER, { "to": LP_VAULT, "data": "0x" })
+        assert result["success"] and result["before"]["totalLPTokens"] != "0"
+        assert result["after"]["totalLPTokens"] == "0"
+    finally:
+        server.shutdown()
+
+def test_empty_return_data_is_not_an_lp_vault():
+    node = MockAnvil([LP_VAULT], MANAGER, deployed=[DEPLOYED])
+    # Every call succeeds with empty return data, as calls to an address without code do
+    node._call = lambda tx: (b"", None)
+    (server, url) = start_mock(node)
+    try:
+        assert pool_balances(url, DEPLOYED) is None
+    finally:
+        server.shutdown()
@@ -0,0 +1,34 @@
+"""
+Exports from two forge out directories in turn, each must write its own ABIs rather than skip on
+the state the other left behind.
+"""
+import json
+import scripts.export_abi as export_abi
+
+
+def write_artifacts(outDir, fn):
+    for name in ["TradingModule", "FlashLiquidator", "PendlePTGeneric", "ISingleSidedLPStrategyVault", "VaultRewarderLib"]:
+        path = outDir / f"{name}.sol" / f"{name}.json"
+        path.parent.mkdir(parents=True)
+        abi = [{ "type": "function", "name": f"{fn}{name}", "inputs": [], "outputs": [], "stateMutability": "view" }]
+        path.write_text(json.dumps({ "abi": abi }))
+
+def test_state_is_kept_per_out_directory(tmp_path, monkeypatch):
+    (abiDir, mainnet, arbitrum) = (tmp_path / "abi", tmp_path / "out_mainnet", tmp_path / "out_arbitrum")
+    abiDir.mkdir()
+    monkeypatch.setattr(export_abi, "ABI_DIR", str(abiDir))
+    monkeypatch.setattr(export_abi, "SELECTOR_INDEX", str(abiDir / "selectors.json"))
+    monkeypatch.setattr(export_abi, "STATE_FILE", str(tmp_path / "state.json"))
+    write_artifacts(mainnet, "mainnet")
+    write_artifacts(arbitrum, "arbitrum")
+
+    def exported():
+        return json.loads((abiDir / "TradingModule.json").read_text())[0]["name"]
+
+    assert len(export_abi.export(str(mainnet))) == 4
+    assert export_abi.export(str(mainnet)) == []
+    assert len(export_abi.export(str(arbitrum))) == 4
+    assert exported() == "arbitrumTradingModule"
+    # Unchanged mainnet artifacts, but abi/ now holds the arbitrum export
+    assert len(export_abi.export(str(mainnet))) == 4
+    assert exported() == "mainnetTradingModule"
@@ -0,0 +1,31 @@
+"""
+Rebuilds the tracked broadcast jsons in scripts/deploy from the yaml specs. Broadcasts written before
+the yaml last changed may only differ in the yaml values, anything else is a mismatch.
+"""
+import json
+import pytest
+from scripts.gnosis_payloads import OUTPUT_DIR, UPDATE_VAULT, main, stale_fields
+from scripts.abi_codec import decode_call, encode_call
+
+BROADCAST = f"{OUTPUT_DIR}/0xF94507F3dECE4CC4c73B6cf228912b85Eadc9CFB.updateConfig.json"
+
+
+@pytest.mark.parametrize("kind", ["initVault", "updateConfig"])
+def test_check_tracked_broadcasts(capsys, kind):
+    assert main([kind, "--check"]) == 0
+    # The PT and sUSDe oracles are listed from the broadcast itself
+    assert f"0xBeee4C0993B1336b2Cf971F48960D8DE92dEe4A4.{kind}.json: identical" in capsys.readouterr().out
+
+def test_only_yaml_fields_can_be_stale():
+    with open(BROADCAST, "r") as f:
+        transactions = json.load(f)["transactions"]
+    (_, (vault, params, maxPrimaryBorrow)) = decode_call([UPDATE_VAULT], transactions[0]["data"])
+    notional = transactions[0]["to"]
+
+    raised = encode_call(UPDATE_VAULT, [vault, params, maxPrimaryBorrow * 2])
+    assert stale_fields("updateConfig", transactions, [(notional, raised)]) == \
+        [f"maxPrimaryBorrow {maxPrimaryBorrow} => {maxPrimaryBorrow * 2}"]
+
+    # Flags come from the harness, not the yaml
+    flags = encode_call(UPDATE_VAULT, [vault, (params[0] ^ 1 << 8, *params[1:]), maxPrimaryBorrow])
+    assert stale_fields("updateConfig", transactions, [(notional, flags)]) is None
@@ -0,0 +1,120 @@
+"""
+Replays recorded health factor reads through the rpc cache proxy in offline mode and checks what
+the scanner decodes from them, and that transfer discovery backs off to the block range a mock
+provider accepts. Regenerate the fixture from a mock node with known positions with
+
+    PYTHONPATH=. python -m tests.python.test_health_scanner
+"""
+import asyncio
+import json
+import os
+import zlib
+from scripts.health_scanner import HealthScanner, MockNode, RpcClient, start_mock
+from tests.rpc_cache import RpcCache, start_proxy
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "health_scan.json")
+NOTIONAL = "0x6e7058c91F85E0F6db4fc9da2CA41241f5e4263f"
+VAULTS = ["0x0000000000000000000000000000000000000a01", "0x0000000000000000000000000000000000000a02"]
+BLOCK = 20_000_000
+# (vault, account) => collateral ratio, the vault minimum is 1e8
+POSITIONS = {
+    (VAULTS[0], "0x00000000000000000000000000000000000000b1"): 95_000_000,
+    (VAULTS[0], "0x00000000000000000000000000000000000000b2"): 105_000_000,
+    (VAULTS[0], "0x00000000000000000000000000000000000000b3"): 400_000_000,
+    (VAULTS[1], "0x00000000000000000000000000000000000000b1"): 80_000_000,
+    # No position in the vault
+    (VAULTS[1], "0x00000000000000000000000000000000000000b4"): 0,
+}
+
+
+def accounts():
+    result = {}
+    for (vault, account) in POSITIONS:
+        result.setdefault(vault, []).append(account)
+    return result
+
+async def scan(url):
+    scanner = HealthScanner(RpcClient(url), NOTIONAL, VAULTS, accounts())
+    try:
+        await scanner.load_configs(BLOCK)
+        return (scanner, *await scanner.scan(BLOCK))
+    finally:
+        scanner.client.close()
+
+def replay():
+    cache = RpcCache(":memory:")
+    with open(FIXTURE, "r") as f:
+        for (method, params, result) in json.load(f):
+            cache.put("mainnet", method, params, result)
+    # No upstream, anything that was not recorded is an error
+    (server, url) = start_proxy(cache, {})
+    try:
+        return asyncio.run(scan(f"{url}/mainnet"))
+    finally:
+        server.shutdown()
+
+def test_decodes_health_factors():
+    (scanner, found, reads) = replay()
+    assert reads == len(POSITIONS)
+    assert scanner.minCollateralRatio == { v: 100_000_000 for v in VAULTS }
+
+    byKey = { (f["vault"], f["account"]): f for f in found }
+    # The healthy account is tracked but not reported, the empty position is dropped
+    assert set(byKey) == {
+        (VAULTS[0], "0x00000000000000000000000000000000000000b1"),
+        (VAULTS[0], "0x00000000000000000000000000000000000000b2"),
+        (VAULTS[1], "0x00000000000000000000000000000000000000b1"),
+    }
+    assert (VAULTS[1], "0x00000000000000000000000000000000000000b4") not in scanner.positions
+    assert scanner.positions[(VAULTS[0], "0x00000000000000000000000000000000000000b3")]["ratio"] == 4.0
+
+    f = byKey[(VAULTS[0], "0x00000000000000000000000000000000000000b1")]
+    assert f["collateralRatio"] == 95_000_000
+    assert f["ratio"] == 0.95
+    assert f["liquidatable"]
+    assert f["debtInPrimary"] == 10**8
+    assert f["vaultShareValue"] == 10**8 + 95_000
+    assert f["maxLiquidatorDeposit"] == [0, 0, 0]
+
+    assert not byKey[(VAULTS[0], "0x00000000000000000000000000000000000000b2")]["liquidatable"]
+    assert byKey[(VAULTS[1], "0x00000000000000000000000000000000000000b1")]["ratio"] == 0.8
+
+def test_transfer_logs_are_queried_in_accepted_windows():
+    node = MockNode(NOTIONAL, VAULTS, 0, maxLogRange=300)
+    (server, url) = start_mock(node)
+    scanner = HealthScanner(RpcClient(url), NOTIONAL, VAULTS, logWindow=1_000)
+    try:
+        asyncio.run(scanner.touched_accounts(BLOCK, BLOCK + 4_999))
+    finally:
+        scanner.client.close()
+        server.shutdown()
+
+    # Halved twice to 250 blocks after the first rejections, then the whole range in order
+    assert scanner.logWindow == 250
+    assert node.logRanges[0][0] == BLOCK and node.logRanges[-1][1] == BLOCK + 4_999
+    assert all(b[0] == a[1] + 1 for (a, b) in zip(node.logRanges, node.logRanges[1:]))
+    assert len(node.logRanges) == 20
+
+def record():
+    """Runs the scan against a mock node through a recording proxy and writes the cached reads."""
+    # A long block time so the ratios do not drift while recording
+    node = MockNode(NOTIONAL, VAULTS, 0, blockTime=10**9)
+    node.accounts = { (v.lower(), a.lower()): cr for ((v, a), cr) in POSITIONS.items() if cr }
+    (nodeServer, nodeUrl) = start_mock(node)
+    cache = RpcCache(":memory:")
+    (server, url) = start_proxy(cache, { "mainnet": nodeUrl })
+    try:
+        asyncio.run(scan(f"{url}/mainnet"))
+    finally:
+        server.shutdown()
+        nodeServer.shutdown()
+    entries = [
+        [method, json.loads(params), json.loads(zlib.decompress(result))]
+        for (method, params, result) in cache.db.execute("SELECT method, params, result FROM rpc_cache ORDER BY params")
+    ]
+    with open(FIXTURE, "w") as f:
+        json.dump(entries, f, indent=2)
+    print(f"Recorded {len(entries)} responses to {FIXTURE}")
+
+if __name__ == "__main__":
+    record()
@@ -0,0 +1,76 @@
+"""
+Runs the daemon end to end against the mock chain. A fifth of the sends are rejected, each one must
+be followed by its sender's later batches being signed again so that every sender's nonces stay
+contiguous and every liquidatable account is still liquidated.
+
+With anvil installed and MAINNET_RPC_URL set, the --anvil path also runs on a mainnet fork: the
+Notional owner is impersonated to raise one vault's minimum collateral ratio and the daemon has to
+liquidate the accounts that pushes under it.
+"""
+import json
+import os
+import shutil
+import pytest
+from scripts.abi_codec import encode_call
+from scripts.chain import NETWORKS, decode_hex
+from scripts.emergency_dryrun import RpcError, rpc
+from scripts.liquidation_daemon import OWNER, main, raise_min_collateral_ratio, start_anvil
+from scripts.registry import load_registry
+
+FORK_VAULT = "SingleSidedLP_Convex_xGHO_crvUSD"
+FORK_BLOCK = 19983013
+# flashLiquidate template for the vault, GHO flash loaned from the spec's flash lender
+FORK_TEMPLATE = {
+    "0x30fBa4a7ec8591f25B4D37fD79943a4bb6E553e2": {
+        "flashLender": "0x9E092cb431e5F1aa70e47e052773711d2Ba4917E",
+        "asset": "0x40D16FC0246aD3160Ccc09B8D0D3A2cD28aE6C2f",
+        "currencyId": 11,
+    },
+}
+anvil = pytest.mark.skipif(
+    shutil.which("anvil") is None or not os.environ.get(NETWORKS["mainnet"]["rpcEnv"]),
+    reason="needs anvil and a mainnet rpc to fork from"
+)
+
+
+def e2e(tmp_path, *args):
+    metrics = tmp_path / "metrics.json"
+    code = main(["--network", "mainnet", "--e2e", "--blocks", "12", "--metrics", str(metrics), *args])
+    return (code, json.loads(metrics.read_text()))
+
+def test_e2e(tmp_path):
+    (code, metrics) = e2e(tmp_path)
+    assert code == 0
+    assert metrics["submitted"] == metrics["confirmed"] > 0
+
+def test_e2e_with_failed_sends(tmp_path):
+    (code, metrics) = e2e(tmp_path, "--mock-send-failures", "0.2")
+    assert code == 0
+    assert metrics["sendFailed"] > 0 and metrics["resigned"] > 0
+    assert metrics["submitted"] == metrics["confirmed"]
+
+@anvil
+def test_raise_min_collateral_ratio_on_a_fork():
+    registry = load_registry()
+    notional = registry.deployment("mainnet")["notional"]
+    (proc, server, url) = start_anvil("mainnet", FORK_BLOCK, False)
+    try:
+        vault = raise_min_collateral_ratio(url, registry, "mainnet", notional, FORK_VAULT)
+        assert vault == next(iter(FORK_TEMPLATE)).lower()
+
+        # The owner is no longer impersonated once updateVault is mined
+        (owner,) = decode_hex(["address"], rpc(url, "eth_call", [{ "to": notional, "data": encode_call(OWNER, []) }, "latest"]))
+        with pytest.raises(RpcError):
+            rpc(url, "eth_sendTransaction", [{ "from": owner, "to": owner }])
+    finally:
+        proc.terminate()
+        proc.wait()
+        server.shutdown()
+
+@anvil
+def test_e2e_on_a_fork(tmp_path):
+    templates = tmp_path / "templates.json"
+    templates.write_text(json.dumps(FORK_TEMPLATE))
+    (code, metrics) = e2e(tmp_path, "--anvil", FORK_VAULT, "--fork-block", str(FORK_BLOCK), "--templates", str(templates))
+    assert code == 0
+    assert metrics["submitted"] == metrics["confirmed"] > 0
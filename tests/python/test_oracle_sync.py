@@ -0,0 +1,91 @@
+"""
+Replays a recorded trading module read in which DAI has a new oracle, RPL gained one and CVX has
+none, and checks the findings and how they patch a small config table. Regenerate the fixture with
+
+    PYTHONPATH=. python -m tests.python.test_oracle_sync
+"""
+import json
+import os
+import pytest
+import scripts.oracle_sync as oracle_sync
+from scripts.chain import ZERO_ADDRESS
+from scripts.oracle_sync import fetch_oracles, fixture_transport, patch_config, sync
+from scripts.registry import load_registry
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "oracle_sync.json")
+NEW_DAI = "0x1111111111111111111111111111111111111111"
+NEW_RPL = "0x2222222222222222222222222222222222222222"
+
+
+def test_sync_from_fixture():
+    registry = load_registry()
+    with open(FIXTURE, "r") as f:
+        call = fixture_transport(json.load(f))
+    (updates, findings) = sync(call, registry, ["mainnet"], "0x1312d00")
+
+    assert updates == { "mainnet": { "DAI": NEW_DAI, "RPL": NEW_RPL } }
+    configured = registry.tables["oracle"]["mainnet"]["DAI"]
+    assert f"[mainnet] DAI: {configured} => {NEW_DAI}" in findings
+    assert f"[mainnet] RPL: missing from the oracle table, on chain {NEW_RPL}" in findings
+    # No oracle on chain and none configured is not a finding
+    assert not any("CVX" in f for f in findings)
+
+CONFIG = """oracle = {
+    "mainnet": {
+        'DAI': "0xAed0c38402a5d19df6E4c03F4E2DceD6e29c1ee9",
+        "sUSDe": "0xFF3BC18cCBd5999CE63E788A1c250a88626aD099"
+    },
+    "arbitrum": {
+        "WETH": "0x639Fe6ab55C921f74e7fac1ee960C0B6293ba612",
+    },
+}
+"""
+
+def test_patch_config():
+    after = patch_config(CONFIG, { "mainnet": { "DAI": NEW_DAI, "RPL": NEW_RPL }, "arbitrum": { "ARB": NEW_RPL } })
+    assert after == f"""oracle = {{
+    "mainnet": {{
+        'DAI': "{NEW_DAI}",
+        "sUSDe": "0xFF3BC18cCBd5999CE63E788A1c250a88626aD099",
+        "RPL": "{NEW_RPL}"
+    }},
+    "arbitrum": {{
+        "WETH": "0x639Fe6ab55C921f74e7fac1ee960C0B6293ba612",
+        "ARB": "{NEW_RPL}",
+    }},
+}}
+"""
+    assert patch_config(CONFIG, {}) == CONFIG
+
+@pytest.mark.parametrize("findings, code, message", [
+    ([], 0, "Oracle table is up to date"),
+    (["[mainnet] CVX: no oracle on chain, config has 0x1"], 1, "1 findings have no oracle to patch in"),
+])
+def test_exit_status_without_updates(tmp_path, monkeypatch, capsys, findings, code, message):
+    monkeypatch.setattr(oracle_sync, "sync", lambda *args: ({}, findings))
+    fixture = tmp_path / "fixture.json"
+    fixture.write_text("{}")
+    assert oracle_sync.main(["--fixture", str(fixture)]) == code
+    assert message in capsys.readouterr().out
+
+def record():
+    registry = load_registry()
+    tokens = dict(registry.tables["token"]["mainnet"])
+    onChain = dict(registry.tables["oracle"]["mainnet"])
+    onChain.update({ "DAI": NEW_DAI, "RPL": NEW_RPL })
+    # Encodes the on chain table as the aggregate3 result the trading module would return
+    from eth_abi import encode
+    from scripts.chain import AGGREGATE3_OUTPUT
+
+    def call(network, tx, block):
+        results = [(True, encode(["address", "uint8"], [onChain.get(s, ZERO_ADDRESS), 8])) for s in tokens]
+        return "0x" + encode(AGGREGATE3_OUTPUT, [results]).hex()
+
+    recording = {}
+    fetch_oracles(call, "mainnet", registry.deployment("mainnet")["tradingModule"], tokens, "0x1312d00", recording)
+    with open(FIXTURE, "w") as f:
+        json.dump(recording, f, indent=2)
+    print(f"Recorded {FIXTURE}")
+
+if __name__ == "__main__":
+    record()
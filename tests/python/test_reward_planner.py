@@ -0,0 +1,40 @@
+"""
+Replays a fixture recorded from the mock reward state and checks that it plans exactly what the mock
+does. The fixture carries the mock oracle table, which the registry does not have. Regenerate it with
+
+    PYTHONPATH=. python -m tests.python.test_reward_planner
+"""
+import json
+import os
+from scripts.reward_planner import main, request_key
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "reward_plan.json")
+BLOCK = "20000000"
+
+
+def plan(tmp_path, *args):
+    output = tmp_path / "plan.json"
+    assert main([*args, "--block", BLOCK, "--output", str(output)]) == 0
+    return json.loads(output.read_text())
+
+def test_fixture_replays_the_mock_plan(tmp_path):
+    replayed = plan(tmp_path, "--fixture", FIXTURE)
+    assert replayed == plan(tmp_path, "--mock")
+
+    assert sorted(p["network"] for p in replayed) == ["arbitrum", "mainnet"]
+    assert all(p["block"] == int(BLOCK) for p in replayed)
+    # Every vault is priced through the recorded oracles
+    assert all(not s["unpriced"] for p in replayed for s in p["schedule"])
+    assert any(p["batches"] for p in replayed)
+
+def test_block_number_is_hex_encoded():
+    with open(FIXTURE, "r") as f:
+        fixture = json.load(f)
+    assert request_key("eth_getBlockByNumber", [hex(int(BLOCK)), False]) in fixture["mainnet"]
+
+def record():
+    main(["--mock", "--block", BLOCK, "--record", FIXTURE, "--output", os.devnull])
+    print(f"Recorded {FIXTURE}")
+
+if __name__ == "__main__":
+    record()
@@ -0,0 +1,53 @@
+"""
+Writes the differential forge test from small synthetic snapshots and checks which dexes are quoted
+on each network and that every address literal compiles.
+"""
+import re
+from eth_utils import to_checksum_address
+from scripts.registry import load_registry
+from scripts.route_quote import write_vectors
+
+ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}(?![0-9a-fA-F])")
+TOKENS = {
+    "mainnet": ("0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2", "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"),
+    "arbitrum": ("0x82af49447d8a07e3bd95bd0d56f35241523fbab1", "0xaf88d065e77c8cc2239327c5edb3a432268e5831"),
+}
+
+
+def snapshot(network):
+    # Lower case addresses, as a node may return them
+    (weth, usdc) = TOKENS[network]
+    return {
+        "network": network,
+        "block": 1,
+        "weth": weth,
+        "decimals": { weth: 18, usdc: 6 },
+        "pools": [
+            { "dex": "UniswapV2", "pool": "0x" + "ab" * 20, "tokens": [usdc, weth],
+              "reserves": [50_000_000 * 10**6, 20_000 * 10**18] },
+            { "dex": "CurveV2", "kind": "stableswap", "pool": "0x" + "cd" * 20, "tokens": [weth, usdc],
+              "balances": [1_000 * 10**18, 1_000 * 10**6], "amp": 20_000, "fee": 1_000_000, "decimals": [18, 6] },
+        ],
+    }
+
+def vectors(tmp_path, network):
+    path = tmp_path / "testRouteQuotes.t.sol"
+    count = write_vectors(snapshot(network), load_registry(), [10**15, 10**18], path=str(path))
+    return (count, path.read_text())
+
+def test_uniswap_v2_is_mainnet_only(tmp_path):
+    (count, source) = vectors(tmp_path, "mainnet")
+    assert "DexId.UNISWAP_V2" in source and "DexId.CURVE_V2" in source
+    assert count == 8
+
+    # TradingModule._getExecutionData reverts with UnknownDEX for UniswapV2 on arbitrum
+    (count, source) = vectors(tmp_path, "arbitrum")
+    assert "DexId.UNISWAP_V2" not in source and "DexId.CURVE_V2" in source
+    assert count == 4
+
+def test_addresses_are_checksummed(tmp_path):
+    for network in TOKENS:
+        (_, source) = vectors(tmp_path, network)
+        addresses = ADDRESS.findall(source)
+        assert to_checksum_address("0x" + "cd" * 20) in addresses
+        assert all(a == to_checksum_address(a) for a in addresses)
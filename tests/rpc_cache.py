@@ -0,0 +1,300 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CACHE_DB = "./.rpc-cache/rpc.sqlite"
+
+# Index of the block parameter for state reads, these are immutable once the block is pinned
+BLOCK_PARAM = {
+    "eth_getStorageAt": 2,
+    "eth_getCode": 1,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_call": 1,
+    "eth_getProof": 2,
+    "eth_getBlockByNumber": 0,
+    "eth_getBlockByHash": 0,
+}
+# Methods whose result never changes for a given chain
+STATIC_METHODS = { "eth_chainId", "net_version" }
+# Methods that follow the chain head. Forge and anvil call these while setting up a fork, they are
+# recorded per run when the proxy url is pinned to a fork block (http://host:port/<chain>/<block>)
+# so that repeated runs at that block can be served offline.
+RUN_METHODS = { "eth_gasPrice", "eth_blockNumber", "eth_maxPriorityFeePerGas" }
+UNPINNED_TAGS = { "latest", "pending", "safe", "finalized" }
+
+
+def get_block_key(method, params, run=None):
+    """
+    Returns the block that a request is pinned to, or None if the result may change
+    over time and so must not be cached. run is the fork block the proxy url is pinned to.
+    """
+    if method in STATIC_METHODS:
+        return "*"
+    if method in RUN_METHODS:
+        return f"run:{run}" if run is not None else None
+    if method not in BLOCK_PARAM or len(params) <= BLOCK_PARAM[method]:
+        return None
+
+    block = params[BLOCK_PARAM[method]]
+    if isinstance(block, dict):
+        # EIP-1898 block parameter
+        block = block.get("blockHash") or block.get("blockNumber")
+    if not isinstance(block, str) or block in UNPINNED_TAGS:
+        return None
+    if block == "earliest":
+        return "0"
+    if len(block) == 66:
+        return block.lower()
+
+    try:
+        return str(int(block, 16))
+    except ValueError:
+        return None
+
+class RpcCache:
+    def __init__(self, path=CACHE_DB):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS rpc_cache (
+                chain TEXT NOT NULL,
+                block TEXT NOT NULL,
+                method TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result BLOB NOT NULL,
+                PRIMARY KEY (chain, block, method, params)
+            ) WITHOUT ROWID
+        """)
+        self.db.commit()
+        self.hits = {}
+        self.misses = {}
+
+    def _key(self, chain, method, params, run=None):
+        block = get_block_key(method, params, run)
+        if block is None:
+            return None
+        return (chain, block, method, json.dumps(params, sort_keys=True, separators=(",", ":")))
+
+    def get(self, chain, method, params, run=None):
+        key = self._key(chain, method, params, run)
+        if key is None:
+            return None
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM rpc_cache WHERE chain=? AND block=? AND method=? AND params=?", key
+            ).fetchone()
+            counter = self.hits if row is not None else self.misses
+            counter[method] = counter.get(method, 0) + 1
+
+        return None if row is None else json.loads(zlib.decompress(row[0]))
+
+    def put(self, chain, method, params, result, run=None):
+        self.put_many(chain, [(method, params, result)], run)
+
+    def put_many(self, chain, entries, run=None):
+        """Stores (method, params, result) entries in a single transaction."""
+        rows = []
+        for (method, params, result) in entries:
+            key = self._key(chain, method, params, run)
+            # Null results (i.e. a block past the head) may exist later so are not cached
+            if key is not None and result is not None:
+                rows.append((*key, zlib.compress(json.dumps(result, separators=(",", ":")).encode())))
+        if not rows:
+            return
+
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO rpc_cache VALUES (?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT chain, COUNT(*) FROM rpc_cache GROUP BY chain").fetchall()
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hitsByMethod": dict(self.hits),
+            "missesByMethod": dict(self.misses),
+            "entries": dict(entries),
+        }
+
+    def export_to(self, path, chain=None):
+        """Writes cache entries to a gzipped json lines file that can be imported elsewhere."""
+        query = "SELECT chain, block, method, params, result FROM rpc_cache"
+        args = ()
+        if chain is not None:
+            query += " WHERE chain=?"
+            args = (chain,)
+
+        count = 0
+        with self.lock, gzip.open(path, 'wt') as f:
+            for (c, block, method, params, result) in self.db.execute(query, args):
+                f.write(json.dumps([c, block, method, params, zlib.decompress(result).decode()]) + "\n")
+                count += 1
+        return count
+
+    def import_from(self, path):
+        count = 0
+        with self.lock, gzip.open(path, 'rt') as f:
+            for line in f:
+                (c, block, method, params, result) = json.loads(line)
+                self.db.execute(
+                    "INSERT OR IGNORE INTO rpc_cache VALUES (?, ?, ?, ?, ?)",
+                    (c, block, method, params, zlib.compress(result.encode()))
+                )
+                count += 1
+            self.db.commit()
+        return count
+
+def http_post(url, payload):
+    req = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={ "Content-Type": "application/json" }
+    )
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.loads(resp.read())
+
+class RpcProxy:
+    """
+    Serves JSON-RPC requests for each chain at http://host:port/<chain>, answering
+    pinned state reads from the cache and forwarding everything else upstream. If
+    a chain has no upstream the proxy runs offline and cache misses return an error.
+    Under http://host:port/<chain>/<block> the gas price and block number are also
+    replayed from the first run forked at that block.
+    """
+    def __init__(self, cache, upstreams, transport=http_post):
+        self.cache = cache
+        self.upstreams = upstreams
+        self.transport = transport
+
+    def handle(self, chain, payload, run=None):
+        requests = payload if isinstance(payload, list) else [payload]
+        responses = {}
+        forward = []
+        for (i, r) in enumerate(requests):
+            result = self.cache.get(chain, r.get("method"), r.get("params", []), run)
+            if result is not None:
+                responses[i] = { "jsonrpc": "2.0", "id": r.get("id"), "result": result }
+            else:
+                forward.append(i)
+
+        if forward:
+            upstream = self.upstreams.get(chain)
+            if upstream is None:
+                for i in forward:
+                    responses[i] = {
+                        "jsonrpc": "2.0", "id": requests[i].get("id"),
+                        "error": { "code": -32000, "message": f"rpc cache miss for {chain} in offline mode" },
+                    }
+            else:
+                # Forward all misses as a single batch, ids are rewritten to match responses back up
+                batch = [{ **requests[i], "id": n } for (n, i) in enumerate(forward)]
+                results = self.transport(upstream, batch)
+                if not isinstance(results, list) and results.get("id") is None:
+                    # The upstream rejected the batch as a whole
+                    results = [{ **results, "id": n } for n in range(len(forward))]
+                entries = []
+                for resp in (results if isinstance(results, list) else [results]):
+                    i = forward[resp["id"]]
+                    r = requests[i]
+                    if "result" in resp:
+                        entries.append((r.get("method"), r.get("params", []), resp["result"]))
+                    responses[i] = { **resp, "id": r.get("id") }
+                self.cache.put_many(chain, entries, run)
+
+        ordered = [responses[i] for i in range(len(requests))]
+        return ordered if isinstance(payload, list) else ordered[0]
+
+def make_handler(proxy):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send(200, proxy.cache.stats())
+            else:
+                self._send(404, { "error": "not found" })
+
+        def do_POST(self):
+            # /<chain> or /<chain>/<fork block>
+            (chain, _, run) = self.path.strip("/").partition("/")
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self._send(200, proxy.handle(chain, payload, run or None))
+            except Exception as e:
+                self._send(502, { "jsonrpc": "2.0", "id": None, "error": { "code": -32603, "message": str(e) } })
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_proxy(cache, upstreams, host="127.0.0.1", port=0):
+    """Starts the proxy on a background thread, returns the server and its base url."""
+    server = ThreadingHTTPServer((host, port), make_handler(RpcProxy(cache, upstreams)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, f"http://{host}:{server.server_address[1]}")
+
+def parse_upstreams(values):
+    upstreams = {}
+    for v in values or []:
+        (chain, url) = v.split("=", 1)
+        upstreams[chain] = url
+    return upstreams
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caching JSON-RPC proxy for fork tests")
+    parser.add_argument("--db", default=CACHE_DB, help="Path to the sqlite cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Run the proxy in the foreground")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8545)
+    serve.add_argument("--upstream", action="append", metavar="CHAIN=URL",
+                       help="Upstream rpc for a chain, chains without one are served offline")
+
+    export = sub.add_parser("export", help="Export the cache to a gzipped file")
+    export.add_argument("file")
+    export.add_argument("--chain", default=None)
+
+    imp = sub.add_parser("import", help="Merge an exported cache file")
+    imp.add_argument("file")
+
+    sub.add_parser("stats", help="Print the number of cached entries per chain")
+    args = parser.parse_args(argv)
+
+    cache = RpcCache(args.db)
+    if args.command == "serve":
+        (server, url) = start_proxy(cache, parse_upstreams(args.upstream), args.host, args.port)
+        print(f"Serving rpc cache at {url}/<chain>")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+            print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "export":
+        print(f"Exported {cache.export_to(args.file, args.chain)} entries to {args.file}")
+    elif args.command == "import":
+        print(f"Imported {cache.import_from(args.file)} entries from {args.file}")
+    elif args.command == "stats":
+        print(json.dumps(cache.stats()["entries"], indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
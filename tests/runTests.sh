@@ -5,8 +5,7 @@ set -e
 source .env
 export PYTHONPATH=$PYTHONPATH:$(pwd)
 source venv/bin/activate
-python tests/SingleSidedLP/generate_tests.py
-python tests/Staking/generate_tests.py
+python -m tests.generate
 
 # Check if a command line argument is provided
 if [ $# -ge 1 ]; then
@@ -43,15 +42,5 @@ if [ $# -ge 1 ]; then
     exit 0
 fi
 
-# If no argument is provided, continue with the existing commands
-export RPC_URL=$MAINNET_RPC_URL
-export FORK_BLOCK=19691163
-export FOUNDRY_PROFILE=mainnet
-forge test --mp "tests/generated/mainnet/**"
-
-export RPC_URL=$ARBITRUM_RPC_URL
-export FORK_BLOCK=199952636
-export FOUNDRY_PROFILE=arbitrum
-forge test --mp "tests/generated/arbitrum/**"
-
-forge test --mp "tests/testTradingModule.t.sol"
\ No newline at end of file
+# If no argument is provided, run the full suite in parallel shards
+python -m tests.run_tests
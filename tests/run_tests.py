@@ -0,0 +1,283 @@
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scripts.chain import NETWORKS
+from tests.rpc_cache import RpcCache, start_proxy
+
+SHARD_DIR = "./.forge-shards"
+TIMINGS_FILE = f"{SHARD_DIR}/timings.json"
+REPORT_FILE = f"{SHARD_DIR}/report.json"
+GENERATED_DIR = "tests/generated"
+# Written by `generate --consolidate`, one file per vault group instead of per vault
+CONSOLIDATED_DIR = "tests/consolidated"
+
+# Tests outside of the generated suite
+EXTRA_SHARDS = [
+    # Forks arbitrum at its own block
+    { "name": "arbitrum-TradingModule", "network": "arbitrum", "files": ["tests/testTradingModule.t.sol"] },
+    # Pure math, does not fork but runs under the mainnet profile
+    { "name": "mainnet-StableMath", "network": "mainnet", "files": ["tests/testStableMath.t.sol"] },
+]
+
+
+def get_harness_type(path):
+    with open(path, 'r') as f:
+        source = f.read()
+    # Consolidated files have no per vault harness, their tests share a base test per harness
+    match = (
+        re.search(r"contract Harness_\w+ is\s+(\w+)", source) or
+        re.search(r"contract Test_\w+ is\s+(\w+)", source)
+    )
+    return match.group(1) if match else "Other"
+
+def test_names(path):
+    """Test contract names, consolidated tests are named Test_Consolidated_ so that both layouts compile together."""
+    with open(path, 'r') as f:
+        return { name.replace("Test_Consolidated_", "Test_", 1) for name in re.findall(r"contract (Test_\w+)", f.read()) }
+
+def test_files(network, consolidated=False):
+    """
+    The generated test files for a network. Consolidated runs use the consolidated files and keep
+    any per vault file whose test they do not cover, i.e. the hand written Staking tests.
+    """
+    generated = sorted(glob.glob(f"{GENERATED_DIR}/{network}/*.t.sol"))
+    if not consolidated:
+        return generated
+    paths = sorted(glob.glob(f"{CONSOLIDATED_DIR}/{network}/*.t.sol"))
+    covered = set().union(*(test_names(p) for p in paths))
+    return paths + [p for p in generated if not test_names(p) <= covered]
+
+def build_shards(selectedNetworks, maxShardSize, files=None, consolidated=False):
+    """
+    Splits the generated tests into shards by network and harness type. Shards larger
+    than maxShardSize are split again so that no single shard dominates the run. If
+    files is given only those test files are sharded.
+    """
+    shards = []
+    for network in selectedNetworks:
+        groups = {}
+        for path in test_files(network, consolidated):
+            if files is not None and os.path.normpath(path) not in files:
+                continue
+            groups.setdefault(get_harness_type(path), []).append(path)
+
+        for (harness, paths) in sorted(groups.items()):
+            chunks = [paths[i:i + maxShardSize] for i in range(0, len(paths), maxShardSize)]
+            for (i, chunk) in enumerate(chunks):
+                suffix = f"-{i}" if len(chunks) > 1 else ""
+                shards.append({ "name": f"{network}-{harness}{suffix}", "network": network, "files": chunk })
+
+    shards.extend(
+        s for s in EXTRA_SHARDS
+        if s["network"] in selectedNetworks and (files is None or any(f in files for f in s["files"]))
+    )
+
+    return shards
+
+def load_timings():
+    try:
+        with open(TIMINGS_FILE, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_timings(timings):
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    with open(TIMINGS_FILE, 'w') as f:
+        json.dump(timings, f, sort_keys=True, indent=2)
+
+def order_shards(shards, timings):
+    # Shards that have never run are scheduled first since their duration is unknown
+    return sorted(shards, key=lambda s: -timings.get(s["name"], float("inf")))
+
+def shard_command(shard, forgeArgs, proxyUrl=None):
+    files = shard["files"]
+    pattern = files[0] if len(files) == 1 else "{" + ",".join(files) + "}"
+    shardDir = f"{SHARD_DIR}/{shard['name']}"
+    return [
+        "forge", "test", "--mp", pattern, "--json",
+        "--out", f"{shardDir}/out",
+        "--cache-path", f"{shardDir}/cache",
+        # Fork state is already cached by the proxy, this keeps concurrent shards from all writing
+        # the same storage cache files under ~/.foundry
+        *(["--no-storage-caching"] if proxyUrl is not None else []),
+        *forgeArgs,
+    ]
+
+def shard_env(shard, proxyUrl=None):
+    network = NETWORKS[shard["network"]]
+    os.makedirs(f"{SHARD_DIR}/{shard['name']}", exist_ok=True)
+    env = dict(os.environ)
+    if proxyUrl is not None:
+        # Some tests read the network rpc env vars directly so those are redirected as well
+        for (name, n) in NETWORKS.items():
+            env[n["rpcEnv"]] = f"{proxyUrl}/{name}/{n['forkBlock']}"
+    env["RPC_URL"] = env.get(network["rpcEnv"], "")
+    env["FORK_BLOCK"] = str(network["forkBlock"])
+    env["FOUNDRY_PROFILE"] = shard["network"]
+    return env
+
+def parse_forge_json(stdout):
+    for line in reversed(stdout.splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                return json.loads(line)
+            except json.JSONDecodeError:
+                continue
+    return {}
+
+def get_test_gas(result):
+    """
+    Returns the gas reported for a test, fuzz tests report the median over their runs. Older
+    forge versions report unit test gas as {"Standard": gas} rather than {"Unit": {"gas": gas}}.
+    """
+    kind = result.get("kind") or {}
+    if "Unit" in kind:
+        return kind["Unit"].get("gas")
+    if "Standard" in kind:
+        return kind["Standard"]
+    if "Fuzz" in kind:
+        return kind["Fuzz"].get("median_gas")
+    return None
+
+def summarize_suites(suites):
+    tests = {}
+    for (suiteName, suite) in suites.items():
+        for (testName, result) in suite.get("test_results", {}).items():
+            tests[f"{suiteName}:{testName}"] = {
+                "status": result.get("status"),
+                "reason": result.get("reason"),
+                "gas": get_test_gas(result),
+            }
+    return tests
+
+def run_shard(shard, forgeArgs, proxyUrl=None):
+    start = time.monotonic()
+    proc = subprocess.run(
+        shard_command(shard, forgeArgs, proxyUrl), env=shard_env(shard, proxyUrl), capture_output=True, text=True
+    )
+    duration = time.monotonic() - start
+    tests = summarize_suites(parse_forge_json(proc.stdout))
+
+    return {
+        "name": shard["name"],
+        "network": shard["network"],
+        "files": shard["files"],
+        "returncode": proc.returncode,
+        "duration": duration,
+        "tests": tests,
+        "stderr": proc.stderr[-4000:] if proc.returncode != 0 else "",
+    }
+
+def run(shards, jobs, forgeArgs, proxyUrl=None):
+    timings = load_timings()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_shard, s, forgeArgs, proxyUrl) for s in order_shards(shards, timings)]
+        for future in as_completed(futures):
+            r = future.result()
+            failed = [t for (t, v) in r["tests"].items() if v["status"] == "Failure"]
+            status = "FAIL" if r["returncode"] != 0 else "ok"
+            print(f"[{status}] {r['name']}: {len(r['tests'])} tests, {len(failed)} failed in {r['duration']:.1f}s")
+            for t in failed:
+                print(f"    {t}: {r['tests'][t]['reason']}")
+            if r["returncode"] != 0 and not failed:
+                print(r["stderr"])
+
+            timings[r["name"]] = r["duration"]
+            results.append(r)
+
+    save_timings(timings)
+    return results
+
+def write_report(results):
+    tests = { t: v for r in results for (t, v) in r["tests"].items() }
+    report = {
+        "passed": sum(1 for v in tests.values() if v["status"] == "Success"),
+        "failed": sum(1 for v in tests.values() if v["status"] == "Failure"),
+        "skipped": sum(1 for v in tests.values() if v["status"] == "Skipped"),
+        "failedShards": sorted(r["name"] for r in results if r["returncode"] != 0),
+        "shards": sorted(results, key=lambda r: r["name"]),
+    }
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    with open(REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the forge test suite in parallel shards")
+    parser.add_argument("--network", action="append", choices=list(NETWORKS.keys()),
+                        help="Networks to run, defaults to all")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Number of shards to run concurrently")
+    parser.add_argument("--max-shard-size", type=int, default=4,
+                        help="Maximum number of test files in a single shard")
+    parser.add_argument("--list", action="store_true", help="Print the shards without running them")
+    parser.add_argument("--rpc-cache", action="store_true",
+                        help="Serve fork state through the local caching rpc proxy")
+    parser.add_argument("--offline", action="store_true",
+                        help="With --rpc-cache, never contact the upstream rpcs")
+    parser.add_argument("--changed-since", default=None, metavar="REF",
+                        help="Only run the tests affected by changes since a git ref, see tests/impact.py")
+    parser.add_argument("--only-from", default=None, metavar="FILE",
+                        help="Only run the test files listed in FILE (- for stdin), i.e. from `scripts impact`")
+    parser.add_argument("--consolidated", action="store_true",
+                        help=f"Run the tests in {CONSOLIDATED_DIR}, written by `generate --consolidate`")
+    parser.add_argument("forgeArgs", nargs=argparse.REMAINDER,
+                        help="Additional arguments passed to forge test after --")
+    args = parser.parse_args(argv)
+
+    forgeArgs = [a for a in args.forgeArgs if a != "--"]
+    networks = args.network or list(NETWORKS.keys())
+    if args.consolidated and args.changed_since is not None:
+        # Impact selection works on per vault files, a consolidated file holds a whole group
+        parser.error("--changed-since selects per vault tests and cannot be combined with --consolidated")
+
+    files = None
+    if args.changed_since is not None:
+        from tests.impact import changed_files, select_tests
+        selected = select_tests(changed_files(args.changed_since), networks)
+        files = { f for s in selected.values() for f in s }
+    if args.only_from is not None:
+        with (sys.stdin if args.only_from == "-" else open(args.only_from, 'r')) as f:
+            listed = { os.path.normpath(l.split()[0]) for l in f if l.strip() }
+        files = listed if files is None else files & listed
+
+    shards = build_shards(networks, args.max_shard_size, files, args.consolidated)
+    if args.consolidated and not glob.glob(f"{CONSOLIDATED_DIR}/*/*.t.sol"):
+        print(f"No tests in {CONSOLIDATED_DIR}, run `python -m scripts generate --consolidate` first")
+        return 1
+    if not shards:
+        print("No tests affected, nothing to run")
+        return 0
+    if args.list:
+        for s in order_shards(shards, load_timings()):
+            print(f"{s['name']}: {' '.join(s['files'])}")
+        return 0
+
+    proxyUrl = None
+    if args.rpc_cache or args.offline:
+        upstreams = {} if args.offline else {
+            name: os.environ[n["rpcEnv"]] for (name, n) in NETWORKS.items() if os.environ.get(n["rpcEnv"])
+        }
+        cache = RpcCache()
+        (server, proxyUrl) = start_proxy(cache, upstreams)
+
+    report = write_report(run(shards, args.jobs, forgeArgs, proxyUrl))
+    if proxyUrl is not None:
+        server.shutdown()
+        stats = cache.stats()
+        print(f"rpc cache: {stats['hits']} hits, {stats['misses']} misses")
+    print(f"{report['passed']} passed, {report['failed']} failed, {report['skipped']} skipped, "
+          f"{len(report['failedShards'])} failed shards. Report written to {REPORT_FILE}")
+    return 1 if report["failedShards"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Loads the vault yaml specs: parses with the C loader when libyaml is available, merges the
+defaults into every entry and validates each entry against the family schema so that typos are
+reported with their file and line instead of as a forge compile error. The validated specs are
+cached by source hash.
+"""
+import difflib
+import os
+import pickle
+import re
+import yaml
+from tests.manifest import hash_file, hash_inputs
+
+CACHE_FILE = "./.spec-cache.pickle"
+CACHE_VERSION = 1
+NETWORK_KEYS = ["mainnet", "arbitrum"]
+
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Schemas map each key to a type name, a tuple of allowed values, a nested schema or a one
+# element list for a list of that type. Keys ending in ? are optional.
+CONFIG = {
+    "feeRate5BPS": "number",
+    "liquidationRate": "number",
+    "reserveFeeShare": "number",
+    "maxBorrowMarketIndex": "number",
+    "minCollateralRatioBPS": "number",
+    "maxRequiredAccountCollateralRatioBPS": "number",
+    "maxDeleverageCollateralRatioBPS": "number",
+    "minAccountBorrowSize": "number",
+    "maxPrimaryBorrow": "number",
+}
+SET_UP = {
+    "minDeposit": "number",
+    "maxDeposit": "number",
+    "maxRelEntryValuation": "number",
+    "maxRelExitValuation": "number",
+}
+
+SINGLE_SIDED_LP = {
+    "vaultName": "str",
+    "vaultType": ("WeightedPool", "ComposablePool", "WrappedComposablePool", "Curve2TokenConvex", "Curve2Token"),
+    "primaryBorrowCurrency": "currency",
+    "rewardPool": "address",
+    "rewards": ["token"],
+    "oracles": ["oracle"],
+    "poolToken?": "address",
+    "lpToken?": "address",
+    "curveInterface?": ("V1", "V2", "StableSwapNG"),
+    "balancerPoolId?": "hex",
+    "balancerPool?": "address",
+    "whitelistedReward?": "address",
+    "existingDeployment?": "address",
+    "forkBlock?": "int",
+    "whale?": "address",
+    "skipTests?": ["str"],
+    "settings": {
+        "maxPoolShare": "number",
+        "oraclePriceDeviationLimitPercent": "number",
+        "forceClaimAfter": "number",
+        "numRewardTokens": "number",
+        "useAccountClaim?": "bool",
+    },
+    "setUp": { **SET_UP, "flashLender?": "address" },
+    "config": CONFIG,
+    "wrapped?": {
+        "defaultSlippage": "number",
+        "dexId": "int",
+        "exchangeData": "hex",
+        "borrowToken": "address",
+    },
+    "permissions?": [{ "tokenAddress": "address", "dexId": "int", "tradeTypeFlags": "int" }],
+}
+
+PENDLE_PT = {
+    "stakeSymbol": "token",
+    "expiry": "expiry",
+    "primaryBorrowCurrency": "currency",
+    "contractName": ("PendlePTGeneric", "PendlePTStakedUSDeVault", "PendlePTEtherFiVault", "PendlePTKelpVault"),
+    "oracles": ["oracle"],
+    "marketAddress": "address",
+    "ptAddress": "address",
+    "useSyOracleRate": ("true", "false"),
+    "tradeOnEntry": "bool",
+    "primaryDex": "dex",
+    "exchangeData": "any",
+    "permissions?": [{ "token": "token", "dex": "dex", "tradeTypeFlags": "int" }],
+    "rewards?": ["token"],
+    "forkBlock?": "int",
+    "whale?": "address",
+    "setUp": {
+        **SET_UP,
+        "maxRelExitValuation_WithdrawRequest_Fixed": "number",
+        "maxRelExitValuation_WithdrawRequest_Variable": "number",
+        "deleverageCollateralDecreaseRatio": "number",
+        "defaultLiquidationDiscount": "number",
+        "withdrawLiquidationDiscount": "number",
+        "splitWithdrawPriceDecrease": "number",
+    },
+    "config": CONFIG,
+}
+
+CROSS_CURRENCY = {
+    "vaultName": "str",
+    "primaryBorrowCurrency": "currency",
+    "lendCurrency": "currency",
+    "dex": "dex",
+    # The CurveV2 pool traded through, required when dex is CurveV2
+    "pool?": "address",
+    "forkBlock?": "int",
+    "whale?": "address",
+    "existingDeployment?": "address",
+    "setUp": SET_UP,
+    "config": CONFIG,
+}
+
+ADDRESS = re.compile(r"^(0x[0-9a-fA-F]{40}|address\(0\))$")
+HEX = re.compile(r"^0x([0-9a-fA-F]{2})*$")
+EXPIRY = re.compile(r"^\d{2}[A-Z]{3}\d{4}$")
+# Numeric literals as solc reads them once rendered, i.e. 0.01e18, 10_000 or 1 days
+NUMBER = re.compile(r"^\d[\d_]*(\.\d+)?(e\d+)?( (seconds|minutes|hours|days|weeks))?$")
+
+
+class SpecError(ValueError):
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+def deep_merge(defaults, override):
+    """Recursively merges override into defaults, values in override win and lists are replaced."""
+    merged = dict(defaults)
+    for (key, value) in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def check_type(kind, value, network, registry):
+    """Returns an error message if the value does not match the type, otherwise None."""
+    if kind == "any":
+        return None
+    if isinstance(kind, tuple):
+        return None if value in kind else f"{value!r} is not one of {', '.join(kind)}"
+    if kind == "str":
+        return None if isinstance(value, str) else f"expected a string, got {value!r}"
+    if kind == "bool":
+        return None if isinstance(value, bool) else f"expected true or false, got {value!r}"
+    if kind == "int":
+        return None if isinstance(value, int) and not isinstance(value, bool) else f"expected an integer, got {value!r}"
+    if kind == "number":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return None
+        return None if isinstance(value, str) and NUMBER.match(value) else f"{value!r} is not a numeric literal"
+    if kind == "address":
+        return None if isinstance(value, str) and ADDRESS.match(value) else f"{value!r} is not an address"
+    if kind == "hex":
+        return None if isinstance(value, str) and HEX.match(value) else f"{value!r} is not 0x prefixed hex"
+    if kind == "expiry":
+        return None if isinstance(value, str) and EXPIRY.match(value) else f"{value!r} is not an expiry like 26DEC2024"
+
+    tables = { "token": "token", "oracle": "oracle", "currency": "currencyIds" }
+    if kind in tables:
+        known = registry.tables[tables[kind]].get(network, {})
+    elif kind == "dex":
+        known = registry.tables["DexIds"]
+    else:
+        raise ValueError(f"unknown schema type {kind}")
+    if value in known:
+        return None
+    suggestion = difflib.get_close_matches(str(value), list(known), n=1)
+    hint = f", did you mean {suggestion[0]}?" if suggestion else ""
+    return f"{value!r} is not in the {tables.get(kind, 'DexIds')} table for {network}{hint}"
+
+def validate(value, schema, network, registry, path=()):
+    """Yields (path, message) for every schema violation in an entry."""
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            yield (path, f"expected a mapping, got {value!r}")
+            return
+        keys = { k.rstrip("?"): k for k in schema }
+        for key in value:
+            if key not in keys:
+                suggestion = difflib.get_close_matches(key, list(keys), n=1)
+                hint = f", did you mean {suggestion[0]}?" if suggestion else ""
+                yield (path + (key,), f"unknown key{hint}")
+        for (key, declared) in keys.items():
+            if key in value:
+                yield from validate(value[key], schema[declared], network, registry, path + (key,))
+            elif not declared.endswith("?"):
+                yield (path + (key,), "missing required key")
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            yield (path, f"expected a list, got {value!r}")
+            return
+        for (i, item) in enumerate(value):
+            yield from validate(item, schema[0], network, registry, path + (i,))
+    else:
+        error = check_type(schema, value, network, registry)
+        if error is not None:
+            yield (path, error)
+
+def find_line(root, path):
+    """
+    Returns (line, found) for the deepest node along the path in a composed yaml document,
+    found is False if the path only partially exists. Lines are one based.
+    """
+    node = root
+    for key in path:
+        if isinstance(node, yaml.MappingNode):
+            child = next((v for (k, v) in node.value if k.value == key), None)
+        elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+            child = node.value[key]
+        else:
+            child = None
+        if child is None:
+            return (node.start_mark.line + 1, False)
+        node = child
+    return (node.start_mark.line + 1, True)
+
+def describe(path):
+    return "".join(f"[{p}]" if isinstance(p, int) else f".{p}" for p in path).lstrip(".")
+
+def locate_errors(filename, source, errors):
+    """Formats (path, message) errors as file:line messages. Only runs on failure so the loader can be the C one."""
+    root = yaml.compose(source, Loader=yaml.SafeLoader)
+    formatted = []
+    for (path, defaultsPath, message) in errors:
+        (line, found) = find_line(root, path)
+        if not found and defaultsPath is not None:
+            # Values merged in from the defaults are reported where the default is set
+            (defaultsLine, inDefaults) = find_line(root, defaultsPath)
+            line = defaultsLine if inDefaults else line
+        formatted.append(f"{filename}:{line}: {describe(path)}: {message}")
+    return formatted
+
+def load_spec(filename, schema, registry):
+    """Parses, merges and validates a spec file, returns { defaults, <network>: [entries] }."""
+    with open(filename, "r") as f:
+        source = f.read()
+    try:
+        raw = yaml.load(source, Loader=Loader) or {}
+    except yaml.MarkedYAMLError as e:
+        raise SpecError([f"{filename}:{e.problem_mark.line + 1}: {e.problem}"])
+
+    defaults = raw.get("defaults") or {}
+    spec = { "defaults": defaults }
+    errors = []
+    for key in raw:
+        if key != "defaults" and key not in NETWORK_KEYS:
+            errors.append(((key,), None, "unknown top level key, expected defaults or a network"))
+
+    for network in NETWORK_KEYS:
+        entries = []
+        for (i, entry) in enumerate(raw.get(network) or []):
+            if not isinstance(entry, dict):
+                errors.append(((network, i), None, "expected a mapping"))
+                continue
+            merged = deep_merge(defaults, entry)
+            for (path, message) in validate(merged, schema, network, registry):
+                errors.append(((network, i) + path, ("defaults",) + path, message))
+            entries.append(merged)
+        spec[network] = entries
+
+    if errors:
+        raise SpecError(locate_errors(filename, source, errors))
+    return spec
+
+def load_specs(families, registry, useCache=True, cacheFile=CACHE_FILE):
+    """
+    Returns family => validated spec for { family: (yaml file, schema) }. Specs are cached
+    together, keyed by the yaml sources, schemas, registry and this file.
+    """
+    keys = {
+        family: hash_inputs(hash_file(filename), schema, registry.sourceHash, hash_file(__file__), CACHE_VERSION)
+        for (family, (filename, schema)) in families.items()
+    }
+    cached = {}
+    if useCache:
+        try:
+            with open(cacheFile, "rb") as f:
+                cached = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            cached = {}
+
+    specs = {}
+    changed = False
+    for (family, (filename, schema)) in families.items():
+        hit = cached.get(family)
+        if hit is not None and hit["key"] == keys[family]:
+            specs[family] = hit["spec"]
+            continue
+        specs[family] = load_spec(filename, schema, registry)
+        cached[family] = { "key": keys[family], "spec": specs[family] }
+        changed = True
+
+    if useCache and changed:
+        tmp = f"{cacheFile}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cacheFile)
+    return specs
@@ -0,0 +1,89 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.24;
+
+import "forge-std/Test.sol";
+import {StableMath} from "@contracts/vaults/balancer/math/StableMath.sol";
+
+// Generated by `python -m scripts.pool_math vectors`, do not edit. Expected values come from
+// the python model in scripts/pool_math.py, any mismatch means the model and StableMath.sol differ.
+contract StableMathHarness {
+    function calculateInvariant(uint256 amp, uint256[] memory balances) external pure returns (uint256) {
+        return StableMath._calculateInvariant(amp, balances);
+    }
+
+    function calcOutGivenIn(
+        uint256 amp,
+        uint256[] memory balances,
+        uint256 tokenIndexIn,
+        uint256 tokenIndexOut,
+        uint256 amountIn,
+        uint256 invariant
+    ) external pure returns (uint256) {
+        return StableMath._calcOutGivenIn(amp, balances, tokenIndexIn, tokenIndexOut, amountIn, invariant);
+    }
+}
+
+contract TestStableMath is Test {
+    StableMathHarness harness;
+
+    function setUp() public {
+        harness = new StableMathHarness();
+    }
+
+    function test_matchesPythonModel() public {
+        uint256[] memory b;
+
+        b = new uint256[](2);
+        b[0] = 1000000000000000000000;
+        b[1] = 1000000000000000000000;
+        assertEq(harness.calculateInvariant(200000, b), 2000000000000000000000, "invariant 0");
+        assertEq(harness.calcOutGivenIn(200000, b, 0, 1, 1000000000000000000, 2000000000000000000000), 999995024895446962, "outGivenIn 0");
+        assertEq(harness.calcOutGivenIn(200000, b, 0, 1, 100000000000000000000, 2000000000000000000000), 99949776770075445363, "outGivenIn 0");
+        b = new uint256[](2);
+        b[0] = 1000000000000000000000;
+        b[1] = 1700000000000000000000;
+        assertEq(harness.calculateInvariant(200000, b), 2699516282254147804142, "invariant 1");
+        assertEq(harness.calcOutGivenIn(200000, b, 0, 1, 1000000000000000000, 2699516282254147804142), 1002960019617111007, "outGivenIn 1");
+        assertEq(harness.calcOutGivenIn(200000, b, 0, 1, 100000000000000000000, 2699516282254147804142), 100245490757950518673, "outGivenIn 1");
+        b = new uint256[](2);
+        b[0] = 10000000000000000000;
+        b[1] = 9990000000000000000000;
+        assertEq(harness.calculateInvariant(50000, b), 5618259095928350101725, "invariant 2");
+        assertEq(harness.calcOutGivenIn(50000, b, 0, 1, 1000000000000000000, 5618259095928350101725), 285679251456370507082, "outGivenIn 2");
+        assertEq(harness.calcOutGivenIn(50000, b, 0, 1, 100000000000000000000, 5618259095928350101725), 3878444655153070965112, "outGivenIn 2");
+        b = new uint256[](2);
+        b[0] = 3000000000000000000000000;
+        b[1] = 2500000000000000000000000;
+        assertEq(harness.calculateInvariant(5000000, b), 5499995417594602604725373, "invariant 3");
+        assertEq(harness.calcOutGivenIn(5000000, b, 0, 1, 1000000000000000000, 5499995417594602604725373), 999963035993611082, "outGivenIn 3");
+        assertEq(harness.calcOutGivenIn(5000000, b, 0, 1, 100000000000000000000, 5499995417594602604725373), 99996302843107108718, "outGivenIn 3");
+        b = new uint256[](2);
+        b[0] = 12345678901234567890;
+        b[1] = 98765432109876543210;
+        assertEq(harness.calculateInvariant(1000, b), 87036857848935321682, "invariant 4");
+        assertEq(harness.calcOutGivenIn(1000, b, 0, 1, 1000000000000000000, 87036857848935321682), 3659085864013996942, "outGivenIn 4");
+        assertEq(harness.calcOutGivenIn(1000, b, 0, 1, 100000000000000000000, 87036857848935321682), 89385173709894909069, "outGivenIn 4");
+        b = new uint256[](3);
+        b[0] = 1000000000000000000000;
+        b[1] = 1100000000000000000000;
+        b[2] = 900000000000000000000;
+        assertEq(harness.calculateInvariant(500000, b), 2999979838844622723818, "invariant 5");
+        assertEq(harness.calcOutGivenIn(500000, b, 0, 2, 1000000000000000000, 2999979838844622723818), 999773777492736043, "outGivenIn 5");
+        assertEq(harness.calcOutGivenIn(500000, b, 0, 2, 100000000000000000000, 2999979838844622723818), 99954205812105326608, "outGivenIn 5");
+        b = new uint256[](3);
+        b[0] = 250000000000000000000000;
+        b[1] = 10000000000000000000;
+        b[2] = 249000000000000000000000;
+        assertEq(harness.calculateInvariant(2000000, b), 350097452610973538635446, "invariant 6");
+        assertEq(harness.calcOutGivenIn(2000000, b, 0, 2, 1000000000000000000, 350097452610973538635446), 998501200498226055, "outGivenIn 6");
+        assertEq(harness.calcOutGivenIn(2000000, b, 0, 2, 100000000000000000000, 350097452610973538635446), 99835321056024477420, "outGivenIn 6");
+        b = new uint256[](4);
+        b[0] = 7000000000000000000;
+        b[1] = 5000000000000000000;
+        b[2] = 3000000000000000000;
+        b[3] = 11000000000000000000;
+        assertEq(harness.calculateInvariant(100000, b), 25965126662099138010, "invariant 7");
+        assertEq(harness.calcOutGivenIn(100000, b, 0, 3, 1000000000000000000, 25965126662099138010), 1003706370072077957, "outGivenIn 7");
+        assertEq(harness.calcOutGivenIn(100000, b, 0, 3, 100000000000000000000, 25965126662099138010), 10999194071258494868, "outGivenIn 7");
+    }
+}